@@ -3,12 +3,19 @@ import json
 import time
 import base64
 import re
+import asyncio
+import argparse
 import requests
 import random
+import shutil
+import hashlib
+import tempfile
 import pandas as pd
+from datetime import date, datetime
 from urllib.parse import urlparse, quote, unquote
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
+from keyword_clustering import normalize_url
 
 # ================= ⚙️ CONFIG (ตั้งค่า) =================
 
@@ -29,17 +36,19 @@ LOGIN_URL = os.getenv("FLIKOVER_LOGIN_URL")
 EMAIL = os.getenv("FLIKOVER_EMAIL")
 PASSWORD = os.getenv("FLIKOVER_PASSWORD")
 
-# 4. ตรวจสอบค่า (Debug Mode)
-print(f"   🔎 Check Variables:")
-print(f"      - EMAIL: {'✅ Found' if EMAIL else '❌ Missing'}")
-print(f"      - PASSWORD: {'✅ Found' if PASSWORD else '❌ Missing'}")
-print(f"      - LOGIN_URL: {'✅ Found' if LOGIN_URL else '❌ Missing'}")
+# 4. ตรวจสอบค่า (Debug Mode) -- เรียกตอนต้อง Login จริงเท่านั้น (session เดิมยังใช้ได้ก็ไม่ต้องมี)
+def check_login_config() -> bool:
+    print(f"   🔎 Check Variables:")
+    print(f"      - EMAIL: {'✅ Found' if EMAIL else '❌ Missing'}")
+    print(f"      - PASSWORD: {'✅ Found' if PASSWORD else '❌ Missing'}")
+    print(f"      - LOGIN_URL: {'✅ Found' if LOGIN_URL else '❌ Missing'}")
 
-if not LOGIN_URL or not EMAIL or not PASSWORD:
-    print("\n❌ Error: ค่า Config ไม่ครบ!")
-    print(f"   กรุณาเปิดไฟล์: {env_path}")
-    print("   แล้วตรวจสอบว่ามีบรรทัด: FLIKOVER_LOGIN_URL, FLIKOVER_EMAIL, FLIKOVER_PASSWORD ครบหรือไม่")
-    exit()
+    if not LOGIN_URL or not EMAIL or not PASSWORD:
+        print("\n❌ Error: ค่า Config ไม่ครบ!")
+        print(f"   กรุณาเปิดไฟล์: {env_path}")
+        print("   แล้วตรวจสอบว่ามีบรรทัด: FLIKOVER_LOGIN_URL, FLIKOVER_EMAIL, FLIKOVER_PASSWORD ครบหรือไม่")
+        return False
+    return True
 
 OCR_API_KEY = "helloworld"
 
@@ -47,6 +56,13 @@ OCR_API_KEY = "helloworld"
 ROOT_DIR = os.path.dirname(current_dir)
 INPUT_RESEARCH_DIR = os.path.join(ROOT_DIR, "output", "research")
 BASE_OUTPUT_DIR = os.path.join(ROOT_DIR, "data", "exports")
+# Session (cookies + localStorage) ที่ได้หลัง Login -- ใช้ซ้ำข้ามรอบการรัน
+STORAGE_STATE_FILE = os.path.join(ROOT_DIR, "flikover_auth_state.json")
+DEFAULT_PAGES = 3
+# Cache กลางระดับ URL: Export ครั้งเดียวต่อ URL แล้วทุก keyword อ้างอิงไฟล์เดียวกัน
+URL_CACHE_DIR = os.path.join(BASE_OUTPUT_DIR, "_url_cache")
+URL_CACHE_INDEX = os.path.join(URL_CACHE_DIR, "index.json")
+DEFAULT_MAX_AGE_DAYS = 30
 IGNORE_DOMAINS = [
     "pinterest.com", "pantip.com", "facebook.com", "shopee.co.th", "lazada.co.th", 
     "youtube.com", "instagram.com", "tiktok.com", "twitter.com", "nocnoc.com"
@@ -214,12 +230,17 @@ def merge_keyword_csv(keyword_dir, keyword_name):
             print(f"      ⚠️ Skipping empty/invalid file: {fname}")
             continue
 
-        if df.shape[1] < REQUIRED_COL_COUNT:
+        # ไฟล์จาก ranked_keywords_dataforseo.py มีแค่ 3 คอลัมน์ตามชื่อ
+        named_cols = ['Keyword', 'Volume', 'Organic traffic']
+        if df.shape[1] >= REQUIRED_COL_COUNT:
+            df_subset = df.iloc[:, [0, 6, 10]].copy()
+            df_subset.columns = named_cols
+        elif all(col in df.columns.astype(str).str.strip() for col in named_cols):
+            df.columns = df.columns.astype(str).str.strip()
+            df_subset = df[named_cols].copy()
+        else:
             print(f"      ⚠️ Skipping empty/invalid file: {fname} (only {df.shape[1]} columns, need {REQUIRED_COL_COUNT})")
             continue
-
-        df_subset = df.iloc[:, [0, 6, 10]].copy()
-        df_subset.columns = ['Keyword', 'Volume', 'Organic traffic']
         dfs.append(df_subset)
 
     if not dfs:
@@ -235,13 +256,14 @@ def merge_keyword_csv(keyword_dir, keyword_name):
     final_df.to_csv(output_path, index=False, encoding='utf-8-sig')
     print(f"   ✅ สร้างไฟล์รวมสำเร็จ: {output_path} ({len(final_df)} คีย์เวิร์ด)")
 
-# ================= 🚀 MAIN PROGRAM =================
-def run_automation():
+# ================= 🎯 TARGET PLANNING =================
+def collect_keyword_targets():
+    """อ่าน {keyword}-competitions.json ทุกโฟลเดอร์ แล้วเลือก Top 3 URL (ไม่รวมโดเมนใน IGNORE_DOMAINS)"""
+    keyword_targets = {}
     if not os.path.exists(INPUT_RESEARCH_DIR):
         print(f"Input directory not found: {INPUT_RESEARCH_DIR}")
-        return
+        return keyword_targets
 
-    keyword_targets = {}
     for keyword_folder in sorted(os.listdir(INPUT_RESEARCH_DIR)):
         folder_path = os.path.join(INPUT_RESEARCH_DIR, keyword_folder)
         if not os.path.isdir(folder_path):
@@ -288,109 +310,332 @@ def run_automation():
             keyword_targets[keyword_folder].append(url)
             count += 1
 
-    all_targets = [(kw, url) for kw, urls in keyword_targets.items() for url in urls]
+    return keyword_targets
 
-    if not all_targets:
-        print("No usable URLs found in competitions JSON files")
-        return
+# ================= 🔐 SESSION / LOGIN =================
+async def is_session_valid(page, check_url):
+    """เปิดหน้า Site Explorer ด้วย session ปัจจุบัน -- ถ้าถูกเด้งไปหน้า Login (มีช่อง password) แปลว่าหมดอายุ"""
+    try:
+        await page.goto(check_url, wait_until="domcontentloaded", timeout=30000)
+    except Exception as e:
+        print(f"   ⚠️ Session check failed: {e}")
+        return False
+    if LOGIN_URL and page.url.startswith(LOGIN_URL):
+        return False
+    return await page.locator("input[type='password']").count() == 0
+
+
+async def login(page):
+    """Auto Login (แก้ Captcha ด้วย OCR) -- คืน True ถ้าผ่าน"""
+    MAX_RETRIES = 10
+    for attempt in range(1, MAX_RETRIES + 1):
+        print(f"\n⚡ Login รอบที่ {attempt}/{MAX_RETRIES}...")
+        try:
+            await page.goto(LOGIN_URL, timeout=30000)
+            await page.locator("input[name*='mail']").fill(EMAIL)
+            await page.locator("input[type='password']").fill(PASSWORD)
+
+            captcha_el = page.locator("#siimage")
+            await captcha_el.wait_for(state="visible", timeout=5000)
+            # รอให้รูป Captcha โหลดเสร็จจริง (แทน sleep)
+            await captcha_el.evaluate(
+                "img => img.complete && img.naturalWidth > 0 || "
+                "new Promise(r => { img.onload = r; img.onerror = r; })"
+            )
+            img_bytes = await captcha_el.screenshot()
+            captcha_text = await asyncio.to_thread(solve_captcha_ocr_space, img_bytes)
+            if not captcha_text or len(captcha_text) < 4:
+                random_code = str(random.randint(100000, 999999))
+                captcha_text = random_code
+            else:
+                print(f"   ✅ OCR อ่านได้: {captcha_text}")
 
-    print(f"\nTotal target URLs: {len(all_targets)} ({len(keyword_targets)} keywords)\n")
+            await page.locator("input[placeholder='Security Code']").fill(captcha_text)
+            await page.locator("button:has-text('Sign in'), input[value='Sign in']").click()
 
-    with sync_playwright() as p:
-        print("🚀 Launching Browser...")
-        browser = p.chromium.launch(headless=False, args=["--disable-blink-features=AutomationControlled"])
-        context = browser.new_context(viewport={"width": 1280, "height": 720}, accept_downloads=True)
-        page = context.new_page()
-
-        # PART 1: AUTO LOGIN
-        MAX_RETRIES = 10
-        login_success = False
-        for attempt in range(1, MAX_RETRIES + 1):
-            print(f"\n⚡ Login รอบที่ {attempt}/{MAX_RETRIES}...")
             try:
-                page.goto(LOGIN_URL, timeout=30000)
-                page.locator("input[name*='mail']").fill(EMAIL)
-                page.locator("input[type='password']").fill(PASSWORD)
-
-                captcha_el = page.locator("#siimage")
-                captcha_el.wait_for(state="visible", timeout=5000)
-                time.sleep(1)
-                img_bytes = captcha_el.screenshot()
-                captcha_text = solve_captcha_ocr_space(img_bytes)
-                if not captcha_text or len(captcha_text) < 4:
-                    random_code = str(random.randint(100000, 999999))
-                    captcha_text = random_code
-                else:
-                    print(f"   ✅ OCR อ่านได้: {captcha_text}")
-
-                page.locator("input[placeholder='Security Code']").fill(captcha_text)
-                page.locator("button:has-text('Sign in'), input[value='Sign in']").click()
+                await page.wait_for_url(lambda u: u != LOGIN_URL, timeout=5000)
+                print("\n🎉🎉 LOGIN SUCCESS! 🎉🎉")
+                return True
+            except PlaywrightTimeoutError:
+                print("   ❌ Login ไม่ผ่าน (Captcha/Pass ผิด) -> ลองใหม่")
+        except Exception as e:
+            print(f"   💥 Error Login: {e}")
+            continue
+    return False
 
-                try:
-                    page.wait_for_url(lambda u: u != LOGIN_URL, timeout=5000)
-                    print("\n🎉🎉 LOGIN SUCCESS! 🎉🎉")
-                    login_success = True
-                    break
-                except:
-                    print("   ❌ Login ไม่ผ่าน (Captcha/Pass ผิด) -> ลองใหม่")
-            except Exception as e:
-                print(f"   💥 Error Login: {e}")
-                continue
+# ================= 🗄️ URL EXPORT CACHE =================
+# index.json: { normalized_url: {"url": ..., "date": "YYYY-MM-DD", "file": "<date>/<name>.csv"} }
+# ไฟล์ใน data/exports/{keyword}/all_urls/ เป็น hard link ไปยังไฟล์ใน cache (copy ถ้า link ไม่ได้)
+# ขั้น merge และ merge_keyword_ahref_dataforseo.py จึงอ่านได้เหมือนเดิม
 
-        if not login_success:
-            browser.close()
-            return
+def load_url_cache(index_path=None):
+    index_path = index_path or URL_CACHE_INDEX
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        print(f"⚠️ URL cache index unreadable, starting empty: {e}")
+        return {}
+
+
+def save_url_cache(cache, index_path=None):
+    index_path = index_path or URL_CACHE_INDEX
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+
+def cache_file_for(norm_url, target_url, export_date):
+    """Cache path ของ (URL, วันที่ Export) -- prefix hash กันชื่อชนกันหลังตัดความยาว 100 ตัวอักษร"""
+    digest = hashlib.sha1(norm_url.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(export_date, f"{digest}-{filename_from_url(target_url)}")
+
+
+def is_cache_fresh(entry, max_age_days, today=None):
+    """max_age_days=None -> ไม่หมดอายุ"""
+    if not entry or not os.path.exists(os.path.join(URL_CACHE_DIR, entry.get("file", ""))):
+        return False
+    if max_age_days is None:
+        return True
+    try:
+        exported = date.fromisoformat(entry["date"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return ((today or date.today()) - exported).days <= max_age_days
 
-        # PART 2: DATA EXPORT
-        print("\n⏳ กำลังเตรียม Export ข้อมูล...")
-        time.sleep(2)
 
-        total = len(all_targets)
-        for i, (keyword, target_url) in enumerate(all_targets):
-            
-            # target_url ตรงนี้คือแบบ unquoted แล้ว (อ่านง่าย)
-            csv_name = filename_from_url(target_url) 
-            save_dir = os.path.join(BASE_OUTPUT_DIR, keyword, "all_urls")
-            os.makedirs(save_dir, exist_ok=True)
-            save_file_path = os.path.join(save_dir, csv_name)
-
-            if os.path.exists(save_file_path):
-                print(f"  [{i+1}/{total}] Skip (exists): {keyword}/all_urls/{csv_name}")
+def link_cached_export(cache_path, dest_path):
+    """ให้ keyword อ้างอิงไฟล์ใน cache (hard link, fallback เป็น copy)"""
+    if os.path.exists(dest_path):
+        if os.path.samefile(cache_path, dest_path):
+            return
+        os.remove(dest_path)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    try:
+        os.link(cache_path, dest_path)
+    except OSError:
+        shutil.copy2(cache_path, dest_path)
+
+
+def plan_exports(keyword_targets, cache, max_age_days=DEFAULT_MAX_AGE_DAYS):
+    """Dedupe URL ข้ามทุก keyword ก่อนเปิด Browser
+
+    - URL ที่ cache ยังสดอยู่ -> link ให้ทุก keyword ที่ต้องการ ไม่ต้อง Export
+    - ไฟล์ Export เดิมของ keyword (ก่อนมี cache) -> รับเข้า cache ตามวันที่แก้ไขไฟล์
+    - ที่เหลือ -> งาน Export หนึ่งงานต่อ URL พร้อมรายการปลายทางของทุก keyword
+    คืนค่า (jobs, stats)
+    """
+    by_url = {}
+    for keyword, urls in keyword_targets.items():
+        for target_url in urls:
+            norm = normalize_url(target_url)
+            if not norm:
                 continue
+            item = by_url.setdefault(norm, {"url": target_url, "dests": []})
+            dest = os.path.join(BASE_OUTPUT_DIR, keyword, "all_urls", filename_from_url(target_url))
+            item["dests"].append((keyword, dest))
+
+    stats = {"references": sum(len(v["dests"]) for v in by_url.values()),
+             "unique_urls": len(by_url), "cache_hits": 0, "adopted": 0}
+    jobs = []
+    for norm, item in by_url.items():
+        entry = cache.get(norm)
+
+        if not is_cache_fresh(entry, max_age_days):
+            entry = None
+            # ไฟล์ที่ Export ไว้แล้วก่อนมี cache -- ไม่ต้อง Export ซ้ำถ้ายังไม่หมดอายุ
+            for _, dest in item["dests"]:
+                if not os.path.exists(dest) or os.path.getsize(dest) == 0:
+                    continue
+                legacy_date = datetime.fromtimestamp(os.path.getmtime(dest)).date()
+                if max_age_days is not None and (date.today() - legacy_date).days > max_age_days:
+                    continue
+                rel_file = cache_file_for(norm, item["url"], legacy_date.isoformat())
+                link_cached_export(dest, os.path.join(URL_CACHE_DIR, rel_file))
+                cache[norm] = entry = {"url": item["url"], "date": legacy_date.isoformat(), "file": rel_file}
+                stats["adopted"] += 1
+                break
+
+        if entry and is_cache_fresh(entry, max_age_days):
+            cache_path = os.path.join(URL_CACHE_DIR, entry["file"])
+            for _, dest in item["dests"]:
+                link_cached_export(cache_path, dest)
+            stats["cache_hits"] += 1
+            continue
+
+        jobs.append({"norm": norm, "url": item["url"], "dests": item["dests"]})
+
+    return jobs, stats
+
+
+# ================= 📥 EXPORT =================
+async def export_target(page, url_template, target_url, save_file_path):
+    """เปิดหน้า Organic Keywords ของ URL แล้ว Export CSV -- รอ element / network / download event แทน sleep"""
+    # quote อีกครั้งเฉพาะตอนใส่ใน URL Template (ป้องกัน Double Encode)
+    encoded_target = quote(target_url, safe='')
+    full_ahrefs_url = url_template.format(encoded_target)
+
+    # หน้าเป็น SPA ที่ poll อยู่ตลอด -- networkidle อาจไม่มาเลย ให้รอปุ่ม Export แทน
+    await page.goto(full_ahrefs_url, wait_until="domcontentloaded", timeout=60000)
+
+    export_btn = page.locator("button:has-text('Export')").first
+    await export_btn.wait_for(state="visible", timeout=60000)
+    await export_btn.click()
 
-            # quote อีกครั้งเฉพาะตอนใส่ใน URL Template (ป้องกัน Double Encode)
-            encoded_target = quote(target_url, safe='')
-            full_ahrefs_url = FLIKOVER_URL_TEMPLATE.format(encoded_target)
+    modal = page.locator("div[role='dialog']")
+    await modal.wait_for(state="visible", timeout=15000)
 
-            print(f"  [{i+1}/{total}] Opening: {csv_name} (keyword: {keyword})")
+    csv_option = modal.locator("text='CSV (UTF-16, best for Excel)'")
+    await csv_option.wait_for(state="visible", timeout=15000)
+    await csv_option.click()
+
+    # click() รอจนปุ่ม visible + enabled + stable เอง ไม่ต้อง sleep ระหว่างเลือก format
+    modal_export_btn = modal.locator("button:has-text('Export')")
+    async with page.expect_download(timeout=60000) as download_info:
+        await modal_export_btn.click()
+
+    download = await download_info.value
+    await download.save_as(save_file_path)
+
+
+async def export_worker(worker_id, context, queue, url_template, cache, stats):
+    """หนึ่ง worker = หนึ่ง page ใน context เดียวกัน (แชร์ session) ดึงงานจาก queue จนหมด
+
+    Export ลง cache ครั้งเดียวต่อ URL แล้ว link ไปยังทุก keyword ที่อ้างถึง URL นั้น
+    """
+    page = await context.new_page()
+    try:
+        while True:
             try:
-                page.goto(full_ahrefs_url, timeout=60000)
-                time.sleep(8)
-                try:
-                    export_btn = page.locator("button:has-text('Export')").first
-                    export_btn.wait_for(state="visible", timeout=15000)
-                    export_btn.click()
-
-                    modal = page.locator("div[role='dialog']")
-                    modal.wait_for(state="visible", timeout=15000)
-
-                    page.locator("text='CSV (UTF-16, best for Excel)'").click()
-                    time.sleep(5)
-
-                    modal_export_btn = modal.locator("button:has-text('Export')")
-                    with page.expect_download(timeout=60000) as download_info:
-                        modal_export_btn.click()
-
-                    download = download_info.value
-                    download.save_as(save_file_path)
-                    print(f"    Saved: {keyword}/all_urls/{csv_name}")
-                    time.sleep(3)
-                except Exception as e:
-                    print(f"    Export failed: {e}")
+                i, total, job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            export_date = date.today().isoformat()
+            rel_file = cache_file_for(job["norm"], job["url"], export_date)
+            cache_path = os.path.join(URL_CACHE_DIR, rel_file)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            keywords = ", ".join(kw for kw, _ in job["dests"])
+            csv_name = os.path.basename(job["dests"][0][1])
+            print(f"  [{i+1}/{total}] (page {worker_id}) Opening: {csv_name} (keywords: {keywords})")
+            started = time.perf_counter()
+            try:
+                await export_target(page, url_template, job["url"], cache_path)
+                cache[job["norm"]] = {"url": job["url"], "date": export_date, "file": rel_file}
+                save_url_cache(cache)
+                for _, dest in job["dests"]:
+                    link_cached_export(cache_path, dest)
+                stats["saved"] += 1
+                print(f"    Saved: _url_cache/{rel_file} -> {len(job['dests'])} keyword(s) "
+                      f"({time.perf_counter() - started:.1f}s)")
+            except PlaywrightTimeoutError as e:
+                stats["failed"] += 1
+                print(f"    Export timed out: {csv_name}: {str(e).splitlines()[0]}")
             except Exception as e:
-                print(f"    Error loading page: {e}")
+                stats["failed"] += 1
+                print(f"    Export failed: {csv_name}: {e}")
+            finally:
+                queue.task_done()
+    finally:
+        await page.close()
+
+
+# ================= 🧪 OFFLINE STAND-IN =================
+def use_directories(research_dir, output_dir):
+    """ชี้ Input (competitions JSON) และ Output (exports + URL cache) ไปที่อื่น -- ใช้ตอนรันกับ stand-in"""
+    global INPUT_RESEARCH_DIR, BASE_OUTPUT_DIR, URL_CACHE_DIR, URL_CACHE_INDEX
+    INPUT_RESEARCH_DIR = str(research_dir)
+    BASE_OUTPUT_DIR = str(output_dir)
+    URL_CACHE_DIR = os.path.join(BASE_OUTPUT_DIR, "_url_cache")
+    URL_CACHE_INDEX = os.path.join(URL_CACHE_DIR, "index.json")
+
+
+async def run_standin(pages=DEFAULT_PAGES, headless=True, output_dir=None):
+    """รัน flow ทั้งหมดแบบ offline: หน้า Export จาก ahref_standin.py + competitions จาก tests/fixtures/ahrefs
+    Output ลง temp dir (ไม่แตะ data/exports และ session จริง) -- คืน path ของ output"""
+    from ahref_standin import FIXTURE_DIR, start as start_standin
+
+    output_dir = output_dir or tempfile.mkdtemp(prefix="ahref-standin-")
+    use_directories(FIXTURE_DIR / "research", output_dir)
+    runner, url_template = await start_standin()
+    print(f"🧪 Stand-in export page: {url_template}")
+    try:
+        await run_automation(pages=pages, headless=headless, url_template=url_template,
+                             storage_state_file=os.path.join(output_dir, "auth_state.json"),
+                             fresh_login=True)
+    finally:
+        await runner.cleanup()
+    print(f"📂 Stand-in output: {output_dir}")
+    return output_dir
 
-        browser.close()
+
+# ================= 🚀 MAIN PROGRAM =================
+async def run_automation(pages=DEFAULT_PAGES, headless=False, url_template=FLIKOVER_URL_TEMPLATE,
+                         storage_state_file=STORAGE_STATE_FILE, fresh_login=False,
+                         max_age_days=DEFAULT_MAX_AGE_DAYS):
+    keyword_targets = collect_keyword_targets()
+    all_targets = [(kw, url) for kw, urls in keyword_targets.items() for url in urls]
+
+    if not all_targets:
+        print("No usable URLs found in competitions JSON files")
+        return
+
+    print(f"\nTotal target URLs: {len(all_targets)} ({len(keyword_targets)} keywords)\n")
+
+    # เตรียมคิวงาน: dedupe URL ข้าม keyword + ใช้ cache ที่ยังไม่หมดอายุ ก่อนเปิด Browser
+    cache = load_url_cache()
+    jobs, plan_stats = plan_exports(keyword_targets, cache, max_age_days)
+    save_url_cache(cache)
+    print(f"   🗄️ {plan_stats['references']} references -> {plan_stats['unique_urls']} unique URLs "
+          f"({plan_stats['cache_hits']} cached, {plan_stats['adopted']} adopted from existing files, "
+          f"{len(jobs)} to export)")
+
+    queue = asyncio.Queue()
+    for i, job in enumerate(jobs):
+        queue.put_nowait((i, len(jobs), job))
+
+    if not queue.empty():
+        async with async_playwright() as p:
+            print("🚀 Launching Browser...")
+            browser = await p.chromium.launch(headless=headless, args=["--disable-blink-features=AutomationControlled"])
+            context_args = {"viewport": {"width": 1280, "height": 720}, "accept_downloads": True}
+            if os.path.exists(storage_state_file) and not fresh_login:
+                print(f"🔑 Reusing saved session: {storage_state_file}")
+                context_args["storage_state"] = storage_state_file
+            context = await browser.new_context(**context_args)
+
+            # PART 1: SESSION CHECK / AUTO LOGIN
+            page = await context.new_page()
+            session_check_url = url_template.format("")
+            if await is_session_valid(page, session_check_url):
+                print("✅ Session ยังใช้ได้ -- ข้ามการ Login")
+            else:
+                if not check_login_config() or not await login(page):
+                    await browser.close()
+                    return
+                await context.storage_state(path=storage_state_file)
+                print(f"💾 Saved session: {storage_state_file}")
+            await page.close()
+
+            # PART 2: DATA EXPORT (หลาย page คู่ขนานใน context เดียว)
+            n_pages = max(1, min(pages, queue.qsize()))
+            print(f"\n⏳ กำลัง Export {queue.qsize()} URL ด้วย {n_pages} page...")
+            stats = {"saved": 0, "failed": 0}
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                export_worker(w + 1, context, queue, url_template, cache, stats)
+                for w in range(n_pages)
+            ))
+            print(f"\n   Export: {stats['saved']} saved, {stats['failed']} failed "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+            await browser.close()
 
     # PART 3: Merge CSVs
     for keyword in keyword_targets:
@@ -399,4 +644,32 @@ def run_automation():
     print("\n🎉 ทำงานครบทุกขั้นตอนแล้ว!")
 
 if __name__ == "__main__":
-    run_automation()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Phase 1.2: Ahrefs (Flikover) competitor keyword export")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES,
+                        help=f"Parallel browser pages in one logged-in context (default: {DEFAULT_PAGES})")
+    parser.add_argument("--headless", action="store_true", help="Run the browser headless")
+    parser.add_argument("--fresh-login", action="store_true",
+                        help="Ignore the saved session and log in again")
+    parser.add_argument("--storage-state", default=STORAGE_STATE_FILE,
+                        help="Saved session file (cookies + localStorage)")
+    parser.add_argument("--url-template", default=FLIKOVER_URL_TEMPLATE,
+                        help="Export page URL with {} for the encoded target (e.g. a local stand-in page)")
+    parser.add_argument("--standin", action="store_true",
+                        help="Run offline against scripts/ahref_standin.py and tests/fixtures/ahrefs "
+                             "(output goes to a temp directory)")
+    parser.add_argument("--max-age-days", type=int, default=DEFAULT_MAX_AGE_DAYS,
+                        help=f"Re-export a URL when its cached export is older than this (default: {DEFAULT_MAX_AGE_DAYS}; -1 = never)")
+    args = parser.parse_args()
+
+    if args.standin:
+        asyncio.run(run_standin(pages=args.pages, headless=args.headless))
+        raise SystemExit(0)
+
+    asyncio.run(run_automation(
+        pages=args.pages,
+        headless=args.headless,
+        url_template=args.url_template,
+        storage_state_file=args.storage_state,
+        fresh_login=args.fresh_login,
+        max_age_days=None if args.max_age_days < 0 else args.max_age_days,
+    ))
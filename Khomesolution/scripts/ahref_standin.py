@@ -0,0 +1,116 @@
+"""
+Local stand-in for the Flikover Site Explorer export page (ahref_data_collection.py).
+
+Serves just enough of the organic-keywords page for the export flow to run
+offline: an SPA shell that renders the Export button after a delay and keeps
+polling in the background (so ``networkidle`` never settles, like the real
+site), the export dialog with the "CSV (UTF-16, best for Excel)" option, and
+a download of the fixture export (tests/fixtures/ahrefs/organic-keywords.csv)
+for every target.  There is no login page: the session check passes.
+
+Usage:
+    python scripts/ahref_standin.py --port 8765
+    python scripts/ahref_data_collection.py --url-template "http://127.0.0.1:8765/organic-keywords?target={}"
+
+    python scripts/ahref_data_collection.py --standin --headless   # starts it in-process
+"""
+
+import sys
+import argparse
+import asyncio
+from pathlib import Path
+from urllib.parse import quote
+
+from aiohttp import web
+
+FIXTURE_DIR = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "ahrefs"
+EXPORT_FIXTURE = FIXTURE_DIR / "organic-keywords.csv"
+RENDER_DELAY_MS = 300
+POLL_INTERVAL_MS = 250
+
+_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Organic keywords</title></head>
+<body>
+<div id="app">Loading...</div>
+<script>
+const target = new URLSearchParams(location.search).get("target") || "";
+setInterval(() => fetch("/poll").catch(() => {{}}), {poll});
+setTimeout(() => {{
+  const app = document.getElementById("app");
+  app.innerHTML = '<h1>Organic keywords</h1><button id="export">Export</button>';
+  document.getElementById("export").onclick = () => {{
+    const dialog = document.createElement("div");
+    dialog.setAttribute("role", "dialog");
+    dialog.innerHTML = '<label><input type="radio" name="fmt">CSV (UTF-16, best for Excel)</label>'
+      + '<button id="do-export">Export</button>';
+    document.body.appendChild(dialog);
+    dialog.querySelector("#do-export").onclick = () => {{
+      const a = document.createElement("a");
+      a.href = "/export.csv?target=" + encodeURIComponent(target);
+      a.download = "organic-keywords.csv";
+      document.body.appendChild(a);
+      a.click();
+    }};
+  }};
+}}, {delay});
+</script>
+</body></html>
+"""
+
+
+def make_app(fixture: Path = EXPORT_FIXTURE) -> web.Application:
+    body = fixture.read_bytes()
+    page = _PAGE.format(poll=POLL_INTERVAL_MS, delay=RENDER_DELAY_MS)
+
+    async def organic_keywords(request):
+        return web.Response(text=page, content_type="text/html")
+
+    async def poll(request):
+        return web.json_response({"ok": True})
+
+    async def export_csv(request):
+        return web.Response(body=body, content_type="text/csv", headers={
+            "Content-Disposition": "attachment; filename=organic-keywords.csv"})
+
+    app = web.Application()
+    app.router.add_get("/organic-keywords", organic_keywords)
+    app.router.add_get("/poll", poll)
+    app.router.add_get("/export.csv", export_csv)
+    return app
+
+
+async def start(host: str = "127.0.0.1", port: int = 0, fixture: Path = EXPORT_FIXTURE):
+    """Start the stand-in; returns ``(runner, url_template)`` (``runner.cleanup()`` stops it)."""
+    runner = web.AppRunner(make_app(fixture))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound}/organic-keywords?target={{}}"
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Flikover export page")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixture", default=str(EXPORT_FIXTURE), help="CSV served for every export")
+    args = parser.parse_args()
+
+    async def serve():
+        runner, template = await start(args.host, args.port, Path(args.fixture))
+        print(f"🧪 Stand-in export page: {template.format(quote('https://example.com/', safe=''))}")
+        print(f"   --url-template \"{template}\"")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
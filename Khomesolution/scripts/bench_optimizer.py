@@ -0,0 +1,437 @@
+"""
+Benchmark / regression harness for optimize_research_data.py.
+
+Runs the optimizer over a fixed, versioned corpus and records, per
+document: wall time of every stage, end-to-end time, peak memory, token
+reduction and whether ``validate_quality`` passes.  Results are JSON, so a
+run can be saved as a baseline and later runs compared against it.
+
+Corpus (benchmarks/research_optimizer/corpus/):
+    seed-*.md       copies of data/deep-research/*-research.md
+    synth-*.md      long synthetic English / Thai / mixed documents,
+                    generated deterministically (hard-wrapped lines, page
+                    numbers, filler phrases, statistics, citations, short
+                    lists, near-duplicate paragraphs, reference section)
+    manifest.json   corpus version + sha256 of every file
+
+Everything runs offline: no API calls, the stage cache is bypassed, and
+token counts use whatever tokenizer token_budget can load locally (the
+encoding is recorded, and compare refuses to mix encodings).
+
+Usage (from the Khomesolution folder):
+    python scripts/bench_optimizer.py corpus                 # (re)build the corpus
+    python scripts/bench_optimizer.py run --save baseline    # write baselines/baseline.json
+    python scripts/bench_optimizer.py compare                # run now, compare with baseline
+    python scripts/bench_optimizer.py compare --current out.json --time-tolerance 0.3
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import statistics
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import optimize_research_data as ord_
+import token_budget
+from md_blocks import TextBlocks, join_blocks
+
+BENCH_DIR = Path("benchmarks/research_optimizer")
+CORPUS_DIR = BENCH_DIR / "corpus"
+BASELINE_DIR = BENCH_DIR / "baselines"
+SEED_DIR = Path("data/deep-research")
+THAI_SEED_GLOB = "output/research/*/answer/*.md"
+
+# Bump when the generator or seed selection changes the corpus
+CORPUS_VERSION = 1
+GENERATOR_SEED = 20260101
+
+DEFAULT_REPEAT = 3
+TIME_TOLERANCE = 0.25         # relative slowdown allowed
+TIME_FLOOR_S = 0.02           # absolute slowdowns below this are timer noise
+MEMORY_TOLERANCE = 0.15       # relative peak-memory growth allowed
+REDUCTION_TOLERANCE = 0.01    # absolute drop in token reduction allowed (1 point)
+
+
+# ==========================================
+# CORPUS
+# ==========================================
+_EN_FILLERS = [
+    "It is important to note that", "In practice,", "For example,", "Moreover,",
+    "Furthermore,", "In addition,", "As a result,", "Keep in mind that", "Note that",
+    "In general,", "Additionally,", "Generally speaking,", "In other words,",
+]
+_EN_MODIFIERS = ["very effective", "really important", "significantly", "dramatically", "quite useful"]
+_EN_STATS = ["increased from {a}% to {b}%", "dropped from {a} dB to {b} dB", "rose from ${a} to ${b}"]
+_EN_ADVISORY = [
+    "Consider the overall layout of the room before committing to a particular window style and size.",
+    "Ensure that every supplier provides a written warranty covering both materials and labour.",
+    "Homeowners should compare at least three quotes and ask about installation lead times.",
+]
+_TH_FILLERS = ["อย่างไรก็ตาม", "นอกจากนี้", "โดยทั่วไปแล้ว", "ตัวอย่างเช่น", "ในความเป็นจริง", "ทั้งนี้"]
+_TH_MODIFIERS = ["อย่างมาก", "ค่อนข้าง", "อย่างเห็นได้ชัด"]
+_TH_STATS = ["เพิ่มขึ้นจาก {a}% เป็น {b}%", "ลดลงจาก {a} dB เป็น {b} dB"]
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_TAG_RE = re.compile(r'<[^>]+>|\*\*|\[\d+\]')
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _english_sentences(texts):
+    out = []
+    for text in texts:
+        for line in text.split('\n'):
+            for s in _SENTENCE_SPLIT_RE.split(line.strip()):
+                if 60 <= len(s) <= 300 and s[0].isupper() and s.endswith('.') and 'http' not in s:
+                    out.append(s)
+    return sorted(set(out))
+
+
+def _thai_sentences(texts):
+    out = []
+    for text in texts:
+        for line in text.split('\n'):
+            line = _TAG_RE.sub('', line).strip(' *#-')
+            if len(line) >= 40 and re.search(r'[฀-๿]', line):
+                out.append(line)
+    return sorted(set(out))
+
+
+def _wrap(paragraph: str, width: int = 80):
+    """Hard-wrap like a PDF extraction."""
+    lines, current = [], ''
+    for word in paragraph.split(' '):
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def synth_document(rng: random.Random, en, th, mode: str, sections: int) -> str:
+    """One long synthetic research dump; ``mode`` is english, thai or mixed."""
+    urls = [f"https://example-{i}.co.th/articles/window-{i}" for i in range(1, 41)]
+    out, page = [f"# Synthetic research ({mode})", ""], 1
+    seen_paragraphs = []
+
+    def sentence():
+        thai = mode == "thai" or (mode == "mixed" and rng.random() < 0.5)
+        pool, fillers, mods, stats = ((th, _TH_FILLERS, _TH_MODIFIERS, _TH_STATS) if thai and th
+                                      else (en, _EN_FILLERS, _EN_MODIFIERS, _EN_STATS))
+        s = rng.choice(pool)
+        r = rng.random()
+        if r < 0.25:
+            s = f"{rng.choice(fillers)} {s[0].lower() + s[1:] if not thai else s}"
+        elif r < 0.35:
+            s = f"{s} {rng.choice(stats).format(a=rng.randint(10, 40), b=rng.randint(41, 90))}."
+        elif r < 0.45:
+            s = s.replace(' ', f" {rng.choice(mods)} ", 1)
+        if rng.random() < 0.3:
+            n = rng.randint(1, 4)
+            s += ' ' + ' '.join(f"[{rng.randint(1, 9)}]({rng.choice(urls)})" for _ in range(n))
+        return s
+
+    for section in range(1, sections + 1):
+        out += [f"## Section {section}", ""]
+        for _ in range(rng.randint(3, 6)):
+            if seen_paragraphs and rng.random() < 0.12:
+                # Near-duplicate of an earlier paragraph
+                words = rng.choice(seen_paragraphs).split(' ')
+                del words[rng.randrange(len(words))]
+                paragraph = ' '.join(words)
+            else:
+                paragraph = ' '.join(sentence() for _ in range(rng.randint(2, 5)))
+                if mode != "thai" and rng.random() < 0.2:
+                    paragraph += ' ' + rng.choice(_EN_ADVISORY)
+            seen_paragraphs.append(paragraph)
+            out += _wrap(paragraph) + [""]
+            if rng.random() < 0.4:
+                out += [f"- {sentence()}" for _ in range(rng.randint(2, 5))] + [""]
+            if rng.random() < 0.15:
+                out += [str(page), ""]
+                page += 1
+
+    # Reference section: "n Title" lines followed by URLs
+    out += ["References", ""]
+    for i, url in enumerate(urls, 1):
+        out += [f"{i} Soundproof window guide part {i}", url]
+    return '\n'.join(out) + '\n'
+
+
+def build_corpus(args) -> None:
+    CORPUS_DIR.mkdir(parents=True, exist_ok=True)
+    for old in CORPUS_DIR.glob("*.md"):
+        old.unlink()
+
+    seeds = sorted(p for p in SEED_DIR.glob("*-research.md") if ".optimized." not in p.name)
+    seed_texts = [p.read_text(encoding='utf-8') for p in seeds]
+    for i, (path, text) in enumerate(zip(seeds, seed_texts), 1):
+        (CORPUS_DIR / f"seed-{i:02d}.md").write_text(text, encoding='utf-8')
+
+    en = _english_sentences(seed_texts)
+    th = _thai_sentences(p.read_text(encoding='utf-8') for p in sorted(Path('.').glob(THAI_SEED_GLOB)))
+    if not en:
+        print("❌ No English seed sentences (data/deep-research is empty)")
+        sys.exit(1)
+
+    rng = random.Random(GENERATOR_SEED)
+    for mode in ("english", "thai", "mixed"):
+        if mode != "english" and not th:
+            print(f"  ⚠️ No Thai seed text ({THAI_SEED_GLOB}); skipping {mode}")
+            continue
+        text = synth_document(rng, en, th, mode, args.sections)
+        (CORPUS_DIR / f"synth-{mode}.md").write_text(text, encoding='utf-8')
+
+    files = sorted(CORPUS_DIR.glob("*.md"))
+    manifest = {
+        "version": CORPUS_VERSION,
+        "generator_seed": GENERATOR_SEED,
+        "files": {p.name: {"sha256": _sha256(p), "bytes": p.stat().st_size} for p in files},
+    }
+    (CORPUS_DIR / "manifest.json").write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+    for p in files:
+        print(f"  {p.name}: {p.stat().st_size / 1024:.0f} KB")
+    print(f"✅ Corpus v{CORPUS_VERSION}: {len(files)} documents -> {CORPUS_DIR}")
+
+
+def load_corpus():
+    manifest_path = CORPUS_DIR / "manifest.json"
+    if not manifest_path.exists():
+        print(f"❌ No corpus at {CORPUS_DIR}. Run: python scripts/bench_optimizer.py corpus")
+        sys.exit(1)
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    docs = {}
+    for name, meta in manifest["files"].items():
+        path = CORPUS_DIR / name
+        if _sha256(path) != meta["sha256"]:
+            print(f"❌ {name} does not match the corpus manifest (rebuild with 'corpus' and bump CORPUS_VERSION)")
+            sys.exit(1)
+        docs[name] = path.read_text(encoding='utf-8')
+    return manifest, docs
+
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+def _run_stage(stage, kwargs, text):
+    """One stage on materialized text (for per-stage timing)."""
+    if callable(stage.stream):
+        return join_blocks(stage.stream(TextBlocks(text), {}, **kwargs))
+    result = stage.fn(text, **kwargs)
+    return result[0] if isinstance(result, tuple) else result
+
+
+def measure_document(text: str, config: dict, repeat: int) -> dict:
+    active = [(s, s.kwargs(config) if s.kwargs else {}) for s in ord_.STAGES
+              if s.flag is None or config.get(s.flag, True)]
+
+    # Per-stage wall time: stages run one after another on full text
+    stage_times = {s.name: [] for s, _ in active}
+    for _ in range(repeat):
+        current = text
+        for stage, kwargs in active:
+            start = time.perf_counter()
+            current = _run_stage(stage, kwargs, current)
+            stage_times[stage.name].append(time.perf_counter() - start)
+
+    # End-to-end (the streaming pipeline as process_file runs it)
+    totals = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        optimized, report = ord_.optimize_markdown(text, config)
+        totals.append(time.perf_counter() - start)
+
+    # Peak memory in a separate pass (tracing slows everything down)
+    tracemalloc.start()
+    ord_.optimize_markdown(text, config)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    passed, issues = ord_.validate_quality(text, optimized)
+    # validate_quality's number check, as a count (finer than pass/fail)
+    lost = {n for n in ord_.extract_numbers(text) - ord_.extract_numbers(optimized) if n not in optimized}
+    return {
+        "bytes": len(text.encode('utf-8')),
+        "tokens_before": report["original_tokens"],
+        "tokens_after": report["optimized_tokens"],
+        "reduction": round(report["reduction"], 4),
+        "quality_passed": passed,
+        "quality_issues": issues,
+        "numbers_lost": len(lost),
+        "time_s": round(statistics.median(totals), 4),
+        "peak_memory_bytes": peak,
+        "stage_time_s": {name: round(statistics.median(ts), 4) for name, ts in stage_times.items()},
+    }
+
+
+def run_benchmark(args) -> dict:
+    manifest, docs = load_corpus()
+    config = dict(ord_.PIPELINE_CONFIG, redundancy_method="exact")
+    # Warm-up: tokenizer load, regex compilation
+    ord_.optimize_markdown(next(iter(docs.values())), config)
+
+    results = {}
+    for name, text in docs.items():
+        print(f"├── {name}")
+        results[name] = r = measure_document(text, config, args.repeat)
+        print(f"│   └── {r['time_s']:.3f}s, peak {r['peak_memory_bytes'] / 1e6:.1f} MB, "
+              f"reduction {r['reduction']:.1%}, numbers lost {r['numbers_lost']}, quality {'PASS' if r['quality_passed'] else 'FAIL'}")
+
+    stage_totals = {}
+    for r in results.values():
+        for stage, t in r["stage_time_s"].items():
+            stage_totals[stage] = round(stage_totals.get(stage, 0) + t, 4)
+    summary = {
+        "documents": len(results),
+        "total_time_s": round(sum(r["time_s"] for r in results.values()), 4),
+        "max_peak_memory_bytes": max(r["peak_memory_bytes"] for r in results.values()),
+        "mean_reduction": round(statistics.mean(r["reduction"] for r in results.values()), 4),
+        "quality_pass_rate": round(sum(r["quality_passed"] for r in results.values()) / len(results), 4),
+        "numbers_lost": sum(r["numbers_lost"] for r in results.values()),
+        "stage_time_s": stage_totals,
+    }
+    encoder = token_budget.get_encoder(token_budget.encoding_name_for("gpt-4"))
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "corpus_version": manifest["version"],
+        "encoding": token_budget.encoding_name_for("gpt-4") if encoder else "estimate",
+        "repeat": args.repeat,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "summary": summary,
+        "documents": results,
+    }
+
+
+# ==========================================
+# COMPARISON
+# ==========================================
+def compare_results(baseline: dict, current: dict, args) -> list:
+    """List of regression messages (empty = within tolerance)."""
+    problems = []
+    if baseline["corpus_version"] != current["corpus_version"]:
+        return [f"corpus version differs (baseline v{baseline['corpus_version']}, "
+                f"current v{current['corpus_version']}); save a new baseline"]
+    if baseline["encoding"] != current["encoding"]:
+        return [f"token encoding differs ({baseline['encoding']} vs {current['encoding']})"]
+
+    def slower(label, old, new, tolerance, floor=0.0):
+        if old > 0 and new > old * (1 + tolerance) and new - old > floor:
+            problems.append(f"{label}: {old:.4g} -> {new:.4g} (+{new / old - 1:.0%}, tolerance {tolerance:.0%})")
+
+    for name, old in baseline["documents"].items():
+        new = current["documents"].get(name)
+        if new is None:
+            problems.append(f"{name}: missing from current run")
+            continue
+        slower(f"{name} time_s", old["time_s"], new["time_s"], args.time_tolerance, TIME_FLOOR_S)
+        slower(f"{name} peak_memory_bytes", old["peak_memory_bytes"], new["peak_memory_bytes"],
+               args.memory_tolerance)
+        if new["reduction"] < old["reduction"] - args.reduction_tolerance:
+            problems.append(f"{name} reduction: {old['reduction']:.1%} -> {new['reduction']:.1%}")
+        if old["quality_passed"] and not new["quality_passed"]:
+            problems.append(f"{name} quality: PASS -> FAIL ({'; '.join(new['quality_issues'])})")
+        if new["numbers_lost"] > old["numbers_lost"]:
+            problems.append(f"{name} numbers lost: {old['numbers_lost']} -> {new['numbers_lost']}")
+
+    for stage, old_t in baseline["summary"]["stage_time_s"].items():
+        new_t = current["summary"]["stage_time_s"].get(stage)
+        if new_t is not None:
+            slower(f"stage {stage} time_s", old_t, new_t, args.time_tolerance, TIME_FLOOR_S)
+    return problems
+
+
+def print_comparison(baseline: dict, current: dict) -> None:
+    b, c = baseline["summary"], current["summary"]
+    print(f"{'metric':<28}{'baseline':>14}{'current':>14}")
+    rows = [
+        ("total_time_s", b["total_time_s"], c["total_time_s"], "{:.3f}"),
+        ("max_peak_memory_MB", b["max_peak_memory_bytes"] / 1e6, c["max_peak_memory_bytes"] / 1e6, "{:.1f}"),
+        ("mean_reduction", b["mean_reduction"], c["mean_reduction"], "{:.1%}"),
+        ("quality_pass_rate", b["quality_pass_rate"], c["quality_pass_rate"], "{:.0%}"),
+        ("numbers_lost", b["numbers_lost"], c["numbers_lost"], "{:d}"),
+    ]
+    rows += [(f"  {stage}", t, c["stage_time_s"].get(stage, 0.0), "{:.4f}")
+             for stage, t in b["stage_time_s"].items()]
+    for label, old, new, fmt in rows:
+        print(f"{label:<28}{fmt.format(old):>14}{fmt.format(new):>14}")
+
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="Benchmark / regression harness for optimize_research_data.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_corpus = sub.add_parser("corpus", help="(Re)build the benchmark corpus")
+    p_corpus.add_argument("--sections", type=int, default=30,
+                          help="Sections per synthetic document (default: 30)")
+
+    p_run = sub.add_parser("run", help="Run the benchmark and print/save results")
+    p_run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                       help=f"Timed repetitions per document, median kept (default: {DEFAULT_REPEAT})")
+    p_run.add_argument("--save", metavar="NAME", help=f"Save as {BASELINE_DIR}/NAME.json")
+    p_run.add_argument("--output", help="Write results JSON to this path")
+
+    p_cmp = sub.add_parser("compare", help="Compare a run against a baseline; exit 1 on regression")
+    p_cmp.add_argument("--baseline", default=str(BASELINE_DIR / "baseline.json"))
+    p_cmp.add_argument("--current", help="Results JSON to compare (default: run the benchmark now)")
+    p_cmp.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    p_cmp.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    p_cmp.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    p_cmp.add_argument("--reduction-tolerance", type=float, default=REDUCTION_TOLERANCE)
+
+    args = parser.parse_args()
+
+    if args.command == "corpus":
+        build_corpus(args)
+        return
+
+    if args.command == "run":
+        results = run_benchmark(args)
+        s = results["summary"]
+        print(f"└── {s['documents']} docs, {s['total_time_s']:.3f}s, pass rate {s['quality_pass_rate']:.0%}, "
+              f"mean reduction {s['mean_reduction']:.1%}")
+        paths = [Path(args.output)] if args.output else []
+        if args.save:
+            paths.append(BASELINE_DIR / f"{args.save}.json")
+        for path in paths:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+            print(f"Saved: {path}")
+        return
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"❌ Baseline not found: {baseline_path} (create one with: run --save baseline)")
+        sys.exit(1)
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    current = (json.loads(Path(args.current).read_text(encoding='utf-8')) if args.current
+               else run_benchmark(args))
+    print_comparison(baseline, current)
+    problems = compare_results(baseline, current, args)
+    if problems:
+        print(f"\n❌ {len(problems)} regression(s):")
+        for p in problems:
+            print(f"  - {p}")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
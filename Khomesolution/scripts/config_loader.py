@@ -10,6 +10,7 @@ Usage:
 
     openrouter = get_openrouter_config()       # api_key, api_url, http_referer
     cfg        = get_model_config("title_analysis")  # model, temperature, ...
+    prices     = get_pricing()                 # {model: {input, output}} USD per 1M tokens
     prompt     = load_prompt("title_analysis_system.md")  # raw string
 """
 
@@ -71,6 +72,15 @@ def get_model_config(task_name: str) -> Dict[str, Any]:
     return models[task_name]
 
 
+def get_pricing() -> Dict[str, Dict[str, float]]:
+    """Return per-model prices from the 'pricing' section.
+
+    Returns dict of model -> {"input": USD per 1M tokens, "output": USD per 1M tokens}
+    """
+    cfg = _load_config()
+    return cfg.get("pricing") or {}
+
+
 _prompt_cache: Dict[str, str] = {}
 
 
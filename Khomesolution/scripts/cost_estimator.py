@@ -0,0 +1,230 @@
+"""
+Dry-run cost and wall-time estimates from the prompts a run would send.
+
+Stages render each keyword's real system + user prompt from the inputs on
+disk and hand it to a ``CostEstimator``; input tokens are counted with
+token_budget.count_tokens.  What the prompt cannot tell comes from past
+runs -- the ``api_usage`` events every live request writes to logs/*.log:
+
+    output tokens   mean completion tokens per keyword for the same task
+                    and model, else DEFAULT_OUTPUT_TOKENS (capped at the
+                    request's max_tokens)
+    latency         median seconds per completion token, else
+                    DEFAULT_OUTPUT_TPS tokens per second
+    price           ``pricing:`` in config.yaml, USD per 1M tokens per model
+
+Wall time assumes ``concurrency`` keywords in flight, each running its
+requests one after another, and never beats the stage's requests-per-minute
+limit.
+
+Usage in a stage:
+    from cost_estimator import CostEstimator
+
+    est = CostEstimator(concurrency=10, rpm=60)
+    req = est.request("title_analysis", MODEL, [SYSTEM_PROMPT, user_prompt], max_tokens=8000)
+    est.add_job([req])
+    est.print_report("Phase 2.1: SERP Analysis")
+
+    # after every live request
+    log_json(logger, "api_usage", {"task": "title_analysis", "model": MODEL, "keywords": 1,
+                                   "latency_s": 12.3, **usage})
+
+Usage history (from the Khomesolution folder):
+    python scripts/cost_estimator.py
+    python scripts/cost_estimator.py --log-dir logs --task outline_generation
+"""
+
+import sys
+import json
+import argparse
+import statistics
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config_loader import get_pricing
+from token_budget import count_tokens
+
+LOG_DIR = Path("logs")
+USAGE_EVENT = "api_usage"
+
+DEFAULT_OUTPUT_TOKENS = 1500    # per keyword, for a task/model with no usage history
+DEFAULT_OUTPUT_TPS = 40.0       # completion tokens per second without history
+MESSAGE_OVERHEAD_TOKENS = 4     # chat-format tokens added per message
+
+
+# ==========================================
+# USAGE HISTORY
+# ==========================================
+def iter_usage_events(log_dir=LOG_DIR):
+    """``api_usage`` events from every JSON-lines log in ``log_dir``."""
+    for path in sorted(Path(log_dir).glob("*.log")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if USAGE_EVENT not in line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("event") == USAGE_EVENT and entry.get("completion_tokens"):
+                        yield entry
+        except OSError:
+            continue
+
+
+def usage_history(log_dir=LOG_DIR) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Per (task, model): requests seen, mean completion tokens per keyword,
+    median seconds per completion token and mean prompt tokens."""
+    samples: Dict[Tuple[str, str], Dict[str, List[float]]] = {}
+    for e in iter_usage_events(log_dir):
+        s = samples.setdefault((e.get("task", ""), e.get("model", "")),
+                               {"output": [], "spt": [], "prompt": []})
+        keywords = max(1, int(e.get("keywords", 1)))
+        s["output"].append(e["completion_tokens"] / keywords)
+        s["prompt"].append(e.get("prompt_tokens", 0) / keywords)
+        if e.get("latency_s"):
+            s["spt"].append(e["latency_s"] / e["completion_tokens"])
+
+    return {key: {"requests": len(s["output"]),
+                  "output_per_keyword": statistics.fmean(s["output"]),
+                  "prompt_per_keyword": statistics.fmean(s["prompt"]),
+                  "seconds_per_token": statistics.median(s["spt"]) if s["spt"] else None}
+            for key, s in samples.items()}
+
+
+# ==========================================
+# ESTIMATOR
+# ==========================================
+class CostEstimator:
+    def __init__(self, concurrency: int, rpm: int = 0, log_dir=LOG_DIR):
+        self.concurrency = max(1, concurrency)
+        self.rpm = rpm
+        self.history = usage_history(log_dir)
+        self.pricing = get_pricing()
+        self.tasks: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.job_seconds: List[float] = []
+
+    def request(self, task: str, model: str, prompts: Sequence[str], max_tokens: int = 0,
+                keywords: int = 1, output_tokens: Optional[int] = None,
+                extra_tokens: int = 0) -> Dict[str, Any]:
+        """Estimate one request from its rendered messages.
+
+        ``keywords`` > 1 for a packed request; ``output_tokens`` overrides
+        the history-based prediction; ``extra_tokens`` is prompt content
+        that cannot be rendered yet (e.g. the previous request's output).
+        """
+        hist = self.history.get((task, model))
+        input_tokens = extra_tokens + sum(count_tokens(p, model) + MESSAGE_OVERHEAD_TOKENS for p in prompts)
+        if output_tokens is None:
+            per_keyword = hist["output_per_keyword"] if hist else DEFAULT_OUTPUT_TOKENS
+            output_tokens = round(per_keyword * keywords)
+            if max_tokens:
+                output_tokens = min(output_tokens, max_tokens)
+        spt = hist["seconds_per_token"] if hist and hist["seconds_per_token"] else 1 / DEFAULT_OUTPUT_TPS
+
+        price = self.pricing.get(model)
+        cost = None
+        if price:
+            cost = (input_tokens * price.get("input", 0) + output_tokens * price.get("output", 0)) / 1_000_000
+        return {"task": task, "model": model, "keywords": keywords, "input_tokens": input_tokens,
+                "output_tokens": output_tokens, "latency_s": output_tokens * spt, "cost": cost}
+
+    def add_job(self, requests: Sequence[Dict[str, Any]]) -> None:
+        """Add one unit of work (a keyword or a pack) whose requests run in sequence."""
+        for r in requests:
+            t = self.tasks.setdefault((r["task"], r["model"]), {
+                "requests": 0, "keywords": 0, "input_tokens": 0, "output_tokens": 0,
+                "cost": 0.0, "priced": r["cost"] is not None})
+            t["requests"] += 1
+            t["keywords"] += r["keywords"]
+            t["input_tokens"] += r["input_tokens"]
+            t["output_tokens"] += r["output_tokens"]
+            t["cost"] += r["cost"] or 0.0
+        self.job_seconds.append(sum(r["latency_s"] for r in requests))
+
+    def summary(self) -> Dict[str, Any]:
+        requests = sum(t["requests"] for t in self.tasks.values())
+        wall = max(sum(self.job_seconds) / self.concurrency, max(self.job_seconds, default=0.0))
+        if self.rpm:
+            wall = max(wall, requests * 60.0 / self.rpm)
+
+        tasks = []
+        for (task, model), t in self.tasks.items():
+            hist = self.history.get((task, model))
+            tasks.append({"task": task, "model": model, **t,
+                          "history_requests": hist["requests"] if hist else 0})
+        return {
+            "jobs": len(self.job_seconds),
+            "requests": requests,
+            "input_tokens": sum(t["input_tokens"] for t in tasks),
+            "output_tokens": sum(t["output_tokens"] for t in tasks),
+            "cost": round(sum(t["cost"] for t in tasks), 4),
+            "unpriced_models": sorted({t["model"] for t in tasks if not t["priced"]}),
+            "wall_s": round(wall, 1),
+            "concurrency": self.concurrency,
+            "rpm": self.rpm,
+            "tasks": tasks,
+        }
+
+    def print_report(self, title: str) -> Dict[str, Any]:
+        s = self.summary()
+        print("\n" + "=" * 55)
+        print(f"  {title} - Cost Estimate")
+        print("=" * 55)
+        print(f"  Requests:               {s['requests']:,} ({s['jobs']:,} keywords/packs)")
+        for t in s["tasks"]:
+            source = (f"history: {t['history_requests']:,} requests" if t["history_requests"]
+                      else f"no history, {DEFAULT_OUTPUT_TOKENS:,}/keyword assumed")
+            print(f"  ├── {t['task']} ({t['model']})")
+            print(f"  │   ├── input:  {t['input_tokens']:,} tokens (rendered prompts)")
+            print(f"  │   ├── output: {t['output_tokens']:,} tokens ({source})")
+            print("  │   └── cost:   " + (f"${t['cost']:.4f}" if t["priced"] else "no price in config.yaml"))
+        print(f"  Est. input tokens:      {s['input_tokens']:,}")
+        print(f"  Est. output tokens:     {s['output_tokens']:,}")
+        print(f"  Est. TOTAL cost:        ${s['cost']:.4f}"
+              + (f" (+ unpriced: {', '.join(s['unpriced_models'])})" if s["unpriced_models"] else ""))
+        print(f"  Est. wall time:         {_fmt_duration(s['wall_s'])} "
+              f"(concurrency {s['concurrency']}" + (f", {s['rpm']} rpm)" if s["rpm"] else ")"))
+        print("=" * 55)
+        return s
+
+
+def _fmt_duration(seconds: float) -> str:
+    minutes, sec = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m {sec:02d}s" if hours else f"{minutes}m {sec:02d}s"
+
+
+# ==========================================
+# CLI
+# ==========================================
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="API usage history behind the dry-run cost estimates")
+    parser.add_argument("--log-dir", default=str(LOG_DIR), help=f"JSON-lines logs (default: {LOG_DIR})")
+    parser.add_argument("--task", help="Only this task (e.g. title_analysis)")
+    args = parser.parse_args()
+
+    history = usage_history(args.log_dir)
+    if args.task:
+        history = {k: v for k, v in history.items() if k[0] == args.task}
+    if not history:
+        print(f"No {USAGE_EVENT} events in {args.log_dir}/*.log "
+              f"(estimates use {DEFAULT_OUTPUT_TOKENS:,} output tokens/keyword, {DEFAULT_OUTPUT_TPS:.0f} tokens/s)")
+        return
+
+    pricing = get_pricing()
+    for (task, model), h in sorted(history.items()):
+        tps = f"{1 / h['seconds_per_token']:.0f} tokens/s" if h["seconds_per_token"] else "no latency"
+        price = pricing.get(model)
+        print(f"├── {task} ({model}): {h['requests']:,} requests")
+        print(f"│   ├── per keyword: ~{h['prompt_per_keyword']:,.0f} prompt → "
+              f"~{h['output_per_keyword']:,.0f} completion tokens, {tps}")
+        print("│   └── price: " + (f"${price.get('input', 0)}/M in, ${price.get('output', 0)}/M out"
+                                   if price else "not in config.yaml"))
+    print(f"└── {args.log_dir}")
+
+
+if __name__ == "__main__":
+    main()
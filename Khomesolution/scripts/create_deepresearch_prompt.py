@@ -1,9 +1,7 @@
 import os
-import json
 import asyncio
 import argparse
 import aiohttp
-import time
 from typing import List, Dict, Optional
 from pathlib import Path
 
@@ -11,6 +9,9 @@ from pathlib import Path
 # CONFIGURATION & CONSTANTS (loaded from config.yaml)
 # ==========================================
 from config_loader import get_openrouter_config, get_model_config, load_prompt
+from dep_tracker import DepTracker
+from job_store import JobStore
+from outline_tree import parse_outline
 
 _or_cfg = get_openrouter_config()
 _model_cfg = get_model_config("deepresearch_prompt")
@@ -27,6 +28,7 @@ DR_MAX_CONCURRENCY = _model_cfg.get("max_concurrency", 8)
 DR_X_TITLE = _model_cfg.get("x_title", "Privato Content Pipeline")
 
 SYSTEM_PROMPT = load_prompt("deepresearch_prompt_system.md")
+STAGE = "deepresearch_prompt"
 
 # ==========================================
 # HELPER CLASSES & FUNCTIONS
@@ -38,8 +40,13 @@ class ResearchPipeline:
         self.max_concurrency = args.max_concurrency
         self.timeout = args.timeout
         self.incremental = args.incremental
+        self.stale_only = args.stale_only
+        self.deps = DepTracker(STAGE, prompts=["deepresearch_prompt_system.md"],
+                               config=["deepresearch_prompt"])
         self.base_output_dir = Path("output")
-        self.checkpoint_file = Path("checkpoints/deepresearch_checkpoint.json")
+        self.checkpoint_file = Path("checkpoints/deepresearch_checkpoint.json")  # legacy, imported into the job store
+        self.jobs = JobStore()
+        self.jobs.import_checkpoint(STAGE, self.checkpoint_file)
         self.semaphore = asyncio.Semaphore(self.max_concurrency)
         
         # Ensure directories exist
@@ -55,22 +62,6 @@ class ResearchPipeline:
         with open(path, 'r', encoding='utf-8') as f:
             return [line.strip() for line in f if line.strip() and not line.startswith('#')]
 
-    def load_checkpoint(self) -> List[str]:
-        """Load list of completed keywords."""
-        if self.checkpoint_file.exists():
-            try:
-                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get("completed", [])
-            except json.JSONDecodeError:
-                return []
-        return []
-
-    def save_checkpoint(self, completed_keywords: List[str]):
-        """Save progress to JSON."""
-        with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
-            json.dump({"completed": completed_keywords, "timestamp": time.time()}, f, indent=2)
-
     async def call_openrouter(self, messages: List[Dict]) -> Optional[str]:
         """Call OpenRouter API with retry logic."""
         headers = {
@@ -122,14 +113,25 @@ class ResearchPipeline:
             # 1. Validate Input
             if not input_file.exists():
                 print(f"[{keyword}] Skipped: Outline file not found.")
+                self.jobs.skip(STAGE, keyword, "outline not found")
                 return False
 
-            # 2. Check Incremental Skip
-            if self.incremental and output_file.exists():
+            # 2. Check Stale / Incremental Skip
+            if self.stale_only:
+                if self.deps.skip_if_fresh(output_file, [input_file]):
+                    print(f"[{keyword}] Skipped: Up to date.")
+                    if not self.jobs.is_done(STAGE, keyword):
+                        self.jobs.finish(STAGE, keyword)
+                    return True
+                print(f"[{keyword}] Stale: {self.deps.check(output_file, [input_file])}")
+            elif self.incremental and output_file.exists():
                 print(f"[{keyword}] Skipped: Output already exists.")
+                if not self.jobs.is_done(STAGE, keyword):
+                    self.jobs.finish(STAGE, keyword)
                 return True
 
             print(f"[{keyword}] Processing...")
+            self.jobs.start(STAGE, keyword)
 
             # 3. Read Outline
             try:
@@ -137,12 +139,18 @@ class ResearchPipeline:
                     outline_content = f.read()
             except Exception as e:
                 print(f"[{keyword}] Error reading outline: {e}")
+                self.jobs.fail(STAGE, keyword, f"read outline: {e}")
                 return False
 
-            # 4. Construct Prompt
+            # 4. Construct Prompt (headings + marker comments only; nothing to send without headings)
+            tree = parse_outline(outline_content)
+            if not tree.headings:
+                print(f"[{keyword}] Failed: Outline has no headings.")
+                self.jobs.fail(STAGE, keyword, "outline has no headings")
+                return False
             messages = [
                 {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": f"KEYWORD: {keyword}\n\nOUTLINE_TEXT:\n{outline_content}"}
+                {"role": "user", "content": f"KEYWORD: {keyword}\n\nOUTLINE_TEXT:\n{tree.render()}"}
             ]
 
             # 5. Call AI
@@ -150,6 +158,7 @@ class ResearchPipeline:
             
             if not response_content:
                 print(f"[{keyword}] Failed: No response from API.")
+                self.jobs.fail(STAGE, keyword, "no response from API")
                 return False
 
             # 6. Save Output
@@ -157,10 +166,13 @@ class ResearchPipeline:
                 keyword_dir.mkdir(parents=True, exist_ok=True)
                 with open(output_file, 'w', encoding='utf-8') as f:
                     f.write(response_content)
+                self.deps.record(output_file, [input_file])
+                self.jobs.finish(STAGE, keyword)
                 print(f"[{keyword}] Success: Research prompt generated.")
                 return True
             except Exception as e:
                 print(f"[{keyword}] Error saving output: {e}")
+                self.jobs.fail(STAGE, keyword, f"save output: {e}")
                 return False
 
     async def run(self, keywords_file: str):
@@ -170,11 +182,13 @@ class ResearchPipeline:
             return
 
         all_keywords = self.load_keywords(keywords_file)
-        completed_keywords = self.load_checkpoint()
+        self.jobs.add_pending(STAGE, all_keywords)
         
         # Filter if incremental, though process_keyword also checks file existence
-        # This helps strictly with the checkpoint list
-        if self.incremental:
+        # This helps strictly with the job store
+        # (--stale-only decides per keyword from content hashes instead)
+        if self.incremental and not self.stale_only:
+            completed_keywords = self.jobs.done_set(STAGE)
             keywords_to_process = [k for k in all_keywords if k not in completed_keywords]
         else:
             keywords_to_process = all_keywords
@@ -189,15 +203,11 @@ class ResearchPipeline:
             print(f"\n--- Processing Chunk {i//self.chunk_size + 1} ({len(chunk)} items) ---")
             
             tasks = [self.process_keyword(kw) for kw in chunk]
-            results = await asyncio.gather(*tasks)
-            
-            # Update Checkpoint per chunk
-            for kw, success in zip(chunk, results):
-                if success and kw not in completed_keywords:
-                    completed_keywords.append(kw)
-            
-            self.save_checkpoint(completed_keywords)
-            print(f"Checkpoint saved. Progress: {len(completed_keywords)}/{len(all_keywords)}")
+            await asyncio.gather(*tasks)
+
+            # Job states are saved per keyword as they finish
+            done = len(self.jobs.done_set(STAGE) & set(all_keywords))
+            print(f"Progress: {done}/{len(all_keywords)}")
 
 # ==========================================
 # MAIN ENTRY POINT
@@ -212,6 +222,8 @@ if __name__ == "__main__":
     parser.add_argument("--max-concurrency", type=int, default=DR_MAX_CONCURRENCY, help="Parallel API requests")
     parser.add_argument("--timeout", type=int, default=90, help="HTTP timeout per request (seconds)")
     parser.add_argument("--incremental", action="store_true", help="Skip keywords with existing outputs")
+    parser.add_argument("--stale-only", action="store_true",
+                        help="Only regenerate prompts whose outline/prompt/config/code changed")
 
     args = parser.parse_args()
 
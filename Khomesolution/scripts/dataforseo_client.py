@@ -0,0 +1,100 @@
+"""
+Shared async DataForSEO request path.
+
+Used by ranked_keywords_dataforseo.py and enrich_queries_dataforseo.py.
+One POST per task (the ``live`` endpoints accept a single task per call),
+bounded by a shared semaphore, with exponential-backoff retry on HTTP
+429/5xx, network errors and DataForSEO's rate-limit/busy status codes.
+
+``api_base`` can point at a local stand-in server; ``record_dir`` dumps
+every raw response so a stand-in can replay them.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+
+import aiohttp
+from dotenv import load_dotenv
+
+API_BASE = "https://api.dataforseo.com"
+LOCATION_CODE = 2764          # Thailand
+LANGUAGE_CODE = "th"
+
+MAX_RETRIES = 3
+RETRY_STATUS_CODES = {40202, 40209, 50000, 50301}   # rate limit / busy / internal
+STATUS_OK = 20000
+
+
+def load_credentials():
+    """DATAFORSEO_LOGIN / DATAFORSEO_PASSWORD from ``User & Password.env``."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    env_name = "User & Password.env"
+    for path in (os.path.join(current_dir, env_name),
+                 os.path.join(current_dir, "..", env_name),
+                 os.path.join(os.getcwd(), env_name)):
+        if os.path.exists(path):
+            load_dotenv(path)
+            break
+    return os.getenv("DATAFORSEO_LOGIN"), os.getenv("DATAFORSEO_PASSWORD")
+
+
+class DataForSEOClient:
+    def __init__(self, session, api_base=API_BASE, semaphore=None, record_dir=None):
+        self.session = session
+        self.api_base = api_base.rstrip("/")
+        self.semaphore = semaphore or asyncio.Semaphore(5)
+        self.record_dir = record_dir
+        self.requests_made = 0
+
+    async def post(self, endpoint, payload, record_key=None):
+        """POST one task; returns (response, first task, status_code)."""
+        url = self.api_base + endpoint
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                async with self.semaphore:
+                    async with self.session.post(url, json=payload) as resp:
+                        self.requests_made += 1
+                        if resp.status == 429 or resp.status >= 500:
+                            raise aiohttp.ClientResponseError(
+                                resp.request_info, resp.history, status=resp.status,
+                                message=f"HTTP {resp.status}")
+                        data = await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                wait = 2 ** attempt
+                print(f"    ⚠️ {e} -- retry {attempt}/{MAX_RETRIES} in {wait}s")
+                await asyncio.sleep(wait)
+                continue
+
+            tasks = data.get("tasks") or []
+            task = tasks[0] if tasks else {}
+            status = task.get("status_code") or data.get("status_code")
+            if status in RETRY_STATUS_CODES and attempt < MAX_RETRIES:
+                wait = 2 ** attempt
+                print(f"    ⏳ status {status} -- retry {attempt}/{MAX_RETRIES} in {wait}s")
+                await asyncio.sleep(wait)
+                continue
+            self._record(endpoint, record_key, payload, data)
+            return data, task, status
+        return {}, {}, None
+
+    async def post_ok(self, endpoint, payload, record_key=None):
+        """Like post() but raises RuntimeError unless the task succeeded."""
+        data, task, status = await self.post(endpoint, payload, record_key)
+        if status != STATUS_OK:
+            msg = task.get("status_message") or data.get("status_message", "unknown")
+            raise RuntimeError(f"status {status}: {msg}")
+        return task
+
+    def _record(self, endpoint, record_key, payload, data):
+        if not self.record_dir:
+            return
+        os.makedirs(self.record_dir, exist_ok=True)
+        key = record_key or json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha1(f"{endpoint}|{key}".encode("utf-8")).hexdigest()[:16]
+        with open(os.path.join(self.record_dir, f"{digest}.json"), "w", encoding="utf-8") as f:
+            json.dump({"endpoint": endpoint, "key": key, "request": payload, "response": data},
+                      f, ensure_ascii=False, indent=2)
@@ -0,0 +1,113 @@
+"""
+Replay server for recorded DataForSEO responses.
+
+dataforseo_client.py with ``record_dir`` saves every raw response as
+``{digest}.json`` = ``{"endpoint", "key", "request", "response"}``.  This
+server answers a POST with the recorded response for the same endpoint and
+request payload, so ranked_keywords_dataforseo.py / enrich_queries_dataforseo.py
+run end to end without credentials or network (``--api-base``, or
+``--replay DIR`` which starts it in-process).  A request with no recording
+gets a DataForSEO-shaped 40400 task error.
+
+A small recording of ranked_keywords for the competitions fixture
+(tests/fixtures/ahrefs/research) ships in tests/fixtures/dataforseo.
+
+Usage:
+    python scripts/ranked_keywords_dataforseo.py --record-dir recordings/        # record (live API)
+    python scripts/dataforseo_replay.py recordings/ --port 8080                   # replay
+    python scripts/ranked_keywords_dataforseo.py --api-base http://127.0.0.1:8080
+    python scripts/ranked_keywords_dataforseo.py --replay tests/fixtures/dataforseo \\
+        --dir tests/fixtures/ahrefs/research --output-dir /tmp/exports
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from aiohttp import web
+
+FIXTURE_DIR = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "dataforseo"
+STATUS_NOT_RECORDED = 40400
+
+
+def _request_key(endpoint: str, payload: Any) -> Tuple[str, str]:
+    return endpoint, json.dumps(payload, ensure_ascii=False, sort_keys=True)
+
+
+def load_recordings(record_dir) -> Dict[Tuple[str, str], Any]:
+    """``{(endpoint, canonical payload): response}`` from every recording in ``record_dir``."""
+    recordings = {}
+    for path in sorted(Path(record_dir).glob("*.json")):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            recordings[_request_key(data["endpoint"], data["request"])] = data["response"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Skipping recording {path.name}: {e}")
+    return recordings
+
+
+def _not_recorded(endpoint: str) -> Dict[str, Any]:
+    message = f"No recorded response for {endpoint} with this payload"
+    return {"status_code": STATUS_NOT_RECORDED, "status_message": message, "tasks_count": 1,
+            "tasks": [{"status_code": STATUS_NOT_RECORDED, "status_message": message, "result": None}]}
+
+
+def make_app(record_dir) -> web.Application:
+    recordings = load_recordings(record_dir)
+    stats = {"hits": 0, "misses": 0}
+
+    async def replay(request):
+        endpoint = "/" + request.match_info["endpoint"]
+        payload = await request.json()
+        response = recordings.get(_request_key(endpoint, payload))
+        if response is None:
+            stats["misses"] += 1
+            return web.json_response(_not_recorded(endpoint))
+        stats["hits"] += 1
+        return web.json_response(response)
+
+    app = web.Application()
+    app["recordings"] = recordings
+    app["stats"] = stats
+    app.router.add_post("/{endpoint:.+}", replay)
+    return app
+
+
+async def start(record_dir, host: str = "127.0.0.1", port: int = 0):
+    """Start the server; returns ``(runner, api_base)`` (``runner.cleanup()`` stops it)."""
+    runner = web.AppRunner(make_app(record_dir))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, f"http://{host}:{runner.addresses[0][1]}"
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="Replay recorded DataForSEO responses")
+    parser.add_argument("record_dir", nargs="?", default=str(FIXTURE_DIR),
+                        help=f"Directory written by --record-dir (default: {FIXTURE_DIR})")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    async def serve():
+        runner, api_base = await start(args.record_dir, args.host, args.port)
+        count = len(runner.app["recordings"])
+        print(f"🧪 Replaying {count} recorded responses from {args.record_dir}")
+        print(f"   --api-base {api_base}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
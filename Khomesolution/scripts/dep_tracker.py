@@ -0,0 +1,294 @@
+"""
+Content-hash dependency tracking for pipeline artifacts (make-style).
+
+Every stage records, for each artifact it writes, the hashes of what the
+artifact was built from:
+
+    inputs   upstream files (SERP JSON, outline, research, HTML ...)
+    prompts  PROMPTS/*.md files the stage loads
+    config   the stage's ``models.<task>`` section(s) of config.yaml
+    code     the stage script and every local module it imported
+    data     data files those modules load: module-level ``Path``s to files
+             in scripts/ (``thai_segmenter.WORDS_PATH``) and module-level
+             lists of ``Path``s (``THAI_EXTRA_WORDS``)
+
+An artifact is stale when it is missing or any of those hashes changed,
+so a rerun with ``--stale-only`` regenerates exactly what is out of date,
+overriding each stage's own file-exists / checkpoint skip.  Artifacts that
+already exist but were never recorded (produced before tracking) are
+adopted on the first ``--stale-only`` run: recorded as-is and skipped.
+Records written before data files were tracked are not invalidated by
+the missing ``data`` section; it is filled in the next time they are built.
+
+Records live in ``<project>/.deps/<stage>/<hash of path>.json`` (one file
+per artifact, written with ``os.replace``).
+
+Usage in a stage:
+    from dep_tracker import DepTracker
+
+    deps = DepTracker("title_analysis", prompts=["title_analysis_user.md"],
+                      config=["title_analysis"])
+    if args.stale_only and deps.skip_if_fresh(output_path, [comp_path, kw_path]):
+        return                                   # up to date
+    ...write output_path...
+    deps.record(output_path, [comp_path, kw_path])
+
+Status (from the Khomesolution folder):
+    python scripts/dep_tracker.py status
+    python scripts/dep_tracker.py status --stage outline_answer --all
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from config_loader import get_model_config
+
+_SCRIPTS_DIR = Path(__file__).resolve().parent
+_PROJECT_ROOT = _SCRIPTS_DIR.parent
+_PROMPTS_DIR = _PROJECT_ROOT / "PROMPTS"
+DEPS_DIR = _PROJECT_ROOT / ".deps"
+KINDS = ("inputs", "prompts", "config", "code", "data")
+
+
+# ==========================================
+# HASHING
+# ==========================================
+_hash_memo: Dict[tuple, str] = {}
+
+
+def file_hash(path) -> Optional[str]:
+    """sha256 of a file (memoized on mtime/size), None if it does not exist."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    if key not in _hash_memo:
+        _hash_memo[key] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return _hash_memo[key]
+
+
+def config_hash(section: str) -> Optional[str]:
+    try:
+        cfg = get_model_config(section)
+    except KeyError:
+        return None
+    return hashlib.sha256(json.dumps(cfg, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _rel(path) -> str:
+    """Project-relative posix path (absolute if outside the project)."""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(_PROJECT_ROOT).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def _abs(rel: str) -> Path:
+    path = Path(rel)
+    return path if path.is_absolute() else _PROJECT_ROOT / path
+
+
+def _local_modules() -> List[Path]:
+    """Files of the running script and the local modules it has imported."""
+    files = set()
+    for module in list(sys.modules.values()):
+        file = getattr(module, "__file__", None)
+        if file and Path(file).resolve().parent == _SCRIPTS_DIR and Path(file).suffix == ".py":
+            files.add(Path(file).resolve())
+    files.discard(Path(__file__).resolve())
+    return sorted(files)
+
+
+def _data_files(modules: Sequence[Path]) -> List[Path]:
+    """Data files referenced by module-level globals of ``modules``."""
+    files = set()
+    wanted = {str(p) for p in modules}
+    for module in list(sys.modules.values()):
+        file = getattr(module, "__file__", None)
+        if not file or str(Path(file).resolve()) not in wanted:
+            continue
+        for value in list(vars(module).values()):
+            if isinstance(value, Path):
+                candidates = [value] if value.resolve().parent == _SCRIPTS_DIR else []
+            elif isinstance(value, (list, tuple)) and value and all(isinstance(v, Path) for v in value):
+                candidates = value
+            else:
+                continue
+            files.update(c.resolve() for c in candidates if c.is_file())
+    return sorted(files)
+
+
+# ==========================================
+# TRACKER
+# ==========================================
+class DepTracker:
+    def __init__(self, stage: str, prompts: Sequence[str] = (), config: Sequence[str] = (),
+                 code: Optional[Sequence] = None):
+        self.stage = stage
+        self.prompts = list(prompts)
+        self.config = list(config)
+        self.code = [Path(c) for c in code] if code is not None else _local_modules()
+        self.data = _data_files(self.code)
+        self.adopted = 0
+
+    def _record_path(self, artifact) -> Path:
+        name = hashlib.sha1(_rel(artifact).encode("utf-8")).hexdigest()[:20]
+        return DEPS_DIR / self.stage / f"{name}.json"
+
+    def _fingerprint(self, inputs: Iterable) -> Dict[str, Dict[str, Optional[str]]]:
+        return {
+            "inputs": {_rel(p): file_hash(p) for p in inputs},
+            "prompts": {_rel(_PROMPTS_DIR / p): file_hash(_PROMPTS_DIR / p) for p in self.prompts},
+            "config": {s: config_hash(s) for s in self.config},
+            "code": {_rel(p): file_hash(p) for p in self.code},
+            "data": {_rel(p): file_hash(p) for p in self.data},
+        }
+
+    def load(self, artifact) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._record_path(artifact).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def record(self, artifact, inputs: Iterable = ()) -> None:
+        """Record ``artifact`` as built from ``inputs`` and the current prompts/config/code."""
+        data = {"stage": self.stage, "artifact": _rel(artifact), "artifact_hash": file_hash(artifact),
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                **self._fingerprint(inputs)}
+        path = self._record_path(artifact)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def check(self, artifact, inputs: Iterable = ()) -> Optional[str]:
+        """Why ``artifact`` is stale ("missing", "untracked", "input changed: ..."), or None."""
+        if not Path(artifact).exists():
+            return "missing"
+        record = self.load(artifact)
+        if record is None:
+            return "untracked"
+        current = self._fingerprint(inputs)
+        for kind in KINDS:
+            if kind == "data" and kind not in record:
+                continue                # recorded before data files were tracked
+            reason = _diff(kind, record.get(kind, {}), current[kind])
+            if reason:
+                return reason
+        return None
+
+    def is_fresh(self, artifact, inputs: Iterable = ()) -> bool:
+        return self.check(artifact, inputs) is None
+
+    def skip_if_fresh(self, artifact, inputs: Iterable = ()) -> bool:
+        """``--stale-only`` decision: True when ``artifact`` is up to date.
+
+        An existing artifact with no record is adopted (recorded against the
+        current inputs) and treated as fresh.
+        """
+        inputs = list(inputs)
+        reason = self.check(artifact, inputs)
+        if reason == "untracked":
+            self.record(artifact, inputs)
+            self.adopted += 1
+            return True
+        return reason is None
+
+
+_KIND_LABEL = {"inputs": "input", "prompts": "prompt", "config": "config", "code": "code",
+               "data": "data file"}
+
+
+def _diff(kind: str, recorded: Dict[str, Optional[str]], current: Dict[str, Optional[str]]) -> Optional[str]:
+    label = _KIND_LABEL[kind]
+    for name, h in current.items():
+        if name not in recorded:
+            return f"{label} added: {name}"
+        if recorded[name] != h:
+            return f"{label} {'removed' if h is None else 'changed'}: {name}"
+    for name in recorded:
+        if name not in current:
+            return f"{label} dropped: {name}"
+    return None
+
+
+def stale_reason(record: Dict[str, Any]) -> Optional[str]:
+    """Staleness of a stored record, recomputed from the paths it lists."""
+    if not _abs(record["artifact"]).exists():
+        return "missing"
+    current = {
+        "inputs": {p: file_hash(_abs(p)) for p in record.get("inputs", {})},
+        "prompts": {p: file_hash(_abs(p)) for p in record.get("prompts", {})},
+        "config": {s: config_hash(s) for s in record.get("config", {})},
+        "code": {p: file_hash(_abs(p)) for p in record.get("code", {})},
+        "data": {p: file_hash(_abs(p)) for p in record.get("data", {})},
+    }
+    for kind in KINDS:
+        reason = _diff(kind, record.get(kind, {}), current[kind])
+        if reason:
+            return reason
+    return None
+
+
+def iter_records(stage: Optional[str] = None):
+    stage_dirs = [DEPS_DIR / stage] if stage else sorted(p for p in DEPS_DIR.glob("*") if p.is_dir())
+    for stage_dir in stage_dirs:
+        for path in sorted(stage_dir.glob("*.json")):
+            try:
+                yield json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+
+
+# ==========================================
+# STATUS
+# ==========================================
+def status(stage: Optional[str] = None, show_all: bool = False) -> int:
+    """Print stale artifacts per stage; returns the number of stale artifacts."""
+    by_stage: Dict[str, List[tuple]] = {}
+    for record in iter_records(stage):
+        by_stage.setdefault(record["stage"], []).append((record["artifact"], stale_reason(record)))
+
+    if not by_stage:
+        print(f"No tracked artifacts in {DEPS_DIR}")
+        return 0
+
+    total = stale = 0
+    for name, rows in by_stage.items():
+        n_stale = sum(1 for _, reason in rows if reason)
+        total += len(rows)
+        stale += n_stale
+        print(f"├── {name}: {len(rows)} artifacts, {n_stale} stale")
+        shown = [(a, r) for a, r in rows if r or show_all]
+        for i, (artifact, reason) in enumerate(shown):
+            branch = "└──" if i == len(shown) - 1 else "├──"
+            print(f"│   {branch} {'❌' if reason else '✅'} {artifact}" + (f" — {reason}" if reason else ""))
+    print(f"└── {stale} stale / {total} tracked")
+    return stale
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="Pipeline artifact dependency tracker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_status = sub.add_parser("status", help="List stale artifacts")
+    p_status.add_argument("--stage", help="Only this stage (e.g. title_analysis)")
+    p_status.add_argument("--all", action="store_true", help="Also list up-to-date artifacts")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        stale = status(args.stage, args.all)
+        sys.exit(1 if stale else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Phase 1.4: Search volume + intent enrichment for master queries.
+
+Runs after merge_keyword_ahref_dataforseo.py.  Autocomplete suggestions
+enter the master-queries tables with ``vol=0``, so they always sort to the
+bottom and fall outside the first rows the outline stage reads.  This stage
+collects every zero-volume query across all ``{keyword}-master-queries.csv``
+files (deduped), and sends them in batches of up to 1000 keywords per
+request to:
+
+    keywords_data/google_ads/search_volume/live     -> vol
+    dataforseo_labs/google/search_intent/live       -> intent
+
+Results are cached per query in data/kw-semantic/query_enrichment_cache.json
+with a TTL, so re-running the merge (which resets vol to 0) only costs a
+cache lookup.  The per-keyword and global master-queries CSVs are rewritten
+in place with the enriched ``vol`` and a new ``intent`` column, re-sorted by
+vol/traf.
+
+Usage:
+    python scripts/enrich_queries_dataforseo.py
+    python scripts/enrich_queries_dataforseo.py --ttl-days 60 --dry-run
+    python scripts/enrich_queries_dataforseo.py --api-base http://127.0.0.1:8080   # local stand-in
+"""
+
+import os
+import glob
+import json
+import time
+import asyncio
+import argparse
+from datetime import date
+
+import aiohttp
+import pandas as pd
+
+from merge_keyword_ahref_dataforseo import RESEARCH_DIR, GLOBAL_OUTPUT, clean_keyword
+from dataforseo_client import (
+    API_BASE, LOCATION_CODE, LANGUAGE_CODE, DataForSEOClient, load_credentials,
+)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+CACHE_FILE = "data/kw-semantic/query_enrichment_cache.json"
+
+SEARCH_VOLUME_ENDPOINT = "/v3/keywords_data/google_ads/search_volume/live"
+SEARCH_INTENT_ENDPOINT = "/v3/dataforseo_labs/google/search_intent/live"
+
+BATCH_SIZE = 1000             # API maximum keywords per task
+CACHE_TTL_DAYS = 30
+MAX_CONCURRENCY = 4
+REQUEST_TIMEOUT = 300
+
+# Google Ads rejects longer keywords -- they still get an intent lookup
+ADS_MAX_CHARS = 80
+ADS_MAX_WORDS = 10
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+def load_cache(path=CACHE_FILE):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        print(f"  Cache unreadable, starting empty: {e}")
+        return {}
+
+
+def save_cache(cache, path=CACHE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_fresh(entry, ttl_days, today=None):
+    if not entry:
+        return False
+    try:
+        fetched = date.fromisoformat(entry.get("date", ""))
+    except ValueError:
+        return False
+    return ((today or date.today()) - fetched).days <= ttl_days
+
+
+# ---------------------------------------------------------------------------
+# Master-queries tables
+# ---------------------------------------------------------------------------
+def master_query_files(research_dir=RESEARCH_DIR, global_output=GLOBAL_OUTPUT):
+    files = sorted(glob.glob(os.path.join(research_dir, "*", "*-master-queries.csv")))
+    if os.path.exists(global_output):
+        files.append(global_output)
+    return files
+
+
+def collect_zero_volume_queries(files):
+    """Unique cleaned queries with vol == 0 across all tables."""
+    queries = set()
+    for path in files:
+        df = pd.read_csv(path, encoding="utf-8-sig")
+        if df.empty or "query" not in df.columns:
+            continue
+        zero = df[pd.to_numeric(df["vol"], errors="coerce").fillna(0) == 0]
+        queries.update(q for q in zero["query"].map(clean_keyword) if q)
+    return queries
+
+
+def apply_enrichment(path, cache):
+    """Rewrite one master-queries CSV with cached vol/intent. Returns rows filled."""
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    if df.empty or "query" not in df.columns:
+        return 0
+
+    keys = df["query"].map(clean_keyword)
+    vol = pd.to_numeric(df["vol"], errors="coerce").fillna(0)
+    cached_vol = keys.map(lambda k: (cache.get(k) or {}).get("vol") or 0)
+    filled = int(((vol == 0) & (cached_vol > 0)).sum())
+    df["vol"] = vol.where(vol > 0, cached_vol).astype(int)
+
+    cached_intent = keys.map(lambda k: (cache.get(k) or {}).get("intent") or "")
+    if "intent" in df.columns:
+        df["intent"] = df["intent"].fillna("").where(df["intent"].fillna("") != "", cached_intent)
+    else:
+        df["intent"] = cached_intent
+
+    df = df.sort_values(by=["vol", "traf"], ascending=[False, False], kind="stable")
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+    return filled
+
+
+# ---------------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------------
+def ads_eligible(query):
+    return len(query) <= ADS_MAX_CHARS and len(query.split()) <= ADS_MAX_WORDS
+
+
+def batches(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def fetch_search_volume(client, keywords):
+    """{cleaned keyword: search volume} for one batch."""
+    payload = [{"keywords": keywords, "location_code": LOCATION_CODE, "language_code": LANGUAGE_CODE}]
+    task = await client.post_ok(SEARCH_VOLUME_ENDPOINT, payload, record_key="|".join(keywords))
+    volumes = {}
+    for item in task.get("result") or []:
+        if isinstance(item, dict) and item.get("keyword"):
+            volumes[clean_keyword(item["keyword"])] = int(item.get("search_volume") or 0)
+    return volumes
+
+
+async def fetch_search_intent(client, keywords):
+    """{cleaned keyword: intent label} for one batch."""
+    payload = [{"keywords": keywords, "language_code": LANGUAGE_CODE}]
+    task = await client.post_ok(SEARCH_INTENT_ENDPOINT, payload, record_key="|".join(keywords))
+    intents = {}
+    for result in task.get("result") or []:
+        for item in (result or {}).get("items") or []:
+            label = (item.get("keyword_intent") or {}).get("label")
+            if item.get("keyword") and label:
+                intents[clean_keyword(item["keyword"])] = label
+    return intents
+
+
+async def enrich(pending, cache, args):
+    """Fetch vol + intent for pending queries and store them in cache."""
+    login, password = load_credentials()
+    if not (login and password) and args.api_base == API_BASE:
+        print("❌ Error: DATAFORSEO_LOGIN / DATAFORSEO_PASSWORD not set")
+        return 0
+
+    ads_queries = [q for q in pending if ads_eligible(q)]
+    volumes, intents, failed = {}, {}, 0
+
+    auth = aiohttp.BasicAuth(login or "", password or "")
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    semaphore = asyncio.Semaphore(args.max_concurrency)
+    async with aiohttp.ClientSession(auth=auth, timeout=timeout) as session:
+        client = DataForSEOClient(session, args.api_base, semaphore, args.record_dir)
+
+        async def run(fetch, batch, out):
+            nonlocal failed
+            try:
+                out.update(await fetch(client, batch))
+            except Exception as e:
+                failed += len(batch)
+                print(f"  ❌ {fetch.__name__} batch of {len(batch)}: {e}")
+                return False
+            return True
+
+        vol_jobs = [(b, run(fetch_search_volume, b, volumes)) for b in batches(ads_queries, args.batch_size)]
+        intent_jobs = [(b, run(fetch_search_intent, b, intents)) for b in batches(pending, args.batch_size)]
+        print(f"  Requests: {len(vol_jobs)} search_volume + {len(intent_jobs)} search_intent")
+        results = await asyncio.gather(*(job for _, job in vol_jobs + intent_jobs))
+        print(f"  API requests made: {client.requests_made}")
+
+    vol_ok = {q for (b, _), ok in zip(vol_jobs, results[:len(vol_jobs)]) if ok for q in b}
+    intent_ok = {q for (b, _), ok in zip(intent_jobs, results[len(vol_jobs):]) if ok for q in b}
+
+    # Only cache queries whose requests succeeded; not-returned = 0 / no label
+    today = date.today().isoformat()
+    stored = 0
+    for q in pending:
+        vol_done = q in vol_ok or not ads_eligible(q)
+        if not (vol_done and q in intent_ok):
+            continue
+        cache[q] = {"vol": volumes.get(q, 0), "intent": intents.get(q, ""), "date": today}
+        stored += 1
+    if failed:
+        print(f"  ⚠️ {failed} query lookups failed (will retry next run)")
+    return stored
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description="Phase 1.4: Search volume + intent enrichment for master queries"
+    )
+    parser.add_argument("--dir", default=RESEARCH_DIR,
+                        help=f"Research directory with master-queries CSVs (default: {RESEARCH_DIR})")
+    parser.add_argument("--cache", default=CACHE_FILE,
+                        help=f"Per-query cache file (default: {CACHE_FILE})")
+    parser.add_argument("--ttl-days", type=int, default=CACHE_TTL_DAYS,
+                        help=f"Re-fetch cached queries older than this (default: {CACHE_TTL_DAYS})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Keywords per request, max 1000 (default: {BATCH_SIZE})")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help=f"Concurrent API requests (default: {MAX_CONCURRENCY})")
+    parser.add_argument("--timeout", type=int, default=REQUEST_TIMEOUT,
+                        help=f"Request timeout in seconds (default: {REQUEST_TIMEOUT})")
+    parser.add_argument("--api-base", default=API_BASE,
+                        help=f"API base URL, e.g. a local stand-in server (default: {API_BASE})")
+    parser.add_argument("--record-dir", default=None,
+                        help="Save raw API responses here (for replay by a stand-in server)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report how many queries/requests would be sent, without calling the API")
+    args = parser.parse_args()
+    args.batch_size = max(1, min(args.batch_size, BATCH_SIZE))
+
+    print("Phase 1.4: Master query enrichment (search volume + intent)")
+    print("=" * 60)
+    start = time.time()
+
+    files = master_query_files(args.dir)
+    if not files:
+        print("No master-queries CSVs found. Run merge_keyword_ahref_dataforseo.py first.")
+        return
+
+    cache = load_cache(args.cache)
+    zero_vol = collect_zero_volume_queries(files)
+    pending = sorted(q for q in zero_vol if not is_fresh(cache.get(q), args.ttl_days))
+    print(f"[1] {len(files)} table(s), {len(zero_vol)} zero-volume queries, "
+          f"{len(zero_vol) - len(pending)} cached, {len(pending)} to fetch")
+
+    if args.dry_run:
+        n_batches = -(-len(pending) // args.batch_size)
+        print(f"  [DRY-RUN] Would send ~{n_batches} search_volume + {n_batches} search_intent request(s)")
+        return
+
+    if pending:
+        print("\n[2] Fetching from DataForSEO")
+        stored = asyncio.run(enrich(pending, cache, args))
+        save_cache(cache, args.cache)
+        print(f"  Cached {stored} queries -> {args.cache}")
+
+    print("\n[3] Merging into master-queries tables")
+    total_filled = 0
+    for path in files:
+        filled = apply_enrichment(path, cache)
+        total_filled += filled
+        print(f"  {os.path.relpath(path)}: {filled} row(s) got volume")
+
+    print(f"\nDone in {time.time() - start:.1f}s ({total_filled} rows enriched)")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ from bs4 import BeautifulSoup
 # CONFIGURATION (loaded from config.yaml)
 # ==========================================
 from config_loader import get_openrouter_config, get_model_config, load_prompt
+from dep_tracker import DepTracker
+from offload import LoopLagMonitor, read_text, run_io, shutdown
 
 _or_cfg = get_openrouter_config()
 _model_cfg = get_model_config("first_sentence")
@@ -29,6 +31,9 @@ class FirstSentenceGenerator:
         self.base_dir = Path("output/research")
         self.concurrency = args.concurrency
         self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.stale_only = args.stale_only
+        self.deps = DepTracker("first_sentence", prompts=["first_sentence_system.md"],
+                               config=["first_sentence"])
 
     async def call_gemini(self, html_content: str, keyword: str) -> str:
         """Sends full HTML to Gemini to generate the specific first sentence."""
@@ -109,11 +114,14 @@ class FirstSentenceGenerator:
                 print(f"[{keyword}] Skipped: HTML file not found.")
                 return
 
+            if self.stale_only and await run_io(self.deps.skip_if_fresh, json_path, [html_path]):
+                print(f"[{keyword}] Skipped: Up to date.")
+                return
+
             # LOAD CONTEXT
             try:
-                with open(html_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                
+                html_content = await read_text(html_path)
+
                 # Basic validation: Check if empty or no cues
                 if not html_content or len(html_content) < 50:
                     print(f"[{keyword}] Skipped: HTML content too empty.")
@@ -138,7 +146,8 @@ class FirstSentenceGenerator:
                         sentence = response_obj["first_sentence"]
                         
                         # SAVE JSON
-                        self.save_json_output(json_path, sentence)
+                        await run_io(self.save_json_output, json_path, sentence)
+                        await run_io(self.deps.record, json_path, [html_path])
                         print(f"[{keyword}] Success -> Saved to JSON.")
                     else:
                         print(f"[{keyword}] Error: API returned JSON but missing 'first_sentence' key.")
@@ -166,8 +175,10 @@ class FirstSentenceGenerator:
         print(f"Starting First Sentence Generation for {len(unique_keywords)} keywords.")
         print(f"Model: {MODEL_NAME}")
         
-        tasks = [self.process_keyword(kw) for kw in unique_keywords]
-        await asyncio.gather(*tasks)
+        async with LoopLagMonitor() as lag:
+            tasks = [self.process_keyword(kw) for kw in unique_keywords]
+            await asyncio.gather(*tasks)
+        print(f"Event loop: {lag.report()}")
 
 # ==========================================
 # MAIN ENTRY POINT
@@ -176,6 +187,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="First Sentence Generator (JSON Output)")
     parser.add_argument("--keywords", default="data/keywords/keywords.txt", help="Path to keywords file")
     parser.add_argument("--concurrency", type=int, default=5, help="Concurrency limit")
+    parser.add_argument("--stale-only", action="store_true",
+                        help="Skip keywords whose JSON is up to date with their HTML/prompt/config/code")
     
     args = parser.parse_args()
     
@@ -187,5 +200,8 @@ if __name__ == "__main__":
     # Run Async Loop
     if sys.platform == 'win32':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-        
-    asyncio.run(generator.run(args.keywords))
\ No newline at end of file
+
+    try:
+        asyncio.run(generator.run(args.keywords))
+    finally:
+        shutdown()
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Shared job-state store (SQLite, WAL) for the per-keyword pipeline stages.
+
+One row per (stage, keyword) replaces the JSON ``completed``/``failed``
+checkpoint lists:
+
+    status      pending | running | done | failed | skipped
+    attempts    times the keyword was started
+    started_at / finished_at / duration_s
+    tokens      API tokens used by the last run
+    error       last failure / skip reason
+
+Every update is its own transaction, so a crash loses at most the keyword
+in flight, and lookups go through the (stage, keyword) primary key or the
+(stage, status) index instead of scanning Python lists.  Existing JSON
+checkpoints are imported the first time a stage opens the store.
+
+Usage in a stage:
+    from job_store import JobStore
+
+    jobs = JobStore()
+    jobs.import_checkpoint("title_analysis", "checkpoints/title_analysis_checkpoint.json")
+    if jobs.is_done("title_analysis", keyword): ...
+    jobs.start("title_analysis", keyword)
+    jobs.finish("title_analysis", keyword, tokens=1234)   # or jobs.fail(..., error)
+
+Query CLI (from the Khomesolution folder):
+    python scripts/job_store.py summary
+    python scripts/job_store.py list --stage title_analysis --status failed
+    python scripts/job_store.py list --stage outline_generation --slower-than 60
+    python scripts/job_store.py pending --stage outline_generation --keywords-file data/keywords/keywords.txt
+    python scripts/job_store.py reset --stage title_analysis --status failed
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+DEFAULT_DB_PATH = Path("checkpoints/job_state.db")
+
+STATUSES = ("pending", "running", "done", "failed", "skipped")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    stage       TEXT NOT NULL,
+    keyword     TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    started_at  REAL,
+    finished_at REAL,
+    duration_s  REAL,
+    tokens      INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (stage, keyword)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS jobs_stage_status ON jobs (stage, status);
+CREATE INDEX IF NOT EXISTS jobs_stage_duration ON jobs (stage, duration_s);
+"""
+
+
+class JobStore:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ==========================================
+    # UPDATES (one transaction each)
+    # ==========================================
+    def start(self, stage: str, keyword: str):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (stage, keyword, status, attempts, started_at, updated_at) "
+                "VALUES (?, ?, 'running', 1, ?, ?) "
+                "ON CONFLICT (stage, keyword) DO UPDATE SET status = 'running', "
+                "attempts = attempts + 1, started_at = excluded.started_at, "
+                "finished_at = NULL, error = NULL, updated_at = excluded.updated_at",
+                (stage, keyword, now, now))
+
+    def _finish(self, stage: str, keyword: str, status: str, tokens: int, error: Optional[str]):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (stage, keyword, status, finished_at, tokens, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (stage, keyword) DO UPDATE SET status = excluded.status, "
+                "finished_at = excluded.finished_at, tokens = excluded.tokens, error = excluded.error, "
+                "duration_s = CASE WHEN started_at IS NULL THEN NULL "
+                "                  ELSE excluded.finished_at - started_at END, "
+                "updated_at = excluded.updated_at",
+                (stage, keyword, status, now, tokens, error, now))
+
+    def finish(self, stage: str, keyword: str, tokens: int = 0):
+        self._finish(stage, keyword, "done", tokens, None)
+
+    def fail(self, stage: str, keyword: str, error: str = "", tokens: int = 0):
+        self._finish(stage, keyword, "failed", tokens, str(error)[:500] or None)
+
+    def skip(self, stage: str, keyword: str, reason: str = ""):
+        """Record a keyword the stage could not run (e.g. missing input)."""
+        self._finish(stage, keyword, "skipped", 0, reason or None)
+
+    def requeue(self, stage: str, keyword: str):
+        """Mark one keyword pending again (e.g. its input was just regenerated)."""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (stage, keyword, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (stage, keyword) DO UPDATE SET status = 'pending', error = NULL, "
+                "updated_at = excluded.updated_at",
+                (stage, keyword, now))
+
+    def add_pending(self, stage: str, keywords: Iterable[str]) -> int:
+        now = time.time()
+        with self.conn:
+            cur = self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (stage, keyword, updated_at) VALUES (?, ?, ?)",
+                ((stage, kw, now) for kw in keywords))
+        return cur.rowcount
+
+    def reset(self, stage: str, status: str) -> int:
+        """Set every ``status`` row of ``stage`` back to pending."""
+        with self.conn:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = 'pending', updated_at = ? WHERE stage = ? AND status = ?",
+                (time.time(), stage, status))
+        return cur.rowcount
+
+    def import_checkpoint(self, stage: str, checkpoint_path) -> int:
+        """Seed ``stage`` from a legacy JSON checkpoint (only if it has no rows yet)."""
+        path = Path(checkpoint_path)
+        if not path.exists() or self.conn.execute(
+                "SELECT 1 FROM jobs WHERE stage = ? LIMIT 1", (stage,)).fetchone():
+            return 0
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return 0
+        now = time.time()
+        completed = set(data.get("completed", []))
+        rows = [(stage, kw, "done", now) for kw in completed]
+        rows += [(stage, kw, "failed", now) for kw in dict.fromkeys(data.get("failed", []))
+                 if kw not in completed]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (stage, keyword, status, updated_at) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    # ==========================================
+    # LOOKUPS
+    # ==========================================
+    def status(self, stage: str, keyword: str) -> Optional[str]:
+        row = self.conn.execute("SELECT status FROM jobs WHERE stage = ? AND keyword = ?",
+                                (stage, keyword)).fetchone()
+        return row["status"] if row else None
+
+    def is_done(self, stage: str, keyword: str) -> bool:
+        return self.status(stage, keyword) == "done"
+
+    def keywords(self, stage: str, status: str) -> List[str]:
+        return [r["keyword"] for r in self.conn.execute(
+            "SELECT keyword FROM jobs WHERE stage = ? AND status = ? ORDER BY keyword", (stage, status))]
+
+    def done_set(self, stage: str) -> Set[str]:
+        return set(self.keywords(stage, "done"))
+
+    def query(self, stage: Optional[str] = None, status: Optional[str] = None,
+              slower_than: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if stage:
+            where.append("stage = ?")
+            params.append(stage)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if slower_than is not None:
+            where.append("duration_s >= ?")
+            params.append(slower_than)
+        sql = "SELECT * FROM jobs" + (f" WHERE {' AND '.join(where)}" if where else "")
+        sql += " ORDER BY duration_s DESC" if slower_than is not None else " ORDER BY updated_at DESC"
+        rows = self.conn.execute(sql + " LIMIT ?", (*params, limit))
+        return [dict(r) for r in rows]
+
+    def summary(self, stage: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        sql = ("SELECT stage, status, COUNT(*) AS n, SUM(tokens) AS tokens, AVG(duration_s) AS avg_s "
+               "FROM jobs" + (" WHERE stage = ?" if stage else "") + " GROUP BY stage, status")
+        result: Dict[str, Dict[str, Any]] = {}
+        for r in self.conn.execute(sql, (stage,) if stage else ()):
+            s = result.setdefault(r["stage"], {"counts": {}, "tokens": 0, "avg_s": {}})
+            s["counts"][r["status"]] = r["n"]
+            s["tokens"] += r["tokens"] or 0
+            if r["avg_s"] is not None:
+                s["avg_s"][r["status"]] = r["avg_s"]
+        return result
+
+
+# ==========================================
+# CLI
+# ==========================================
+def _fmt_time(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).isoformat(sep=" ", timespec="seconds") if ts else "-"
+
+
+def _print_rows(rows: List[Dict[str, Any]]):
+    if not rows:
+        print("└── (none)")
+        return
+    for i, r in enumerate(rows):
+        branch = "└──" if i == len(rows) - 1 else "├──"
+        duration = f"{r['duration_s']:.1f}s" if r["duration_s"] is not None else "-"
+        line = (f"{branch} [{r['stage']}] {r['keyword']} — {r['status']}, {r['attempts']} attempt(s), "
+                f"{duration}, {r['tokens']:,} tokens, {_fmt_time(r['updated_at'])}")
+        if r["error"]:
+            line += f" — {r['error'][:120]}"
+        print(line)
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="Pipeline job-state store queries")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help=f"Database (default: {DEFAULT_DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_summary = sub.add_parser("summary", help="Counts per stage and status")
+    p_summary.add_argument("--stage")
+
+    p_list = sub.add_parser("list", help="List keywords by status / duration")
+    p_list.add_argument("--stage")
+    p_list.add_argument("--status", choices=STATUSES)
+    p_list.add_argument("--slower-than", type=float, help="Only runs that took at least this many seconds")
+    p_list.add_argument("--limit", type=int, default=50)
+
+    p_pending = sub.add_parser("pending", help="Keywords from a file not yet done for a stage")
+    p_pending.add_argument("--stage", required=True)
+    p_pending.add_argument("--keywords-file", default="data/keywords/keywords.txt")
+
+    p_reset = sub.add_parser("reset", help="Set rows back to pending (e.g. retry failed)")
+    p_reset.add_argument("--stage", required=True)
+    p_reset.add_argument("--status", choices=STATUSES, default="failed")
+
+    args = parser.parse_args()
+    store = JobStore(args.db)
+
+    if args.command == "summary":
+        summary = store.summary(args.stage)
+        if not summary:
+            print(f"No jobs recorded in {store.path}")
+            return
+        for stage, s in summary.items():
+            counts = ", ".join(f"{status}: {s['counts'][status]:,}" for status in STATUSES if status in s["counts"])
+            avg = s["avg_s"].get("done")
+            print(f"├── {stage}: {counts}" + (f" | avg {avg:.1f}s" if avg is not None else "")
+                  + f" | {s['tokens']:,} tokens")
+        print(f"└── {store.path}")
+    elif args.command == "list":
+        _print_rows(store.query(args.stage, args.status, args.slower_than, args.limit))
+    elif args.command == "pending":
+        path = Path(args.keywords_file)
+        if not path.exists():
+            print(f"Keywords file not found: {path}")
+            sys.exit(1)
+        keywords = [line.strip() for line in path.read_text(encoding="utf-8").splitlines()
+                    if line.strip() and not line.startswith('#')]
+        done = store.done_set(args.stage)
+        pending = [kw for kw in dict.fromkeys(keywords) if kw not in done]
+        for kw in pending:
+            print(kw)
+        print(f"# {len(pending):,} of {len(set(keywords)):,} keywords not done for {args.stage}", file=sys.stderr)
+    elif args.command == "reset":
+        n = store.reset(args.stage, args.status)
+        print(f"Reset {n:,} {args.status} row(s) of {args.stage} to pending")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
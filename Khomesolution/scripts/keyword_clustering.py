@@ -0,0 +1,445 @@
+"""
+Phase 1.5: SERP-overlap keyword clustering (MinHash / LSH).
+
+Runs after serp_collections.py.  Every keyword folder under
+output/research/ has a ``{keyword}-competitions.json`` with its top-10
+organic URLs; two keywords whose ranking URL sets overlap heavily should
+be written as one article.  Instead of comparing every pair of keywords
+(O(n^2)), each URL set is reduced to a MinHash signature and bucketed
+with LSH banding, so only keywords that collide in at least one band are
+compared.
+
+Outputs (data/kw-semantic/):
+    keyword_clusters.json   cluster assignments + primary keyword per cluster
+    keyword_clusters.csv    flat keyword -> cluster table
+    keywords-primary.txt    one primary keyword per cluster (the original
+                            keyword string, not its folder name), usable as
+                            the --keywords / --file input of the downstream
+                            LLM stages so they run once per cluster
+
+Keyword folders are sanitized names (serp_collections.sanitize_filename:
+spaces -> underscores).  The original keyword of each folder is taken from
+the keywords file, else the ``keyword`` field of ``{folder}-keywords.json``,
+else the folder name with underscores turned back into spaces.
+
+Usage:
+    python scripts/keyword_clustering.py
+    python scripts/keyword_clustering.py --threshold 0.4 --bands 64 --rows 2
+"""
+
+import os
+import re
+import csv
+import json
+import time
+import random
+import hashlib
+import argparse
+from collections import defaultdict
+from urllib.parse import urlparse, unquote
+from typing import Dict, List, Set, Tuple
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+RESEARCH_DIR = "output/research"
+KEYWORDS_FILE = "data/keywords/keywords.txt"
+OUTPUT_DIR = "data/kw-semantic"
+CLUSTERS_JSON = "keyword_clusters.json"
+CLUSTERS_CSV = "keyword_clusters.csv"
+PRIMARY_KEYWORDS_FILE = "keywords-primary.txt"
+
+TOP_N_URLS = 10
+# P[candidate | J] = 1 - (1 - J**ROWS_PER_BAND) ** NUM_BANDS.  The S-curve
+# midpoint (1/NUM_BANDS) ** (1/ROWS_PER_BAND) ~ 0.125 sits well below the
+# threshold, so pairs at J = 0.3 are compared ~99.8% of the time; the exact
+# Jaccard check discards the extra low-overlap candidates.
+NUM_BANDS = 64
+ROWS_PER_BAND = 2            # signature length = NUM_BANDS * ROWS_PER_BAND
+JACCARD_THRESHOLD = 0.3      # two top-10 lists: 5 shared URLs (5/15 = 0.33); 4 shared is 4/16 = 0.25
+MINHASH_SEED = 42
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+# ---------------------------------------------------------------------------
+# URL normalisation
+# ---------------------------------------------------------------------------
+def normalize_url(url: str) -> str:
+    """Reduce a SERP URL to a stable comparison key.
+
+    Decodes percent-escapes, lowercases the host, drops ``www.``, the
+    scheme, query string, fragment and trailing slash, so the same page
+    reported as ``https://www.x.com/a/?utm=1`` and ``http://x.com/a``
+    compares equal.
+    """
+    if not isinstance(url, str) or not url.strip():
+        return ""
+    parsed = urlparse(unquote(url.strip()))
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = re.sub(r"/{2,}", "/", parsed.path).rstrip("/")
+    return f"{host}{path}"
+
+
+def load_url_sets(research_dir: str = RESEARCH_DIR,
+                  top_n: int = TOP_N_URLS) -> Dict[str, Set[str]]:
+    """Read every ``{keyword}-competitions.json`` and return keyword -> URL set."""
+    url_sets = {}
+    if not os.path.isdir(research_dir):
+        return url_sets
+
+    for folder in sorted(os.listdir(research_dir)):
+        comp_path = os.path.join(research_dir, folder, f"{folder}-competitions.json")
+        if not os.path.isfile(comp_path):
+            continue
+        try:
+            with open(comp_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"    Skip invalid JSON: {comp_path} ({e})")
+            continue
+        if not isinstance(data, list):
+            continue
+
+        data = sorted(
+            (e for e in data if isinstance(e, dict)),
+            key=lambda e: e.get("rank", 999),
+        )
+        urls = {normalize_url(e.get("url", "")) for e in data[:top_n]}
+        urls.discard("")
+        if urls:
+            url_sets[folder] = urls
+
+    return url_sets
+
+
+# ---------------------------------------------------------------------------
+# MinHash / LSH
+# ---------------------------------------------------------------------------
+def _base_hash(token: str) -> int:
+    """Stable 32-bit hash of a token (Python's hash() is salted per process)."""
+    return int.from_bytes(
+        hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little"
+    )
+
+
+class MinHasher:
+    """Universal-hash MinHash: h_i(x) = (a_i * x + b_i) mod p, truncated to 32 bits."""
+
+    def __init__(self, num_perm: int, seed: int = MINHASH_SEED):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, tokens: Set[str]) -> Tuple[int, ...]:
+        hashes = [_base_hash(t) for t in tokens]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self.params
+        )
+
+
+def jaccard(set1: Set[str], set2: Set[str]) -> float:
+    if not set1 or not set2:
+        return 0.0
+    return len(set1 & set2) / len(set1 | set2)
+
+
+def lsh_candidate_pairs(signatures: Dict[str, Tuple[int, ...]],
+                        bands: int, rows: int) -> Set[Tuple[str, str]]:
+    """Bucket each signature band; keywords sharing any bucket become candidates."""
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        start = band * rows
+        for kw, sig in signatures.items():
+            buckets[sig[start:start + rows]].append(kw)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            members.sort()
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    candidates.add((members[i], members[j]))
+    return candidates
+
+
+class UnionFind:
+    def __init__(self, items):
+        self.parent = {x: x for x in items}
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Deterministic root: lexicographically smallest keyword
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+# ---------------------------------------------------------------------------
+# Keyword names (folder <-> original keyword)
+# ---------------------------------------------------------------------------
+def sanitize_folder_name(name: str) -> str:
+    """Same rule as serp_collections.sanitize_filename (folder name of a keyword)."""
+    name = re.sub(r'[^\w\s\-\u0E00-\u0E7F.]', '-', name)
+    return name.strip().replace(' ', '_')
+
+
+def normalize_keyword(text: str) -> str:
+    """Comparison key: lowercase, underscores as spaces, whitespace collapsed."""
+    return " ".join(text.replace("_", " ").lower().split())
+
+
+def load_keyword_names(folders, research_dir: str = RESEARCH_DIR,
+                       keywords_file: str = KEYWORDS_FILE) -> Dict[str, str]:
+    """Folder name -> original keyword string."""
+    from_file = {}
+    if keywords_file and os.path.isfile(keywords_file):
+        with open(keywords_file, "r", encoding="utf-8") as f:
+            for line in f:
+                kw = line.strip()
+                if kw and not kw.startswith("#"):
+                    from_file.setdefault(sanitize_folder_name(kw), kw)
+
+    names = {}
+    for folder in folders:
+        name = from_file.get(folder)
+        if not name:
+            meta_path = os.path.join(research_dir, folder, f"{folder}-keywords.json")
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                name = (meta.get("keyword") or "").strip() if isinstance(meta, dict) else ""
+            except (OSError, ValueError):
+                name = ""
+        names[folder] = name or folder.replace("_", " ")
+    return names
+
+
+# ---------------------------------------------------------------------------
+# Primary keyword selection
+# ---------------------------------------------------------------------------
+def load_keyword_volume(folder: str, keyword: str, research_dir: str = RESEARCH_DIR) -> int:
+    """Search volume of ``keyword`` from its folder's master-queries CSV (0 if absent)."""
+    csv_path = os.path.join(research_dir, folder, f"{folder}-master-queries.csv")
+    if not os.path.isfile(csv_path):
+        return 0
+    target = normalize_keyword(keyword)
+    try:
+        with open(csv_path, "r", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                if normalize_keyword(row.get("query") or "") == target:
+                    try:
+                        return int(float(row.get("vol") or 0))
+                    except ValueError:
+                        return 0
+    except (OSError, csv.Error):
+        pass
+    return 0
+
+
+def pick_primary(members: List[str], url_sets: Dict[str, Set[str]],
+                 volumes: Dict[str, int]) -> str:
+    """Recommend the cluster's primary keyword.
+
+    Highest search volume wins; ties go to the keyword whose URL set
+    overlaps most with the rest of the cluster (the SERP "centre"),
+    then to the shorter keyword.
+    """
+    def centrality(kw):
+        others = [m for m in members if m != kw]
+        if not others:
+            return 0.0
+        return sum(jaccard(url_sets[kw], url_sets[o]) for o in others) / len(others)
+
+    return sorted(
+        members,
+        key=lambda kw: (-volumes.get(kw, 0), -centrality(kw), len(kw), kw),
+    )[0]
+
+
+# ---------------------------------------------------------------------------
+# Clustering
+# ---------------------------------------------------------------------------
+def cluster_keywords(url_sets: Dict[str, Set[str]],
+                     threshold: float = JACCARD_THRESHOLD,
+                     bands: int = NUM_BANDS,
+                     rows: int = ROWS_PER_BAND,
+                     seed: int = MINHASH_SEED) -> Tuple[List[List[str]], Dict[str, int]]:
+    """Cluster keywords by SERP URL overlap.
+
+    Returns (clusters, stats).  Candidate pairs from LSH are confirmed with
+    the exact Jaccard of the (small) URL sets before being merged, so LSH
+    only decides *which* pairs get compared, never the final similarity.
+    """
+    hasher = MinHasher(bands * rows, seed=seed)
+    signatures = {kw: hasher.signature(urls) for kw, urls in url_sets.items()}
+
+    candidates = lsh_candidate_pairs(signatures, bands, rows)
+
+    uf = UnionFind(url_sets.keys())
+    merged_pairs = 0
+    for a, b in candidates:
+        if jaccard(url_sets[a], url_sets[b]) >= threshold:
+            uf.union(a, b)
+            merged_pairs += 1
+
+    groups = defaultdict(list)
+    for kw in url_sets:
+        groups[uf.find(kw)].append(kw)
+
+    clusters = sorted(
+        (sorted(members) for members in groups.values()),
+        key=lambda m: (-len(m), m[0]),
+    )
+    stats = {
+        "keywords": len(url_sets),
+        "candidate_pairs": len(candidates),
+        "merged_pairs": merged_pairs,
+        "clusters": len(clusters),
+    }
+    return clusters, stats
+
+
+def build_report(clusters: List[List[str]], url_sets: Dict[str, Set[str]],
+                 research_dir: str = RESEARCH_DIR,
+                 keywords_file: str = KEYWORDS_FILE) -> List[Dict]:
+    """Clusters are of folder names; the report carries the original keywords."""
+    names = load_keyword_names(url_sets, research_dir, keywords_file)
+    volumes = {kw: load_keyword_volume(kw, names[kw], research_dir) for kw in url_sets}
+    report = []
+    for idx, members in enumerate(clusters, 1):
+        primary = pick_primary(members, url_sets, volumes)
+        shared = set.intersection(*(url_sets[m] for m in members)) if members else set()
+        report.append({
+            "cluster_id": idx,
+            "primary_keyword": names[primary],
+            "primary_folder": primary,
+            "size": len(members),
+            "keywords": [
+                {
+                    "keyword": names[kw],
+                    "folder": kw,
+                    "volume": volumes.get(kw, 0),
+                    "overlap_with_primary": round(jaccard(url_sets[kw], url_sets[primary]), 3),
+                }
+                for kw in members
+            ],
+            "shared_urls": sorted(shared),
+        })
+    return report
+
+
+def save_outputs(report: List[Dict], stats: Dict, params: Dict,
+                 output_dir: str = OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+
+    json_path = os.path.join(output_dir, CLUSTERS_JSON)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "stats": stats, "clusters": report},
+                  f, ensure_ascii=False, indent=2)
+
+    csv_path = os.path.join(output_dir, CLUSTERS_CSV)
+    with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["keyword", "cluster_id", "primary_keyword", "is_primary",
+                         "volume", "overlap_with_primary", "folder"])
+        for c in report:
+            for k in c["keywords"]:
+                writer.writerow([k["keyword"], c["cluster_id"], c["primary_keyword"],
+                                 k["folder"] == c["primary_folder"],
+                                 k["volume"], k["overlap_with_primary"], k["folder"]])
+
+    primary_path = os.path.join(output_dir, PRIMARY_KEYWORDS_FILE)
+    with open(primary_path, "w", encoding="utf-8") as f:
+        for c in report:
+            f.write(c["primary_keyword"] + "\n")
+
+    return json_path, csv_path, primary_path
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description="Phase 1.5: Cluster keywords by SERP URL overlap (MinHash/LSH)"
+    )
+    parser.add_argument("--dir", default=RESEARCH_DIR,
+                        help=f"Research directory with competitions JSON (default: {RESEARCH_DIR})")
+    parser.add_argument("--keywords", default=KEYWORDS_FILE,
+                        help=f"Original keywords, to map folder names back (default: {KEYWORDS_FILE})")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR,
+                        help=f"Where to write cluster files (default: {OUTPUT_DIR})")
+    parser.add_argument("--top-n", type=int, default=TOP_N_URLS,
+                        help=f"Ranking URLs per keyword to compare (default: {TOP_N_URLS})")
+    parser.add_argument("--threshold", type=float, default=JACCARD_THRESHOLD,
+                        help=f"Minimum URL-set Jaccard to merge two keywords (default: {JACCARD_THRESHOLD})")
+    parser.add_argument("--bands", type=int, default=NUM_BANDS,
+                        help=f"LSH bands (default: {NUM_BANDS})")
+    parser.add_argument("--rows", type=int, default=ROWS_PER_BAND,
+                        help=f"Rows per LSH band (default: {ROWS_PER_BAND})")
+    args = parser.parse_args()
+
+    print("Phase 1.5: SERP-overlap Keyword Clustering")
+    print("=" * 60)
+    start = time.time()
+
+    url_sets = load_url_sets(args.dir, args.top_n)
+    print(f"Loaded URL sets for {len(url_sets)} keyword(s) from {args.dir}/")
+    if not url_sets:
+        print("No competitions JSON found. Run serp_collections.py first.")
+        return
+
+    # Probability that a pair with Jaccard s becomes a candidate: 1 - (1 - s^r)^b
+    s = args.threshold
+    hit_rate = 1 - (1 - s ** args.rows) ** args.bands
+    print(f"MinHash: {args.bands} bands x {args.rows} rows "
+          f"(P[candidate | J={s:.2f}] = {hit_rate:.1%})")
+
+    clusters, stats = cluster_keywords(url_sets, args.threshold, args.bands, args.rows)
+    report = build_report(clusters, url_sets, args.dir, args.keywords)
+
+    params = {
+        "top_n": args.top_n,
+        "threshold": args.threshold,
+        "bands": args.bands,
+        "rows": args.rows,
+        "seed": MINHASH_SEED,
+    }
+    stats["elapsed_seconds"] = round(time.time() - start, 3)
+    json_path, csv_path, primary_path = save_outputs(report, stats, params, args.output_dir)
+
+    multi = [c for c in report if c["size"] > 1]
+    print(f"\n  Candidate pairs: {stats['candidate_pairs']:,} "
+          f"(merged {stats['merged_pairs']:,})")
+    print(f"  Clusters: {stats['clusters']:,} "
+          f"({len(multi)} with 2+ keywords, {stats['keywords'] - stats['clusters']:,} "
+          f"keyword run(s) saved downstream)")
+    for c in multi[:10]:
+        others = [k["keyword"] for k in c["keywords"] if k["folder"] != c["primary_folder"]]
+        print(f"  [{c['cluster_id']}] {c['primary_keyword']} <- {', '.join(others)}")
+    if len(multi) > 10:
+        print(f"  ... +{len(multi) - 10} more multi-keyword clusters")
+
+    print(f"\n  Clusters JSON: {json_path}")
+    print(f"  Clusters CSV:  {csv_path}")
+    print(f"  Primary keywords: {primary_path}")
+    print("  (use it as the keywords file of the downstream stages)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Markdown block stream for optimize_research_data.py.
+
+A document is a sequence of blocks separated by runs of two or more
+newlines (blank lines).  ``iter_blocks`` yields them lazily as
+``Block(kind, text, sep)`` -- ``sep`` is the exact newline run that
+followed the block, so ``join_blocks(iter_blocks(t)) == t`` for any text.
+
+Stages that only look at one line or one paragraph at a time run as
+``map_text(fn, blocks)``: the existing text function is applied to each
+block as it streams past, so a chain of such stages makes one pass over
+the document without building intermediate full-text copies.
+
+``TextBlocks`` wraps a materialized string; whole-text stages receiving
+it use the string directly instead of re-joining its blocks.
+"""
+
+import re
+from collections import namedtuple
+from typing import Callable, Iterable, Iterator
+
+Block = namedtuple("Block", "kind text sep")
+
+_SEP_RE = re.compile(r'\n{2,}')
+_BULLET_RE = re.compile(r'^[-*+•]\s')
+_REFERENCE_RE = re.compile(r'^(?:\[\d|https?://)', re.IGNORECASE)
+
+
+def classify(text: str) -> str:
+    """heading / list / reference / paragraph, from the block's first line."""
+    first = text.lstrip(' ')
+    if first.startswith('#'):
+        return "heading"
+    if _BULLET_RE.match(first):
+        return "list"
+    if _REFERENCE_RE.match(first):
+        return "reference"
+    return "paragraph"
+
+
+class TextBlocks:
+    """A materialized document that iterates as blocks."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __iter__(self) -> Iterator[Block]:
+        return iter_blocks(self.text)
+
+
+def iter_blocks(text: str) -> Iterator[Block]:
+    pos = 0
+    for m in _SEP_RE.finditer(text):
+        chunk = text[pos:m.start()]
+        yield Block(classify(chunk), chunk, m.group())
+        pos = m.end()
+    chunk = text[pos:]
+    yield Block(classify(chunk), chunk, '')
+
+
+def join_blocks(blocks: Iterable[Block]) -> str:
+    if isinstance(blocks, TextBlocks):
+        return blocks.text
+    return ''.join(part for b in blocks for part in (b.text, b.sep))
+
+
+def map_text(fn: Callable[..., str], blocks: Iterable[Block], **kwargs) -> Iterator[Block]:
+    """Apply a text stage to each block as it streams past."""
+    for b in blocks:
+        new = fn(b.text, **kwargs)
+        if new == b.text:
+            yield b
+        elif '\n\n' in new:
+            # The stage opened a blank line inside the block: split it
+            parts = list(iter_blocks(new))
+            yield from parts[:-1]
+            yield parts[-1]._replace(sep=parts[-1].sep + b.sep)
+        else:
+            yield Block(classify(new), new, b.sep)
+
+
+def whole_text(fn: Callable[..., str], blocks: Iterable[Block], **kwargs) -> Iterator[Block]:
+    """Run a stage that needs the full document (a barrier in the stream)."""
+    yield from TextBlocks(fn(join_blocks(blocks), **kwargs))
@@ -4,6 +4,8 @@ import glob
 import os
 import re
 
+from thai_segmenter import is_boundary, segment
+
 # --- Configuration ---
 RESEARCH_DIR  = "output/research"
 EXPORTS_DIR   = "data/exports"
@@ -36,33 +38,60 @@ def strip_thai_combining(text):
 
 
 def normalize_for_match(text):
-    """Collapse all whitespace for Thai keyword comparison.
+    """Canonical word form of a keyword for comparison.
 
     Autocomplete suggestions have spaces between syllables
     (e.g. "ประตู รั้ว หน้า บ้าน") while Ahrefs keywords are
-    concatenated (e.g. "ประตูรั้วหน้าบ้าน").  Removing spaces
-    makes both forms comparable.
+    concatenated (e.g. "ประตูรั้วหน้าบ้าน").  Spaces between Thai
+    characters are removed and the Thai text is re-segmented into
+    dictionary words, so both forms become the same space-separated
+    word sequence; latin/digit tokens are kept as they are.
     """
     if not isinstance(text, str):
         return ""
-    return re.sub(r"\s+", "", text).strip().lower()
+    text = re.sub(r"(?<=[\u0E01-\u0E5B])\s+(?=[\u0E01-\u0E5B])", "", text.strip().lower())
+    words = []
+    for token in re.findall(r"[\u0E01-\u0E5B]+|[^\s\u0E01-\u0E5B]+", text):
+        words.extend(segment(token) if "\u0E01" <= token[0] <= "\u0E5B" else [token])
+    return " ".join(words)
+
+
+def contains_words(outer, inner):
+    """Return True if the normalised words of ``inner`` occur inside ``outer``.
+
+    Whole words first.  The word list keeps some compounds as one word
+    ("ประตูหน้าบ้าน" is not split into "ประตู หน้าบ้าน"), so the fallback is
+    substring matching on the unspaced text, accepted only where both ends
+    fall on a Thai character-cluster boundary.
+    """
+    if not inner:
+        return False
+    if f" {inner} " in f" {outer} ":
+        return True
+    outer_text, inner_text = outer.replace(" ", ""), inner.replace(" ", "")
+    start = outer_text.find(inner_text)
+    while start != -1:
+        end = start + len(inner_text)
+        if is_boundary(outer_text, start) and is_boundary(outer_text, end):
+            return True
+        start = outer_text.find(inner_text, start + 1)
+    return False
 
 
 def keyword_matches_topic(kw_norm, base_norm, autocomplete_norms):
     """Return True if a normalised Ahrefs keyword belongs to a topic.
 
-    Matching rules (applied in order):
+    Matching rules (applied in order), on words (see ``contains_words``):
       1. Exact match against the normalised autocomplete suggestion set.
-      2. The base keyword is a substring of the Ahrefs keyword (catches
-         longer variants like "ประตูหน้าบ้านสวยๆราคา").
-      3. The Ahrefs keyword is a substring of the base keyword (catches
+      2. The base keyword's words appear in order inside the Ahrefs keyword
+         (catches longer variants like "ประตูหน้าบ้านสวยๆราคา").
+      3. The Ahrefs keyword's words appear inside the base keyword (catches
          shorter core forms like "ประตูหน้าบ้าน").
+    Matches that would split a Thai character cluster are rejected.
     """
     if kw_norm in autocomplete_norms:
         return True
-    if base_norm in kw_norm or kw_norm in base_norm:
-        return True
-    return False
+    return contains_words(kw_norm, base_norm) or contains_words(base_norm, kw_norm)
 
 
 def merge_sources(sources):
@@ -117,12 +146,16 @@ def clean_numeric(value):
 
 
 def deduplicate(df):
-    """Aggregate duplicates: merge sources, keep max vol and traf."""
+    """Aggregate duplicates: merge sources, keep max vol and traf.
+
+    Rows are grouped by normalize_for_match, so a spaced autocomplete
+    suggestion and the concatenated Ahrefs keyword count as one query.
+    """
     if df.empty:
         return df
 
     df = df.copy()
-    df["_key"] = df["query"].apply(clean_keyword)
+    df["_key"] = df["query"].apply(normalize_for_match)
 
     agg = df.groupby("_key", sort=False).agg(
         query=("query", "first"),
@@ -11,6 +11,9 @@ from bs4 import BeautifulSoup
 # CONFIGURATION (loaded from config.yaml)
 # ==========================================
 from config_loader import get_openrouter_config, get_model_config, load_prompt
+from token_budget import fit_to_budget, format_usage, get_stage_budget
+from dep_tracker import DepTracker
+from offload import LoopLagMonitor, read_text, run_cpu, run_io, shutdown, write_text
 
 _or_cfg = get_openrouter_config()
 _model_cfg = get_model_config("meta_description")
@@ -21,16 +24,27 @@ OPENROUTER_API_KEY = _or_cfg["api_key"]
 HTTP_REFERER = _or_cfg["http_referer"]
 MD_TEMPERATURE = _model_cfg.get("temperature", 0.5)
 MD_X_TITLE = _model_cfg.get("x_title", "Privato SEO Meta Gen")
+MD_ARTICLE_TOKENS = get_stage_budget(_model_cfg, "article", 12000)
 
 # System Prompt (loaded from PROMPTS/)
 SYSTEM_PROMPT = load_prompt("meta_description_system.md")
 
+
+def extract_article_text(html_content: str) -> str:
+    """Text of the article without tags (runs in the process pool)."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return soup.get_text(separator=' ', strip=True)
+
+
 class MetaGenerator:
     def __init__(self, args):
         self.input_dir = Path("output/research")       # รับ HTML จาก Phase 6/7.1
         self.output_dir = Path("data/articles")        # ส่งออกไปที่ data/articles (ตามไฟล์ระบุ)
         self.concurrency = args.concurrency
         self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.stale_only = args.stale_only
+        self.deps = DepTracker("meta_description", prompts=["meta_description_system.md"],
+                               config=["meta_description"])
 
     async def call_gemini_json(self, article_text: str, keyword: str) -> dict:
         """เรียก Gemini และบังคับให้ตอบเป็น JSON"""
@@ -41,16 +55,20 @@ class MetaGenerator:
             "X-Title": MD_X_TITLE
         }
         
+        # ตัดบทความตาม token budget (ตัดที่ขอบย่อหน้า/ประโยค ไม่ใช่ตัดตามจำนวนตัวอักษร)
+        article_text, usage = await run_io(fit_to_budget, article_text, MD_ARTICLE_TOKENS, MODEL_NAME,
+                                           stage="meta_description.article")
+        print(f"   🧮 {format_usage(usage)}")
+
         user_prompt = f"""
         Main Keyword: "{keyword}"
         
         === ARTICLE CONTENT BEGIN ===
-        {article_text[:15000]} 
+        {article_text} 
         === ARTICLE CONTENT END ===
         
         Generate the SEO metadata JSON now.
         """
-        # หมายเหตุ: Slice text ไว้ที่ 15000 chars เพื่อประหยัด token (Flash Lite รับได้เยอะ แต่ประหยัดไว้ก่อน)
 
         payload = {
             "model": MODEL_NAME,
@@ -93,15 +111,17 @@ class MetaGenerator:
                 print(f"[{keyword}] Skipped: HTML file not found.")
                 return
 
+            if self.stale_only and await run_io(self.deps.skip_if_fresh, output_path, [input_path]):
+                print(f"[{keyword}] Skipped: Metadata is up to date.")
+                return
+
             # อ่าน HTML เพื่อดึง Text
             try:
-                with open(input_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                
-                soup = BeautifulSoup(html_content, 'html.parser')
+                html_content = await read_text(input_path)
+
                 # เอาเฉพาะ Text ใน Article เพื่อไม่ให้ Token บวมด้วย HTML Tags
-                article_text = soup.get_text(separator=' ', strip=True)
-                
+                article_text = await run_cpu(extract_article_text, html_content)
+
             except Exception as e:
                 print(f"[{keyword}] Read Error: {e}")
                 return
@@ -112,12 +132,9 @@ class MetaGenerator:
             metadata = await self.call_gemini_json(article_text, keyword)
 
             if metadata:
-                # สร้าง Folder ปลายทางถ้ายังไม่มี
-                output_folder.mkdir(parents=True, exist_ok=True)
-                
-                # บันทึก JSON
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(metadata, f, indent=4, ensure_ascii=False)
+                # บันทึก JSON (สร้าง Folder ปลายทางถ้ายังไม่มี)
+                await write_text(output_path, json.dumps(metadata, indent=4, ensure_ascii=False))
+                await run_io(self.deps.record, output_path, [input_path])
                 
                 print(f"[{keyword}] Success: JSON saved to {output_path}")
             else:
@@ -133,8 +150,10 @@ class MetaGenerator:
 
         print(f"Starting Phase 7.2: Meta Description Generation for {len(keywords)} items.")
         
-        tasks = [self.process_keyword(kw) for kw in keywords]
-        await asyncio.gather(*tasks)
+        async with LoopLagMonitor() as lag:
+            tasks = [self.process_keyword(kw) for kw in keywords]
+            await asyncio.gather(*tasks)
+        print(f"Event loop: {lag.report()}")
 
 # ==========================================
 # MAIN ENTRY POINT
@@ -143,6 +162,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Phase 7.2: SEO Meta Generation")
     parser.add_argument("--keywords", default="data/keywords/keywords.txt", help="Path to keywords file")
     parser.add_argument("--concurrency", type=int, default=5, help="Parallel processing limit")
+    parser.add_argument("--stale-only", action="store_true",
+                        help="Skip keywords whose metadata is up to date with their HTML/prompt/config/code")
     
     args = parser.parse_args()
     
@@ -158,4 +179,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     generator = MetaGenerator(args)
-    asyncio.run(generator.run(args.keywords))
\ No newline at end of file
+    try:
+        asyncio.run(generator.run(args.keywords))
+    finally:
+        shutdown()
\ No newline at end of file
@@ -7,12 +7,38 @@ from pathlib import Path
 from bs4 import BeautifulSoup
 from typing import Dict, Any, Tuple
 
+from offload import LoopLagMonitor, read_text, run_cpu, shutdown, write_text
+
 # ==========================================
 # CONFIGURATION
 # ==========================================
 # ไฟล์ไม่ได้ระบุ Model จึงเปิดเป็น Config ไว้ (สามารถใส่ Logic Rule-based หรือ API ได้ที่นี่)
 # ในที่นี้จะจำลองการทำงานของ Agent ตามหน้าที่ที่ระบุในไฟล์
 
+
+# ==========================================
+# HTML PARSING (runs in the process pool)
+# ==========================================
+def parse_article(html_content: str) -> Tuple[str, str]:
+    """(ข้อความทั้งบทความ, ข้อความของ <p> แรก)"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    first_p = soup.find('p')
+    return soup.get_text(strip=True), (first_p.get_text() if first_p else "")
+
+
+def merge_hook(html_content: str, new_hook_sentence: str) -> str:
+    """HTML หลังแปะ Hook ใหม่ทับต้น <p> แรก"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    first_p = soup.find('p')
+    if first_p and new_hook_sentence:
+        # Logic การแทนที่ประโยคเดิม (ง่ายๆ คือแทนที่ P แรก)
+        # หมายเหตุ: ถ้าใช้ Logic จริงต้องระวังไม่ให้ทับทั้ง Paragraph
+        # อันนี้จำลองว่า Agent 1 ส่งมาแค่ประโยคแรก เราก็แปะกลับไป
+        current_text = first_p.string or ""
+        # สมมติ Logic การ Merge ง่ายๆ
+        first_p.string = new_hook_sentence + current_text[len(new_hook_sentence):]
+    return str(soup)
+
 class SEOWorkflow:
     def __init__(self, args):
         self.base_dir = Path(args.input_dir)
@@ -80,15 +106,10 @@ class SEOWorkflow:
                 return
 
             # 1. อ่านไฟล์ HTML (Input)
-            with open(html_file, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-                
-            soup = BeautifulSoup(html_content, 'html.parser')
-            article_text = soup.get_text(strip=True)
-            
+            html_content = await read_text(html_file)
+
             # หาประโยคแรกเพื่อส่งให้ Agent 1 (หรือส่งทั้งบทความ)
-            first_p = soup.find('p')
-            first_p_text = first_p.get_text() if first_p else ""
+            article_text, first_p_text = await run_cpu(parse_article, html_content)
 
             print(f"[{keyword}] Starting Parallel Agents...")
 
@@ -111,21 +132,13 @@ class SEOWorkflow:
             # ======================================================
             
             # 1. อัปเดต HTML ด้วย Hook ใหม่ (จาก Agent 1)
-            if first_p and new_hook_sentence:
-                # Logic การแทนที่ประโยคเดิม (ง่ายๆ คือแทนที่ P แรก)
-                # หมายเหตุ: ถ้าใช้ Logic จริงต้องระวังไม่ให้ทับทั้ง Paragraph
-                # อันนี้จำลองว่า Agent 1 ส่งมาแค่ประโยคแรก เราก็แปะกลับไป
-                current_text = first_p.string or ""
-                # สมมติ Logic การ Merge ง่ายๆ
-                first_p.string = new_hook_sentence + current_text[len(new_hook_sentence):] 
+            merged_html = await run_cpu(merge_hook, html_content, new_hook_sentence)
 
             # 2. บันทึกไฟล์ HTML (ทับไฟล์เดิม)
-            with open(html_file, 'w', encoding='utf-8') as f:
-                f.write(str(soup))
+            await write_text(html_file, merged_html)
 
             # 3. บันทึกไฟล์ JSON (จาก Agent 2)
-            with open(json_output, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, indent=4, ensure_ascii=False)
+            await write_text(json_output, json.dumps(meta_data, indent=4, ensure_ascii=False))
 
             print(f"[{keyword}] Success: Agents synchronized & outputs saved.")
 
@@ -139,8 +152,10 @@ class SEOWorkflow:
 
         print(f"Starting Phase 7: Parallel SEO Agents for {len(keywords)} items.")
         
-        tasks = [self.process_keyword(kw) for kw in keywords]
-        await asyncio.gather(*tasks)
+        async with LoopLagMonitor() as lag:
+            tasks = [self.process_keyword(kw) for kw in keywords]
+            await asyncio.gather(*tasks)
+        print(f"Event loop: {lag.report()}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Privato Phase 7: Parallel SEO Workflow")
@@ -151,4 +166,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     workflow = SEOWorkflow(args)
-    asyncio.run(workflow.run(args.keywords))
\ No newline at end of file
+    try:
+        asyncio.run(workflow.run(args.keywords))
+    finally:
+        shutdown()
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+Near-duplicate line detection for optimize_research_data.py (stage 6).
+
+The old stage compared every substantial line with every line kept before
+it and fitted a fresh ``TfidfVectorizer`` on each pair -- O(n^2) vectorizer
+fits per document.  ``find_redundant`` returns the same decisions from one
+vectorization pass:
+
+* every candidate line is counted once into a sparse term matrix of word
+  tokens (``thai_segmenter.word_tokens``: dictionary-segmented Thai words
+  plus the default English word pattern; Thai used to need ``char_wb``
+  2-4 grams, several times more features per line);
+* pairwise TF-IDF cosines are computed in blocks with sparse matrix
+  products.  A two-document TF-IDF fit gives shared terms idf 1 and
+  one-sided terms idf ``1 + ln 1.5``, so the pair-specific cosine is
+  reconstructed exactly from three products (dot, and each side's squared
+  weight on the shared terms) -- no refit needed;
+* lines are resolved in document order: a line is dropped only if it is
+  similar to an earlier line that was itself kept ("first occurrence
+  wins"), exactly like the sequential loop.  ``find_representatives``
+  exposes the same decisions as clusters: the kept text each one maps to.
+
+``method="minhash"`` (chosen automatically above ``MINHASH_MIN_LINES``)
+replaces the all-pairs products with MinHash signatures and LSH banding to
+pick candidate pairs, then scores only those with the exact cosine.  It can
+miss a duplicate whose term overlap is unusually low, never adds one.
+
+Without scikit-learn a word-set Jaccard fallback is used, evaluated
+through an inverted index so each line is only scored against earlier kept
+lines it shares a word with.
+"""
+
+import math
+import zlib
+from collections import defaultdict
+from typing import List, Sequence
+
+from thai_segmenter import word_tokens
+
+try:
+    import numpy as np
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+    HAS_SKLEARN = True
+except ImportError:
+    HAS_SKLEARN = False
+
+BLOCK_SIZE = 256
+MINHASH_MIN_LINES = 4000
+MINHASH_PERMUTATIONS = 96
+MINHASH_BANDS = 32            # 32 bands x 3 rows: pairs above ~0.3 Jaccard become candidates
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# idf of a term present in one of two documents (smooth_idf): ln(3/2) + 1
+_ONE_SIDED_IDF_SQ = (math.log(1.5) + 1) ** 2
+
+
+# ==========================================
+# JACCARD FALLBACK (no scikit-learn)
+# ==========================================
+def jaccard(text1: str, text2: str) -> float:
+    """Word-set Jaccard (Thai segmented into words)."""
+    set1, set2 = set(word_tokens(text1)), set(word_tokens(text2))
+    if not set1 or not set2:
+        return 0.0
+    return len(set1 & set2) / len(set1 | set2)
+
+
+def _representatives_jaccard(texts: Sequence[str], threshold: float) -> List[int]:
+    words = [frozenset(word_tokens(t)) for t in texts]
+    index = defaultdict(list)
+    rep = list(range(len(texts)))
+
+    for i in range(len(texts)):
+        # Candidates sharing a word; lines sharing nothing have Jaccard 0
+        # and are never compared.
+        overlap = defaultdict(int)
+        for w in words[i]:
+            for j in index.get(w, ()):
+                overlap[j] += 1
+        for j in sorted(overlap):
+            if overlap[j] / (len(words[i]) + len(words[j]) - overlap[j]) > threshold:
+                rep[i] = j
+                break
+        if rep[i] != i:
+            continue
+        for w in words[i]:
+            index[w].append(i)
+    return rep
+
+
+# ==========================================
+# TF-IDF COSINE (scikit-learn)
+# ==========================================
+class _PairCosine:
+    """Pair-fitted TF-IDF cosines for any rows/cols of one term-count matrix."""
+
+    def __init__(self, counts):
+        self.counts = counts.tocsr().astype(np.float64)
+        self.squared = self.counts.multiply(self.counts).tocsr()
+        self.binary = (self.counts > 0).astype(np.float64).tocsr()
+        self.total = np.asarray(self.squared.sum(axis=1)).ravel()
+        self.empty = np.diff(self.counts.indptr) == 0
+
+    def block(self, rows, cols):
+        """Dense ``len(rows) x len(cols)`` cosine matrix."""
+        a, b = self.counts[rows], self.counts[cols]
+        dot = (a @ b.T).toarray()
+        shared_a = (self.squared[rows] @ self.binary[cols].T).toarray()
+        shared_b = (self.binary[rows] @ self.squared[cols].T).toarray()
+        return self._cosine(dot, shared_a, shared_b, self.total[rows][:, None], self.total[cols][None, :])
+
+    def pairs(self, rows, cols):
+        """Cosine for each ``(rows[k], cols[k])`` pair."""
+        a, b = self.counts[rows], self.counts[cols]
+        dot = np.asarray(a.multiply(b).sum(axis=1)).ravel()
+        shared_a = np.asarray(self.squared[rows].multiply(self.binary[cols]).sum(axis=1)).ravel()
+        shared_b = np.asarray(self.binary[rows].multiply(self.squared[cols]).sum(axis=1)).ravel()
+        return self._cosine(dot, shared_a, shared_b, self.total[rows], self.total[cols])
+
+    @staticmethod
+    def _cosine(dot, shared_a, shared_b, total_a, total_b):
+        # |v|^2 with idf 1 on shared terms and ln(1.5)+1 on the rest
+        norm_a = _ONE_SIDED_IDF_SQ * total_a - (_ONE_SIDED_IDF_SQ - 1) * shared_a
+        norm_b = _ONE_SIDED_IDF_SQ * total_b - (_ONE_SIDED_IDF_SQ - 1) * shared_b
+        denom = np.sqrt(norm_a * norm_b)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denom > 0, dot / np.where(denom > 0, denom, 1.0), 0.0)
+
+
+def _count_matrix(vectorizer, texts):
+    try:
+        counts = vectorizer.fit_transform(texts)
+    except ValueError:  # empty vocabulary: no line has a single token
+        counts = sparse.csr_matrix((len(texts), 0))
+    return _PairCosine(counts)
+
+
+def _similarity(texts: Sequence[str]) -> _PairCosine:
+    return _count_matrix(CountVectorizer(tokenizer=word_tokens, lowercase=False, token_pattern=None), texts)
+
+
+def _representatives_blocked(sim: _PairCosine, n: int, threshold: float) -> List[int]:
+    kept = np.zeros(n, dtype=bool)
+    rep = list(range(n))
+    for start in range(0, n, BLOCK_SIZE):
+        block = np.arange(start, min(start + BLOCK_SIZE, n))
+        # Earlier kept lines plus the block itself (resolved in order below)
+        cols = np.concatenate([np.nonzero(kept[:start])[0], block])
+        over = sim.block(block, cols) > threshold
+        n_prior = len(cols) - len(block)
+        for r, i in enumerate(block):
+            prior = np.flatnonzero(over[r, :n_prior])
+            within = np.flatnonzero(over[r, n_prior:n_prior + r] & kept[block[:r]])
+            if len(prior):
+                rep[i] = int(cols[prior[0]])
+            elif len(within):
+                rep[i] = int(block[within[0]])
+            kept[i] = rep[i] == i
+    return rep
+
+
+def _minhash_signatures(counts, num_perm: int, seed: int = 1):
+    """MinHash signature per row over the row's set of term ids."""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    csr = counts.tocsr()
+    n = csr.shape[0]
+    sigs = np.full((n, num_perm), _MAX_HASH, dtype=np.uint64)
+    # Term ids hashed to 32 bits so (a * x + b) stays inside uint64
+    term_hash = np.array([zlib.crc32(str(t).encode()) for t in range(csr.shape[1])], dtype=np.uint64)
+    rows_per_chunk = max(1, 200_000 // max(1, csr.nnz // max(1, n)))
+    for start in range(0, n, rows_per_chunk):
+        stop = min(start + rows_per_chunk, n)
+        lo, hi = csr.indptr[start], csr.indptr[stop]
+        if lo == hi:
+            continue
+        x = term_hash[csr.indices[lo:hi]][:, None]
+        hashed = ((x * a[None, :] + b[None, :]) % np.uint64(_MERSENNE_PRIME)) & np.uint64(_MAX_HASH)
+        offsets = csr.indptr[start:stop] - lo
+        nonempty = np.diff(csr.indptr[start:stop + 1]) > 0
+        sigs[start:stop][nonempty] = np.minimum.reduceat(hashed, offsets[nonempty], axis=0)
+    return sigs
+
+
+def _representatives_minhash(sim: _PairCosine, n: int, threshold: float) -> List[int]:
+    # Candidate pairs from LSH over the word matrix
+    candidates = defaultdict(set)
+    rows_per_band = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    sigs = _minhash_signatures(sim.counts, MINHASH_PERMUTATIONS)
+    for band in range(MINHASH_BANDS):
+        buckets = defaultdict(list)
+        chunk = sigs[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for i in np.nonzero(~sim.empty)[0]:
+            buckets[chunk[i].tobytes()].append(i)
+        for bucket in buckets.values():
+            for k, i in enumerate(bucket):
+                candidates[i].update(bucket[:k])
+
+    # Score every candidate pair once, vectorized, then resolve in order
+    pair_rows, pair_cols = [], []
+    for i, earlier in candidates.items():
+        for j in earlier:
+            pair_rows.append(i)
+            pair_cols.append(j)
+    similar = defaultdict(list)
+    if pair_rows:
+        sims = sim.pairs(pair_rows, pair_cols)
+        for i, j, s in zip(pair_rows, pair_cols, sims):
+            if s > threshold:
+                similar[i].append(j)
+
+    rep = list(range(n))
+    for i in range(n):
+        earlier_kept = [j for j in similar.get(i, ()) if rep[j] == j]
+        if earlier_kept:
+            rep[i] = min(earlier_kept)
+    return rep
+
+
+# ==========================================
+# ENTRY POINT
+# ==========================================
+def find_representatives(texts: Sequence[str], threshold: float, method: str = "auto") -> List[int]:
+    """For each text, the index of the earlier kept text it duplicates (itself if kept).
+
+    A text is kept unless it is > ``threshold`` similar to an earlier kept
+    text ("first occurrence wins"), so every index maps to a kept text and
+    texts with the same representative form one near-duplicate cluster.
+
+    ``method``: ``exact`` (blocked all-pairs), ``minhash`` (LSH candidates,
+    exact scoring) or ``auto`` (minhash above MINHASH_MIN_LINES texts).
+    """
+    n = len(texts)
+    if n < 2:
+        return list(range(n))
+    if not HAS_SKLEARN:
+        return _representatives_jaccard(texts, threshold)
+    sim = _similarity(texts)
+    if method == "minhash" or (method == "auto" and n > MINHASH_MIN_LINES):
+        return _representatives_minhash(sim, n, threshold)
+    return _representatives_blocked(sim, n, threshold)
+
+
+def find_redundant(texts: Sequence[str], threshold: float, method: str = "auto") -> List[bool]:
+    """Flag each text that is > ``threshold`` similar to an earlier kept text."""
+    return [r != i for i, r in enumerate(find_representatives(texts, threshold, method))]
@@ -0,0 +1,185 @@
+"""
+Keep the asyncio event loop free: blocking work goes to bounded pools.
+
+With 10-20 requests in flight, every synchronous ``open()``, YAML parse or
+BeautifulSoup pass that runs on the loop delays all other responses,
+timers and rate-limiter sleeps.  Stages hand that work off instead:
+
+    await run_io(func, *args)     thread pool (IO_WORKERS) for file reads/writes
+    await run_cpu(func, *args)    process pool (CPU_WORKERS) for CPU-bound parsing;
+                                  ``func`` and its arguments must be picklable
+                                  (module-level functions, plain data)
+    await read_text(path)         file helpers on the I/O pool
+    await write_text(path, text)
+
+If a process pool cannot be started (or breaks), ``run_cpu`` falls back to
+the thread pool for the rest of the run.
+
+``LoopLagMonitor`` measures how late the loop wakes from a short sleep; a
+stall of ``warn_ms`` or more is reported (``loop_lag`` event) and the run
+totals come back from ``stop()``.
+
+Usage in a stage:
+    from offload import LoopLagMonitor, read_text, run_cpu, write_text
+
+    async with LoopLagMonitor(lambda e, d: log_json(logger, e, d)) as lag:
+        html = await read_text(path)
+        text = await run_cpu(html_to_text, html)
+    print(f"Event loop: {lag.report()}")
+"""
+
+import os
+import asyncio
+import functools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+IO_WORKERS = 8
+CPU_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+LAG_INTERVAL = 0.1          # seconds between loop-lag probes
+LAG_WARN_MS = 100           # report stalls at least this long
+LAG_SAMPLES = 10000         # probes kept for the percentiles
+
+_io_pool: Optional[ThreadPoolExecutor] = None
+_cpu_pool: Optional[ProcessPoolExecutor] = None
+_cpu_disabled = False
+
+
+# ==========================================
+# POOLS
+# ==========================================
+def io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="offload-io")
+    return _io_pool
+
+
+def cpu_pool() -> Optional[ProcessPoolExecutor]:
+    global _cpu_pool, _cpu_disabled
+    if _cpu_pool is None and not _cpu_disabled:
+        try:
+            # spawn everywhere: forking a process that already runs I/O threads is unsafe
+            _cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError, ImportError):
+            _cpu_disabled = True
+    return _cpu_pool
+
+
+def _disable_cpu_pool():
+    global _cpu_pool, _cpu_disabled
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+    _cpu_pool, _cpu_disabled = None, True
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """Run blocking I/O in the bounded thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound work in the process pool (thread pool as fallback)."""
+    loop = asyncio.get_running_loop()
+    pool = cpu_pool()
+    call = functools.partial(func, *args, **kwargs)
+    if pool is not None:
+        try:
+            return await loop.run_in_executor(pool, call)
+        except BrokenProcessPool:
+            _disable_cpu_pool()
+    return await loop.run_in_executor(io_pool(), call)
+
+
+def shutdown():
+    """Stop both pools (call once the stage's event loop is done)."""
+    global _io_pool
+    _disable_cpu_pool()
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=True)
+        _io_pool = None
+
+
+# ==========================================
+# FILE HELPERS
+# ==========================================
+def _write_text(path: Path, text: str):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(text, encoding="utf-8")
+
+
+async def read_text(path) -> str:
+    return await run_io(Path(path).read_text, encoding="utf-8")
+
+
+async def write_text(path, text: str):
+    """Write ``text`` (UTF-8), creating the parent folder if needed."""
+    await run_io(_write_text, path, text)
+
+
+# ==========================================
+# LOOP-LAG MONITOR
+# ==========================================
+class LoopLagMonitor:
+    def __init__(self, log: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 interval: float = LAG_INTERVAL, warn_ms: float = LAG_WARN_MS):
+        self.log = log or (lambda event, data: print(f"  ⚠️ Event loop stalled {data['lag_ms']:.0f} ms"))
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.samples: deque = deque(maxlen=LAG_SAMPLES)
+        self.stalls = 0
+        self.max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - start - self.interval) * 1000)
+            self.samples.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+            if lag_ms >= self.warn_ms:
+                self.stalls += 1
+                self.log("loop_lag", {"lag_ms": round(lag_ms, 1)})
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> Dict[str, Any]:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0
+        return {"probes": len(ordered), "stalls": self.stalls, "warn_ms": self.warn_ms,
+                "max_ms": round(self.max_ms, 1), "p99_ms": round(p99, 1),
+                "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0}
+
+    def report(self) -> str:
+        s = self.summary()
+        return (f"{s['stalls']} stalls >= {s['warn_ms']:.0f} ms "
+                f"(max {s['max_ms']:.0f} ms, p99 {s['p99_ms']:.0f} ms)")
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+        return False
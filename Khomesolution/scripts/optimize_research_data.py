@@ -3,22 +3,20 @@ import sys
 import re
 import json
 import time
+import tracemalloc
 import argparse
+import contextlib
+import io
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# Optional dependencies with graceful fallback
-try:
-    import tiktoken
-    HAS_TIKTOKEN = True
-except ImportError:
-    HAS_TIKTOKEN = False
-
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
-    HAS_SKLEARN = True
-except ImportError:
-    HAS_SKLEARN = False
+from phrase_rewriter import RewriteEngine
+import token_budget
+from near_duplicates import find_redundant
+from stage_cache import StageCache, rules_fingerprint, text_hash
+from md_blocks import Block, TextBlocks, classify, join_blocks, map_text, whole_text
+from dep_tracker import DepTracker
 
 # ==========================================
 # CONFIGURATION
@@ -41,6 +39,9 @@ QUALITY_THRESHOLDS = {
     "similarity_threshold": 0.65,
 }
 
+# Stage 6 near-duplicate search: "exact", "minhash" or "auto" (minhash for very long documents)
+REDUNDANCY_METHOD = "auto"
+
 # ==========================================
 # THAI LANGUAGE SUPPORT
 # ==========================================
@@ -186,32 +187,25 @@ def preprocess_text(text: str) -> str:
 # TOKEN COUNTING
 # ==========================================
 def count_tokens(text: str) -> int:
-    if HAS_TIKTOKEN:
-        enc = tiktoken.encoding_for_model("gpt-4")
-        return len(enc.encode(text))
-    # Fallback: ~4 characters per token
-    return len(text) // 4
+    # Cached encoder + content-hash LRU (see token_budget.py)
+    return token_budget.count_tokens(text, "gpt-4")
 
 # ==========================================
 # STAGE 1: Citation Optimization
 # ==========================================
-def optimize_citations(text: str) -> tuple:
-    """
-    - Deduplicate inline citations (max 2 per sentence)
-    - Convert [text](url) -> numbered footnotes [n]
-    - Remove [Strong]/[Moderate]/[Preliminary] labels
-    - Return (optimized_text, references_list)
-    """
+_EVIDENCE_LABEL_RE = re.compile(r'\s*\[(Strong|Moderate|Preliminary)\]')
+_EVIDENCE_PREFIX_RE = re.compile(r'^(•\s*)(?:Strong|Moderate|Preliminary)\s*:\s*', re.MULTILINE)
+_LINK_RE = re.compile(r'\[([^\]]*)\]\(([^)]+)\)')
+
+def _number_citations(text: str, references: list, url_to_ref: dict) -> str:
+    """Label removal, [text](url) -> [n], and max 2 citations per sentence.
+    ``references``/``url_to_ref`` carry the numbering across calls."""
     # Remove evidence quality labels: [Strong], [Moderate], [Preliminary]
-    text = re.sub(r'\s*\[(Strong|Moderate|Preliminary)\]', '', text)
+    text = _EVIDENCE_LABEL_RE.sub('', text)
     # Also handle unbracketed prefix format: "• Strong:", "• Moderate:"
-    text = re.sub(r'^(•\s*)(?:Strong|Moderate|Preliminary)\s*:\s*', r'\1', text, flags=re.MULTILINE)
+    text = _EVIDENCE_PREFIX_RE.sub(r'\1', text)
 
     # Collect all markdown links and build reference list
-    link_pattern = re.compile(r'\[([^\]]*)\]\(([^)]+)\)')
-    references = []
-    url_to_ref = {}
-
     def replace_link(match):
         url = match.group(2)
         base_url = url.split('#')[0] if '#:~:text=' in url else url
@@ -221,7 +215,7 @@ def optimize_citations(text: str) -> tuple:
             references.append(url)
         return f'[{url_to_ref[base_url]}]'
 
-    text = link_pattern.sub(replace_link, text)
+    text = _LINK_RE.sub(replace_link, text)
 
     # Deduplicate citations within sentences (max 2 per sentence)
     # Process per-line to preserve line structure (\n between bullets/paragraphs)
@@ -252,7 +246,23 @@ def optimize_citations(text: str) -> tuple:
 
     text = '\n'.join(processed_lines)
     text = re.sub(r'  +', ' ', text)
-    return text, references
+    return text
+
+def optimize_citations(text: str) -> tuple:
+    """
+    - Deduplicate inline citations (max 2 per sentence)
+    - Convert [text](url) -> numbered footnotes [n]
+    - Remove [Strong]/[Moderate]/[Preliminary] labels
+    - Return (optimized_text, references_list)
+    """
+    references = []
+    return _number_citations(text, references, {}), references
+
+def optimize_citation_blocks(blocks, out: dict):
+    """Streaming optimize_citations; the reference list is left in out["references"]."""
+    references, url_to_ref = [], {}
+    out["references"] = references
+    return map_text(_number_citations, blocks, references=references, url_to_ref=url_to_ref)
 
 # ==========================================
 # STAGE 2: Sentence Compression
@@ -420,15 +430,20 @@ REDUNDANT_MODIFIERS = [
     (r'อย่างเห็นได้ชัด\s*', ''),                # obviously / clearly
 ]
 
+# Compiled once at import; applies FILLER_PHRASES then REDUNDANT_MODIFIERS
+# in list order, touching only the rules whose phrase occurs in the text.
+SENTENCE_ENGINE = RewriteEngine(FILLER_PHRASES + REDUNDANT_MODIFIERS, re.IGNORECASE)
+
+_SENTENCE_START_RE = re.compile(r'(?<=\.\s)([a-z])(?!ttps?://)')
+_MULTI_SPACE_RE = re.compile(r'  +')
+_LEADING_SPACE_RE = re.compile(r'^ +', re.MULTILINE)
+
 def compress_sentences(text: str) -> str:
-    for pattern, replacement in FILLER_PHRASES:
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    for pattern, replacement in REDUNDANT_MODIFIERS:
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    text = SENTENCE_ENGINE.apply(text)
     # Fix capitalization after removals at sentence starts (skip URLs)
-    text = re.sub(r'(?<=\.\s)([a-z])(?!ttps?://)', lambda m: m.group(1).upper(), text)
-    text = re.sub(r'  +', ' ', text)
-    text = re.sub(r'^ +', '', text, flags=re.MULTILINE)
+    text = _SENTENCE_START_RE.sub(lambda m: m.group(1).upper(), text)
+    text = _MULTI_SPACE_RE.sub(' ', text)
+    text = _LEADING_SPACE_RE.sub('', text)
     return text
 
 # ==========================================
@@ -521,10 +536,10 @@ def remove_advisory_sentences(text: str) -> str:
         result.append(' '.join(kept))
     return '\n'.join(result)
 
+STATS_ENGINE = RewriteEngine(STAT_PATTERNS, re.IGNORECASE)
+
 def compress_statistics(text: str) -> str:
-    for pattern, replacement in STAT_PATTERNS:
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    return text
+    return STATS_ENGINE.apply(text)
 
 # ==========================================
 # STAGE 4: Structure Optimization (DISABLED)
@@ -605,67 +620,57 @@ def optimize_lists(text: str) -> str:
 # ==========================================
 # STAGE 6: Redundancy Removal
 # ==========================================
-def _char_trigrams(text: str) -> set:
-    """Generate character trigrams for Thai text similarity."""
-    text = re.sub(r'\s+', '', text)
-    return set(text[i:i+3] for i in range(len(text) - 2)) if len(text) >= 3 else {text}
-
-def word_overlap_similarity(text1: str, text2: str) -> float:
-    """Fallback similarity using word overlap (Jaccard).
-    Uses character trigrams for Thai text since Thai lacks word boundaries."""
-    if contains_thai(text1) or contains_thai(text2):
-        set1 = _char_trigrams(text1)
-        set2 = _char_trigrams(text2)
-    else:
-        set1 = set(re.findall(r'\w+', text1.lower()))
-        set2 = set(re.findall(r'\w+', text2.lower()))
-    if not set1 or not set2:
-        return 0.0
-    return len(set1 & set2) / len(set1 | set2)
-
-def compute_similarity(text1: str, text2: str) -> float:
-    if HAS_SKLEARN:
-        try:
-            # Use character n-grams for Thai (no word boundaries); word-level for English
-            if contains_thai(text1) or contains_thai(text2):
-                vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4))
-            else:
-                vectorizer = TfidfVectorizer()
-            tfidf_matrix = vectorizer.fit_transform([text1, text2])
-            return cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-        except Exception:
-            pass
-    return word_overlap_similarity(text1, text2)
-
-def remove_redundancy(text: str, threshold: float = 0.85) -> str:
+def _redundancy_candidate(line: str):
+    """Stripped line if it takes part in similarity checks, else None."""
+    stripped = line.strip()
+    # Always keep: empty lines, headings, short lines, reference lines
+    if (not stripped or stripped.startswith('#') or len(stripped) < 80 or
+            stripped.startswith('[') or stripped.startswith('http')):
+        return None
+    return stripped
+
+def remove_redundancy(text: str, threshold: float = 0.85, method: str = REDUNDANCY_METHOD) -> str:
     """Remove lines/paragraphs with >threshold similarity to an earlier one."""
     # Split into logical blocks: each line that contains substantial text
     lines = text.split('\n')
-    kept = []
-    kept_texts = []  # stripped text of kept lines for comparison
-
-    for line in lines:
-        stripped = line.strip()
-
-        # Always keep: empty lines, headings, short lines, reference lines
-        if (not stripped or stripped.startswith('#') or len(stripped) < 80 or
-                stripped.startswith('[') or stripped.startswith('http')):
-            kept.append(line)
-            continue
-
-        # Check against kept substantial lines
-        is_redundant = False
-        for kt in kept_texts:
-            if compute_similarity(stripped, kt) > threshold:
-                is_redundant = True
-                break
-
-        if not is_redundant:
-            kept.append(line)
-            kept_texts.append(stripped)
-        # else: skip this redundant line
-
-    return '\n'.join(kept)
+    candidates = [(idx, c) for idx, c in enumerate(map(_redundancy_candidate, lines)) if c is not None]
+
+    # First occurrence wins: a line is dropped only if similar to an earlier kept line
+    redundant = find_redundant([c[1] for c in candidates], threshold, method)
+    drop = {idx for (idx, _), r in zip(candidates, redundant) if r}
+    return '\n'.join(line for idx, line in enumerate(lines) if idx not in drop)
+
+def remove_redundancy_blocks(blocks, out: dict, threshold: float = 0.85,
+                             method: str = REDUNDANCY_METHOD):
+    """Block version of remove_redundancy (needs every line before deciding,
+    so it is a barrier, but keeps the blocks instead of re-joining them)."""
+    blocks = list(blocks)
+    block_lines = [b.text.split('\n') for b in blocks]
+    candidates = [(bi, li, c) for bi, lines in enumerate(block_lines)
+                  for li, c in enumerate(map(_redundancy_candidate, lines)) if c is not None]
+    redundant = find_redundant([c[2] for c in candidates], threshold, method)
+    drop = {}
+    for (bi, li, _), r in zip(candidates, redundant):
+        if r:
+            drop.setdefault(bi, set()).add(li)
+
+    prev = None
+    for bi, b in enumerate(blocks):
+        if bi in drop:
+            kept = [l for li, l in enumerate(block_lines[bi]) if li not in drop[bi]]
+            if not kept:
+                # Whole block gone: its lines vanish between the two blank-line
+                # runs, which merge into one run of len(a) + len(b) - 1 newlines
+                n = max(0, (len(prev.sep) if prev else 0) + len(b.sep) - 1)
+                prev = (prev or Block("paragraph", '', ''))._replace(sep='\n' * n)
+                continue
+            text = '\n'.join(kept)
+            b = Block(classify(text), text, b.sep)
+        if prev is not None:
+            yield prev
+        prev = b
+    if prev is not None:
+        yield prev
 
 # ==========================================
 # QUALITY VALIDATION
@@ -719,68 +724,140 @@ def validate_quality(original: str, optimized: str) -> tuple:
 # ==========================================
 # MAIN OPTIMIZATION PIPELINE
 # ==========================================
-def optimize_markdown(text: str, config: dict = None, debug: bool = False) -> tuple:
+# name, debug label, PIPELINE_CONFIG flag (None = always on), listed in
+# report["stages"], text function, how it runs on the block stream, extra
+# keyword arguments from the config.
+#   "map"  - the text function is applied to each block as it streams past
+#   "text" - needs the whole document (joins the stream: a barrier)
+#   callable(blocks, out, **kwargs) - custom block generator; may leave
+#            results in ``out`` (stored with the stage's cache entry)
+Stage = namedtuple("Stage", "name label flag reported fn stream kwargs")
+
+STAGES = [
+    # Stage 0: Pre-processing (join hard-wrapped lines, remove page numbers)
+    Stage("preprocess", "preprocess", None, True, preprocess_text, "text", None),
+    Stage("citation_optimization", "citations", "citation_optimization", True,
+          optimize_citations, optimize_citation_blocks, None),
+    Stage("sentence_compression", "sentences", "sentence_compression", True, compress_sentences, "map", None),
+    # Stage 2b/2c: parenthetical compression, advisory sentence removal
+    Stage("parentheticals", "parentheticals", None, False, compress_parentheticals, "map", None),
+    Stage("advisory", "advisory", None, False, remove_advisory_sentences, "map", None),
+    Stage("statistics_compression", "statistics", "statistics_compression", True, compress_statistics, "map", None),
+    # H3 sections span blocks, so structure optimization sees the whole text
+    Stage("structure_optimization", "structure", "structure_optimization", True, optimize_structure, "text", None),
+    Stage("list_optimization", "lists", "list_optimization", True, optimize_lists, "map", None),
+    Stage("redundancy_removal", "redundancy", "redundancy_removal", True, remove_redundancy,
+          remove_redundancy_blocks,
+          lambda config: {"threshold": QUALITY_THRESHOLDS["similarity_threshold"],
+                          "method": config.get("redundancy_method", REDUNDANCY_METHOD)}),
+]
+
+_STREAMS = {
+    "map": lambda stage, blocks, out, kwargs: map_text(stage.fn, blocks, **kwargs),
+    "text": lambda stage, blocks, out, kwargs: whole_text(stage.fn, blocks, **kwargs),
+}
+
+_stage_fingerprints = {}
+
+def stage_fingerprint(stage: Stage, kwargs: dict) -> str:
+    """Hash of the stage's code and rules (see stage_cache.rules_fingerprint)."""
+    memo_key = (stage.name, repr(sorted(kwargs.items())))
+    if memo_key not in _stage_fingerprints:
+        stream = stage.stream if callable(stage.stream) else _STREAMS[stage.stream]
+        _stage_fingerprints[memo_key] = rules_fingerprint(stage.fn, stream, kwargs)
+    return _stage_fingerprints[memo_key]
+
+def _tap(blocks, writer, tokens: list):
+    """Pass blocks through, streaming them into a cache blob and/or a token count."""
+    for b in blocks:
+        if writer is not None:
+            writer.write(b.text)
+            writer.write(b.sep)
+        if tokens is not None:
+            tokens[0] += count_tokens(b.text)
+        yield b
+
+def optimize_markdown(text: str, config: dict = None, debug: bool = False,
+                      cache: StageCache = None) -> tuple:
+    """Run the stage pipeline over a stream of markdown blocks.
+
+    Stages are chained generators: a block flows through every "map" stage
+    before the next block is read, and the text is only materialized at
+    barriers ("text" stages, redundancy removal) and at the end.
+
+    With ``cache``, stages whose (input, rules) were seen before are skipped
+    and their stored output is reused; execution starts at the first stage
+    whose input or rules changed, and every stage output is streamed into
+    the cache as it is produced.
+    """
     if config is None:
         config = PIPELINE_CONFIG
 
-    report = {"original_tokens": count_tokens(text), "stages": []}
-    references = []
-
-    def _dbg(stage_name):
+    original_text = text
+    report = {"original_tokens": count_tokens(text), "stages": [], "cached_stages": 0}
+    state = {}
+
+    active = []
+    for stage in STAGES:
+        if stage.flag is None or config.get(stage.flag, True):
+            active.append((stage, stage.kwargs(config) if stage.kwargs else {}))
+
+    # Follow cached outputs by hash for as long as stages hit
+    start = 0
+    current_hash = None
+    if cache is not None:
+        current_hash = text_hash(text)
+        while start < len(active):
+            stage, kwargs = active[start]
+            entry = cache.get(StageCache.key(current_hash, stage.name, stage_fingerprint(stage, kwargs)))
+            if entry is None:
+                break
+            current_hash = entry.pop("output")
+            state.update(entry)
+            report["cached_stages"] += 1
+            if debug:
+                print(f"  [{stage.label}] cached")
+            start += 1
+        if start:
+            text = cache.load_text(current_hash)
+            if text is None:  # blob removed underneath us: start over uncached
+                return optimize_markdown(original_text, config, debug)
+
+    # Chain the remaining stages
+    blocks = TextBlocks(text)
+    taps = []
+    for stage, kwargs in active[start:]:
+        out = {}
+        stream = stage.stream if callable(stage.stream) else None
+        blocks = (stream(blocks, out, **kwargs) if stream
+                  else _STREAMS[stage.stream](stage, blocks, out, kwargs))
+        writer = cache.open_blob() if cache is not None else None
+        tokens = [0] if debug else None
+        blocks = _tap(blocks, writer, tokens)
+        taps.append((stage, kwargs, out, writer, tokens))
+
+    try:
+        text = join_blocks(blocks)
+    except BaseException:
+        for *_, writer, _tokens in taps:
+            if writer is not None:
+                writer.discard()
+        raise
+
+    for stage, kwargs, out, writer, tokens in taps:
+        state.update(out)
+        if writer is not None:
+            key = StageCache.key(current_hash, stage.name, stage_fingerprint(stage, kwargs))
+            current_hash = writer.close()
+            cache.put_entry(key, current_hash, **out)
         if debug:
-            t = count_tokens(text)
-            saved = report["original_tokens"] - t
+            # Sum of per-block counts (cached per block), close to the document count
+            saved = report["original_tokens"] - tokens[0]
             pct = saved / report["original_tokens"] * 100 if report["original_tokens"] else 0
-            print(f"  [{stage_name}] {t:,} tokens (saved {saved:,}, {pct:.1f}%)")
+            print(f"  [{stage.label}] ~{tokens[0]:,} tokens (saved {saved:,}, {pct:.1f}%)")
 
-    # Stage 0: Pre-processing (join hard-wrapped lines, remove page numbers)
-    text = preprocess_text(text)
-    report["stages"].append("preprocess")
-    _dbg("preprocess")
-
-    # Stage 1
-    if config.get("citation_optimization", True):
-        text, references = optimize_citations(text)
-        report["stages"].append("citation_optimization")
-        _dbg("citations")
-
-    # Stage 2
-    if config.get("sentence_compression", True):
-        text = compress_sentences(text)
-        report["stages"].append("sentence_compression")
-        _dbg("sentences")
-
-    # Stage 2b: Parenthetical compression
-    text = compress_parentheticals(text)
-    _dbg("parentheticals")
-
-    # Stage 2c: Remove advisory sentences
-    text = remove_advisory_sentences(text)
-    _dbg("advisory")
-
-    # Stage 3
-    if config.get("statistics_compression", True):
-        text = compress_statistics(text)
-        report["stages"].append("statistics_compression")
-        _dbg("statistics")
-
-    # Stage 4
-    if config.get("structure_optimization", True):
-        text = optimize_structure(text)
-        report["stages"].append("structure_optimization")
-        _dbg("structure")
-
-    # Stage 5
-    if config.get("list_optimization", True):
-        text = optimize_lists(text)
-        report["stages"].append("list_optimization")
-        _dbg("lists")
-
-    # Stage 6
-    if config.get("redundancy_removal", True):
-        text = remove_redundancy(text, QUALITY_THRESHOLDS["similarity_threshold"])
-        report["stages"].append("redundancy_removal")
-        _dbg("redundancy")
+    report["stages"] = [stage.name for stage, _ in active if stage.reported]
+    references = state.get("references", [])
 
     # Append numbered references
     if references:
@@ -805,18 +882,47 @@ def get_keywords(filepath: str) -> list:
     with open(filepath, 'r', encoding='utf-8') as f:
         return [l.strip() for l in f if l.strip() and not l.startswith('#')]
 
-def process_file(research_file: Path, base_dir: Path, force: bool = False) -> dict:
-    stem = research_file.stem
-    output_file = base_dir / f"{stem}.optimized.md"
+_pipeline_fingerprints = {}
 
-    if output_file.exists() and not force:
-        print(f"\u251c\u2500\u2500 Skipping {research_file.name}: already optimized.")
-        return None
+def pipeline_fingerprint(config: dict) -> str:
+    """Hash of everything that shapes an .optimized.md: all stage code and
+    rules, quality checks, thresholds and the pipeline config."""
+    memo_key = repr(sorted(config.items()))
+    if memo_key not in _pipeline_fingerprints:
+        _pipeline_fingerprints[memo_key] = rules_fingerprint(process_file, config)
+    return _pipeline_fingerprints[memo_key]
 
-    print(f"\u251c\u2500\u2500 Processing {research_file.name}")
+def process_file(research_file: Path, base_dir: Path, force: bool = False, use_cache: bool = True,
+                 profile_memory: bool = False) -> dict:
+    stem = research_file.stem
+    output_file = base_dir / f"{stem}.optimized.md"
+    cache = StageCache.for_dir(base_dir) if use_cache else None
 
     original_text = research_file.read_text(encoding='utf-8')
-    optimized_text, report = optimize_markdown(original_text)
+    input_hash = text_hash(original_text)
+
+    if output_file.exists() and not force:
+        if cache is None:
+            print(f"\u251c\u2500\u2500 Skipping {research_file.name}: already optimized.")
+            return None
+        # Up to date only if input, pipeline (code/rules/config) and the written output all match
+        manifest = cache.read_manifest(stem)
+        if (manifest.get("input") == input_hash
+                and manifest.get("pipeline") == pipeline_fingerprint(PIPELINE_CONFIG)
+                and manifest.get("output") == text_hash(output_file.read_text(encoding='utf-8'))):
+            print(f"\u251c\u2500\u2500 Skipping {research_file.name}: already optimized.")
+            return None
+        print(f"\u251c\u2500\u2500 Processing {research_file.name} (stale output)")
+    else:
+        print(f"\u251c\u2500\u2500 Processing {research_file.name}")
+    file_start = time.time()
+
+    if profile_memory:
+        tracemalloc.start()
+    optimized_text, report = optimize_markdown(original_text, cache=cache)
+    if profile_memory:
+        report["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
     report["file"] = research_file.name
 
     # Quality validation
@@ -836,15 +942,67 @@ def process_file(research_file: Path, base_dir: Path, force: bool = False) -> di
 
     output_file.parent.mkdir(parents=True, exist_ok=True)
     output_file.write_text(optimized_text, encoding='utf-8')
+    # Skipping above uses the stage-cache manifest; the record feeds `dep_tracker.py status`
+    DepTracker("optimize_research").record(output_file, [research_file])
+    report["processing_time"] = time.time() - file_start
+    if cache is not None:
+        cache.write_manifest(stem, {
+            "input": input_hash,
+            "pipeline": pipeline_fingerprint(PIPELINE_CONFIG),
+            "output": text_hash(optimized_text),
+        })
 
     orig_t = report['original_tokens']
     opt_t = report['optimized_tokens']
     reduction = report['reduction']
+    if report["cached_stages"]:
+        print(f"\u2502   \u251c\u2500\u2500 Cached: {report['cached_stages']} stage(s) reused")
+    if "peak_memory" in report:
+        print(f"\u2502   \u251c\u2500\u2500 Peak memory: {report['peak_memory'] / 1e6:.1f} MB "
+              f"in {report['processing_time']:.2f}s")
     print(f"\u2502   \u251c\u2500\u2500 Before: {orig_t:,} tokens")
     print(f"\u2502   \u251c\u2500\u2500 After:  {opt_t:,} tokens")
     print(f"\u2502   \u2514\u2500\u2500 Saved:  {reduction:.1%}")
     return report
 
+# ==========================================
+# BATCH (process pool)
+# ==========================================
+def _init_worker(config: dict):
+    """Runs once per worker: apply CLI config and load the tokenizer up front."""
+    PIPELINE_CONFIG.update(config)
+    count_tokens("warm-up")  # builds the cached tiktoken encoder
+
+def _process_file_captured(job: tuple) -> tuple:
+    """process_file in a worker; its tree output is returned, not printed, so
+    the parent can print each file's block intact and in input order."""
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        report = process_file(*job)
+    return report, buf.getvalue()
+
+def process_files(md_files: list, base_dir: Path, force: bool = False, workers: int = 1,
+                  use_cache: bool = True, profile_memory: bool = False) -> list:
+    """Run process_file over md_files; reports come back in md_files order."""
+    jobs = []
+    for md_file in md_files:
+        if not md_file.exists():
+            print(f"\u251c\u2500\u2500 Skipping {md_file.name}: file not found")
+            continue
+        jobs.append((md_file, base_dir, force, use_cache, profile_memory))
+
+    if workers <= 1 or len(jobs) <= 1:
+        reports = [process_file(*job) for job in jobs]
+    else:
+        reports = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 initializer=_init_worker, initargs=(dict(PIPELINE_CONFIG),)) as pool:
+            # map() yields in submission order, whatever order workers finish in
+            for report, output in pool.map(_process_file_captured, jobs):
+                print(output, end='')
+                reports.append(report)
+    return [r for r in reports if r]
+
 # ==========================================
 # MAIN
 # ==========================================
@@ -860,8 +1018,17 @@ if __name__ == "__main__":
     parser.add_argument("--all", action="store_true", help="Scan directory for all research .md files")
     parser.add_argument("--force", action="store_true", help="Re-process even if optimized file exists")
     parser.add_argument("--keyword", type=str, help="Process a single keyword instead of the full list")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Process files in parallel across N worker processes (default: 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the per-stage cache (.stage_cache/); rerun every stage")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Trace peak memory per document (slower; reported with per-file time)")
+    parser.add_argument("--dedup-method", choices=["auto", "exact", "minhash"], default=REDUNDANCY_METHOD,
+                        help="Near-duplicate search for redundancy removal (default: auto = minhash on very long documents)")
 
     args = parser.parse_args()
+    PIPELINE_CONFIG["redundancy_method"] = args.dedup_method
     base_dir = Path(args.dir)
 
     start_time = time.time()
@@ -886,14 +1053,8 @@ if __name__ == "__main__":
     print(f"\u251c\u2500\u2500 Scanning {base_dir}/*.md")
     print(f"\u251c\u2500\u2500 Found {len(md_files)} research documents")
 
-    results = []
-    for md_file in md_files:
-        if not md_file.exists():
-            print(f"\u251c\u2500\u2500 Skipping {md_file.name}: file not found")
-            continue
-        report = process_file(md_file, base_dir, force=args.force)
-        if report:
-            results.append(report)
+    results = process_files(md_files, base_dir, force=args.force, workers=args.workers,
+                            use_cache=not args.no_cache, profile_memory=args.profile_memory)
 
     elapsed = time.time() - start_time
 
@@ -915,6 +1076,7 @@ if __name__ == "__main__":
             "total_tokens_after": total_opt,
             "total_reduction": f"{total_reduction:.1%}",
             "processing_time": f"{elapsed:.1f}s",
+            "workers": args.workers,
             "quality_reverts": reverted,
             "files": [
                 {
@@ -924,6 +1086,9 @@ if __name__ == "__main__":
                     "reduction": f"{r['reduction']:.1%}",
                     "quality_passed": r.get("quality_passed", True),
                     "reverted": r.get("reverted", False),
+                    "processing_time": f"{r['processing_time']:.2f}s",
+                    "cached_stages": r.get("cached_stages", 0),
+                    **({"peak_memory": f"{r['peak_memory'] / 1e6:.1f} MB"} if "peak_memory" in r else {}),
                 }
                 for r in results
             ],
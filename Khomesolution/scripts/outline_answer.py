@@ -10,6 +10,12 @@ from typing import Optional, List, Tuple
 # CONFIGURATION (loaded from config.yaml)
 # ==========================================
 from config_loader import get_openrouter_config, get_model_config, load_prompt
+from token_budget import get_stage_budget
+from research_facts import (STORE_FILENAME, CLUSTERS_PATH, load_store, is_current,
+                            related_keywords, assemble_research)
+from dep_tracker import DepTracker
+from outline_tree import parse_outline
+from offload import LoopLagMonitor, read_text, run_cpu, run_io, shutdown, write_text
 
 _or_cfg = get_openrouter_config()
 _model_cfg = get_model_config("outline_answer")
@@ -21,6 +27,8 @@ HTTP_REFERER = _or_cfg["http_referer"]
 OA_TEMPERATURE = _model_cfg.get("temperature", 0.4)
 OA_MAX_TOKENS = _model_cfg.get("max_tokens", 4096)
 OA_X_TITLE = _model_cfg.get("x_title", "Privato Article Generator")
+# Research tokens per section prompt when using the fact store (0 = no limit)
+OA_RESEARCH_TOKENS = get_stage_budget(_model_cfg, "research", 8000)
 
 # System Prompt (loaded from PROMPTS/)
 SYSTEM_PROMPT = load_prompt("outline_answer_system.md")
@@ -32,38 +40,17 @@ class ArticleGenerator:
         self.output_dir = Path("output/research")
         self.concurrency = args.concurrency
         self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.stale_only = args.stale_only
+        self.deps = DepTracker("outline_answer", prompts=["outline_answer_system.md"],
+                               config=["outline_answer"])
+        # Shared fact store (scripts/research_facts.py): each fact once, within budget
+        self.fact_store = load_store(self.research_dir) if args.fact_store else None
+        if args.fact_store and self.fact_store is None:
+            print("Warning: --fact-store given but no fact store found; using full research files.")
 
     def parse_outline_sections(self, outline_content: str) -> List[Tuple[str, str]]:
-        """แยก Outline เป็น Section ตาม H2 แต่ละอัน (รวม H3 ที่อยู่ภายใน)"""
-        sections = []
-        current_section_lines = []
-        current_h2 = None
-
-        for line in outline_content.splitlines():
-            stripped = line.strip()
-            # ตรวจจับ <h1> แยกออก (ไม่นับเป็น section)
-            if stripped.startswith("<h1>"):
-                continue
-            # ตรวจจับ comment lines
-            if stripped.startswith("<!--") and stripped.endswith("-->"):
-                continue
-            # ตรวจจับ <h2> = เริ่ม section ใหม่
-            if stripped.startswith("<h2>"):
-                # บันทึก section ก่อนหน้า
-                if current_h2 and current_section_lines:
-                    sections.append(("\n".join(current_section_lines), current_h2))
-                current_h2 = re.sub(r"</?h2>", "", stripped).strip()
-                current_section_lines = [stripped]
-            elif stripped.startswith("<h3>"):
-                current_section_lines.append(stripped)
-            elif stripped:
-                current_section_lines.append(stripped)
-
-        # บันทึก section สุดท้าย
-        if current_h2 and current_section_lines:
-            sections.append(("\n".join(current_section_lines), current_h2))
-
-        return sections
+        """แยก Outline เป็น Section ตาม H2 แต่ละอัน (รวม H3/H4 ที่อยู่ภายใน; ไม่รวม H1 และ comment)"""
+        return parse_outline(outline_content).sections()
 
     async def call_ai_writer(self, prompt: str) -> Optional[str]:
         """ส่งข้อมูลให้ AI เขียนบทความ"""
@@ -100,14 +87,14 @@ class ArticleGenerator:
                 print(f"  Request Exception: {e}")
                 return None
 
-    def load_file(self, path: Path) -> Optional[str]:
+    async def load_file(self, path: Path) -> Optional[str]:
         if path.exists():
-            with open(path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return await read_text(path)
         return None
 
-    def markdown_to_html(self, md_content: str) -> str:
-        """แปลง Markdown พื้นฐานเป็น HTML (ไม่ต้องพึ่ง library ภายนอก)"""
+    @staticmethod
+    def markdown_to_html(md_content: str) -> str:
+        """แปลง Markdown พื้นฐานเป็น HTML (ไม่ต้องพึ่ง library ภายนอก; รันใน process pool)"""
         lines = md_content.split('\n')
         html_lines = []
         in_ul = False
@@ -170,14 +157,27 @@ class ArticleGenerator:
             prompt_dir.mkdir(parents=True, exist_ok=True)
             answer_dir.mkdir(parents=True, exist_ok=True)
 
-            # 2. Skip ถ้ามี output สุดท้ายแล้ว
-            if final_html_path.exists():
+            # Section answers and the final HTML are built from the outline + research
+            use_store = bool(self.fact_store) and is_current(self.fact_store, keyword, self.research_dir)
+            input_paths = [outline_path, research_path]
+            if use_store:
+                input_paths.append(self.research_dir / STORE_FILENAME)
+                if CLUSTERS_PATH.exists():
+                    input_paths.append(CLUSTERS_PATH)
+
+            # 2. Skip ถ้ามี output สุดท้ายแล้ว (--stale-only: ถ้ายัง up to date)
+            if self.stale_only:
+                if await run_io(self.deps.skip_if_fresh, final_html_path, input_paths):
+                    print(f"[{keyword}] Skipped: Final HTML is up to date.")
+                    return
+                print(f"[{keyword}] Stale: {await run_io(self.deps.check, final_html_path, input_paths)}")
+            elif final_html_path.exists():
                 print(f"[{keyword}] Skipped: Final HTML already exists.")
                 return
 
             # 3. โหลดไฟล์ Input
-            outline_content = self.load_file(outline_path)
-            research_content = self.load_file(research_path)
+            outline_content = await self.load_file(outline_path)
+            research_content = await self.load_file(research_path)
 
             if not outline_content:
                 print(f"[{keyword}] Error: Outline not found at {outline_path.resolve()}")
@@ -185,6 +185,16 @@ class ArticleGenerator:
             if not research_content:
                 print(f"[{keyword}] Error: Research data not found at {research_path.resolve()}")
                 return
+            if use_store:
+                related = related_keywords(self.fact_store, keyword, self.research_dir)
+                research_content, usage = assemble_research(
+                    self.fact_store, related, OA_RESEARCH_TOKENS, MODEL_NAME)
+                print(f"[{keyword}] Research from fact store ({len(related) - 1} cluster siblings): "
+                      f"{usage['facts']} facts, "
+                      f"~{usage['tokens']:,} tokens (source ~{usage['tokens_source']:,}, "
+                      f"{usage['facts_deduplicated']} repeats, {usage['facts_over_budget']} over budget)")
+            elif self.fact_store:
+                print(f"[{keyword}] Fact store is stale or missing this keyword; using {research_path.name}")
 
             # 4. แยก Outline เป็น Sections
             sections = self.parse_outline_sections(outline_content)
@@ -200,8 +210,12 @@ class ArticleGenerator:
                 prompt_path = prompt_dir / f"{section_num}-prompt.txt"
                 answer_path = answer_dir / f"{section_num}-answer.md"
 
-                # Skip ถ้า answer มีอยู่แล้ว (resume ได้)
-                if answer_path.exists():
+                # Skip ถ้า answer มีอยู่แล้ว (resume ได้; --stale-only: ถ้ายัง up to date)
+                if self.stale_only:
+                    if await run_io(self.deps.skip_if_fresh, answer_path, input_paths):
+                        print(f"  [{keyword}] Section {section_num} skipped (up to date).")
+                        continue
+                elif answer_path.exists():
                     print(f"  [{keyword}] Section {section_num} skipped (answer exists).")
                     continue
 
@@ -219,16 +233,15 @@ class ArticleGenerator:
 Please write the content for this section now in Markdown format.
 """
                 # บันทึก Prompt
-                with open(prompt_path, 'w', encoding='utf-8') as f:
-                    f.write(user_prompt)
+                await write_text(prompt_path, user_prompt)
 
                 # เรียก AI
                 print(f"  [{keyword}] Section {section_num}: {h2_title}...")
                 answer_content = await self.call_ai_writer(user_prompt)
 
                 if answer_content:
-                    with open(answer_path, 'w', encoding='utf-8') as f:
-                        f.write(answer_content)
+                    await write_text(answer_path, answer_content)
+                    await run_io(self.deps.record, answer_path, input_paths)
                     print(f"  [{keyword}] Section {section_num}: Done ({len(answer_content)} chars)")
                 else:
                     print(f"  [{keyword}] Section {section_num}: FAILED")
@@ -239,22 +252,21 @@ Please write the content for this section now in Markdown format.
             merged_parts = []
             for idx in range(1, len(sections) + 1):
                 answer_path = answer_dir / f"{idx:02d}-answer.md"
-                content = self.load_file(answer_path)
+                content = await self.load_file(answer_path)
                 if content:
                     merged_parts.append(content)
                 else:
                     print(f"  [{keyword}] Warning: Missing answer {idx:02d}")
 
             merged_md = "\n\n".join(merged_parts)
-            with open(merged_md_path, 'w', encoding='utf-8') as f:
-                f.write(merged_md)
+            await write_text(merged_md_path, merged_md)
             print(f"[{keyword}] Merged MD saved ({len(merged_md)} chars)")
 
             # 7. Convert to HTML -> .html
-            html_body = self.markdown_to_html(merged_md)
+            html_body = await run_cpu(ArticleGenerator.markdown_to_html, merged_md)
             html_output = f"<article>\n{html_body}\n</article>"
-            with open(final_html_path, 'w', encoding='utf-8') as f:
-                f.write(html_output)
+            await write_text(final_html_path, html_output)
+            await run_io(self.deps.record, final_html_path, input_paths)
             print(f"[{keyword}] Final HTML saved ({len(html_output)} chars)")
 
     async def run(self, keywords_file: str):
@@ -267,8 +279,10 @@ Please write the content for this section now in Markdown format.
 
         print(f"Starting Phase 6: Section-by-Section Article Generation for {len(keywords)} keywords.")
 
-        tasks = [self.process_keyword(kw) for kw in keywords]
-        await asyncio.gather(*tasks)
+        async with LoopLagMonitor() as lag:
+            tasks = [self.process_keyword(kw) for kw in keywords]
+            await asyncio.gather(*tasks)
+        print(f"Event loop: {lag.report()}")
 
 # ==========================================
 # MAIN ENTRY POINT
@@ -277,6 +291,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Privato Content - Phase 6: Section-by-Section Article Generator")
     parser.add_argument("--keywords", default="data/keywords/keywords.txt", help="Path to keywords file")
     parser.add_argument("--concurrency", type=int, default=3, help="Parallel generation limit")
+    parser.add_argument("--fact-store", action="store_true",
+                        help="Build research context for each keyword and its cluster siblings from "
+                             "data/deep-research/_fact_store.json (run scripts/research_facts.py, "
+                             "and keyword_clustering.py for siblings, first)")
+    parser.add_argument("--stale-only", action="store_true",
+                        help="Regenerate articles/sections whose outline, research, prompt, config or code changed")
 
     args = parser.parse_args()
 
@@ -284,4 +304,7 @@ if __name__ == "__main__":
         print("Error: Please set OPENROUTER_API_KEY environment variable.")
     else:
         gen = ArticleGenerator(args)
-        asyncio.run(gen.run(args.keywords))
+        try:
+            asyncio.run(gen.run(args.keywords))
+        finally:
+            shutdown()
@@ -11,6 +11,15 @@ from datetime import datetime
 from typing import List, Dict, Optional, Any, Tuple
 
 from config_loader import get_openrouter_config, get_model_config, load_prompt
+from token_budget import fit_to_budget, get_stage_budget
+from dep_tracker import DepTracker
+from job_store import JobStore
+from serp_schema import analysis_paths, find_analysis, load_analysis, yaml_dump
+from cost_estimator import CostEstimator
+from request_router import RequestRouter
+from offload import LoopLagMonitor, read_text, run_cpu, run_io, shutdown, write_text
+from outline_repair import HEADING_MAX, HEADING_MIN, repair_prompt, trim_outline
+from outline_tree import parse_outline
 
 # --- Configuration & Constants (loaded from config.yaml) ---
 _or_cfg = get_openrouter_config()
@@ -29,24 +38,34 @@ DEFAULT_MODEL = _gen_cfg["model"]
 DEFAULT_TEMPERATURE = _gen_cfg.get("temperature", 0.3)
 DEFAULT_MAX_TOKENS = _gen_cfg.get("max_tokens", 4000)
 GEN_X_TITLE = _gen_cfg.get("x_title", "Privato Outline Generator")
+QUERY_CSV_TOKENS = get_stage_budget(_gen_cfg, "query_csv", 1600)
+GEN_RETRIES = _gen_cfg.get("retries", 3)
+# Tried in order when an outline's heading count is out of range (see outline_repair.py)
+REPAIR_PATHS = ("deterministic", "llm", "regenerate")
+DEFAULT_REPAIR_PATHS = _gen_cfg.get("repair_paths", list(REPAIR_PATHS))
+
+# Analysis pass: its own worker pool, model and retry policy (models.outline_analysis)
+ANA_MODEL = _ana_cfg.get("model", DEFAULT_MODEL)
+ANA_TEMPERATURE = _ana_cfg.get("temperature", DEFAULT_TEMPERATURE)
+ANA_MAX_TOKENS = _ana_cfg.get("max_tokens", DEFAULT_MAX_TOKENS)
+ANA_MAX_CONCURRENCY = _ana_cfg.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+ANA_TIMEOUT = _ana_cfg.get("timeout", DEFAULT_TIMEOUT)
+ANA_RETRIES = _ana_cfg.get("retries", 3)
 ANA_X_TITLE = _ana_cfg.get("x_title", "Privato Outline Analyzer")
 
 # Paths
 OUTPUT_DIR = Path("output/research")
 CHECKPOINT_DIR = OUTPUT_DIR / "checkpoints"
-CHECKPOINT_FILE = "outline_master_checkpoint.json"
+CHECKPOINT_FILE = "outline_master_checkpoint.json"   # legacy JSON checkpoint, imported into the job store
+STAGE = "outline_generation"
+ANALYSIS_STAGE = "outline_analysis"
 LOG_DIR = Path("logs")
 LOG_FILE = "outline_generation.log"
 KEYWORDS_FILE = "data/keywords/keywords.txt"
 
 # Rate Limiting
 RATE_LIMIT_RPM = _gen_cfg.get("rate_limit_rpm", 60)
-
-# Cost Estimation (per 1K tokens - Gemini Flash pricing)
-COST_PER_1K_INPUT = 0.000075
-COST_PER_1K_OUTPUT = 0.0003
-EST_INPUT_TOKENS = 2500
-EST_OUTPUT_TOKENS = 1200
+ANA_RATE_LIMIT_RPM = _ana_cfg.get("rate_limit_rpm", RATE_LIMIT_RPM)
 
 # Source Context (hardcoded per HTML spec)
 SOURCE_CONTEXT = "Home solution center specializing in roofing, doors, windows, bathroom fixtures with installation services."
@@ -107,6 +126,16 @@ class OutlineGenerator:
         self.timeout = aiohttp.ClientTimeout(total=args.timeout)
         self.rate_limiter = RateLimiter(RATE_LIMIT_RPM)
         self.logger = setup_logging()
+        # Hedging / fallback model per pass (models.outline_generation / models.outline_analysis)
+        self.router = RequestRouter(_gen_cfg, self.rate_limiter,
+                                    lambda event, data: log_json(self.logger, event, data))
+
+        # Analysis pass: saved outlines stream through a queue to its own workers
+        self.analysis_timeout = aiohttp.ClientTimeout(total=ANA_TIMEOUT)
+        self.analysis_rate_limiter = RateLimiter(ANA_RATE_LIMIT_RPM)
+        self.analysis_router = RequestRouter(_ana_cfg, self.analysis_rate_limiter,
+                                             lambda event, data: log_json(self.logger, event, data))
+        self.analysis_queue: Optional[asyncio.Queue] = None
 
         # Paths
         self.output_dir = OUTPUT_DIR
@@ -130,44 +159,43 @@ class OutlineGenerator:
             "validation_warnings": 0,
             "structural_failures": 0,
             "analysis_success": 0,
-            "analysis_failed": 0
+            "analysis_failed": 0,
+            "repair": {path: {"attempts": 0, "success": 0, "tokens": 0} for path in REPAIR_PATHS}
         }
 
-        # Load checkpoint
-        self.checkpoint = self._load_checkpoint()
-
-    def _load_checkpoint(self) -> Dict[str, Any]:
-        """Load checkpoint file."""
-        if self.checkpoint_path.exists():
-            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"completed": [], "failed": [], "last_index": 0}
-
-    def _save_checkpoint(self):
-        """Save checkpoint file."""
-        self.checkpoint["updated_at"] = datetime.now().isoformat()
-        with open(self.checkpoint_path, 'w', encoding='utf-8') as f:
-            json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+        # Job state (replaces the JSON checkpoint lists)
+        self.jobs = JobStore()
+        self.jobs.import_checkpoint(STAGE, self.checkpoint_path)
+        self.deps = DepTracker(STAGE,
+                               prompts=["outline_generation_system.md", "outline_generation_user.md",
+                                        "outline_analysis_system.md", "outline_analysis_user.md",
+                                        "outline_repair_system.md", "outline_repair_user.md"],
+                               config=["outline_generation", "outline_analysis"])
+        # The two passes run in separate worker pools with separate rate limits
+        analysis = not getattr(args, 'skip_analysis', False)
+        self.estimator = (CostEstimator(args.max_concurrency + (args.analysis_concurrency if analysis else 0),
+                                        RATE_LIMIT_RPM + (ANA_RATE_LIMIT_RPM if analysis else 0))
+                          if args.dry_run or args.estimate_cost else None)
 
     def _load_serp_analysis(self, keyword: str) -> Optional[Dict]:
-        """Load SERP analysis YAML for keyword."""
-        serp_file = self.output_dir / keyword / f"{keyword}-serp-analysis.yaml"
+        """Load SERP analysis for keyword (JSON artifact, else legacy YAML)."""
+        keyword_dir = self.output_dir / keyword
+        serp_file = find_analysis(keyword_dir, keyword)
         if self.verbose:
-            print(f"  [SERP] Looking for: {serp_file}")
+            print(f"  [SERP] Looking for: {serp_file or analysis_paths(keyword_dir, keyword)[0]}")
 
-        if serp_file.exists():
+        if serp_file:
             try:
-                with open(serp_file, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f)
-                    if self.verbose:
-                        print(f"  [SERP] Loaded successfully ({len(str(data))} chars)")
-                    return data
+                data = load_analysis(serp_file)
+                if self.verbose:
+                    print(f"  [SERP] Loaded successfully ({len(str(data))} chars)")
+                return data
             except Exception as e:
                 print(f"  [ERROR] Failed to load SERP file: {e}")
                 return None
         else:
             if self.verbose:
-                print(f"  [SERP] File not found: {serp_file}")
+                print(f"  [SERP] File not found: {analysis_paths(keyword_dir, keyword)[0]}")
         return None
 
     def _load_master_queries(self, keyword: str, limit: int = 50) -> str:
@@ -249,7 +277,7 @@ class OutlineGenerator:
                 reverse=True
             )[:5]
 
-        return yaml.dump(relevant, allow_unicode=True, default_flow_style=False)
+        return yaml_dump(relevant, sort_keys=True)
 
     def _validate_outline(self, content: str) -> Tuple[bool, List[str], bool]:
         """Validate outline against Koray framework.
@@ -259,24 +287,22 @@ class OutlineGenerator:
             - is_valid: True if no issues at all.
             - issues: list of human-readable issue strings.
             - is_structural_failure: True if total headings outside 25-30
-              (hard reject — outline must NOT be saved).
+              (outline must NOT be saved unless a repair path fixes it).
         """
         issues = []
         is_structural_failure = False
+        tree = parse_outline(content)
 
         # Count headings
-        h1_count = len(re.findall(r'<h1[^>]*>', content, re.IGNORECASE))
-        h2_count = len(re.findall(r'<h2[^>]*>', content, re.IGNORECASE))
-        h3_count = len(re.findall(r'<h3[^>]*>', content, re.IGNORECASE))
-        h4_count = len(re.findall(r'<h4[^>]*>', content, re.IGNORECASE))
-        total_headings = h1_count + h2_count + h3_count + h4_count
+        h1_count, h2_count, h3_count, h4_count = (tree.counts[level] for level in (1, 2, 3, 4))
+        total_headings = tree.total
 
         # Total headline count check — strict structural failure
-        if total_headings < 25 or total_headings > 30:
+        if total_headings < HEADING_MIN or total_headings > HEADING_MAX:
             issues.append(
                 f"STRUCTURAL FAILURE: total headings {total_headings} "
                 f"(H1={h1_count} H2={h2_count} H3={h3_count} H4={h4_count}, "
-                f"required 25-30)"
+                f"required {HEADING_MIN}-{HEADING_MAX})"
             )
             is_structural_failure = True
 
@@ -289,25 +315,20 @@ class OutlineGenerator:
             issues.append(f"H2 count: {h2_count} (minimum 5)")
 
         # Contextual Bridge check
-        if "Contextual Bridge" not in content:
+        if "Contextual Bridge" not in tree.markers:
             issues.append("Missing <!-- Contextual Bridge --> marker")
 
         # Antonym Context check
-        if "Antonym Context" not in content:
+        if "Antonym Context" not in tree.markers:
             issues.append("Missing <!-- Antonym Context --> marker")
 
         # Check for duplicates
-        headings = re.findall(r'<h[1-4][^>]*>([^<]+)</h[1-4]>', content, re.IGNORECASE)
-        unique = set(h.strip().lower() for h in headings)
-        if len(unique) != len(headings):
+        if tree.duplicates:
             issues.append("Duplicate headings detected")
 
         # Check for non-HTML content
-        non_html = sum(1 for line in content.split('\n')
-                      if line.strip() and not line.strip().startswith('<')
-                      and not line.strip().startswith('<!--'))
-        if non_html > 2:
-            issues.append(f"Contains {non_html} non-HTML lines")
+        if tree.non_html > 2:
+            issues.append(f"Contains {tree.non_html} non-HTML lines")
 
         return len(issues) == 0, issues, is_structural_failure
 
@@ -333,7 +354,7 @@ class OutlineGenerator:
 
     async def _analyze_outline(self, session: aiohttp.ClientSession,
                                 keyword: str, keyword_index: int,
-                                outline: str, retries: int = 3) -> Optional[Dict]:
+                                outline: str, retries: int = ANA_RETRIES) -> Optional[Dict]:
         """Call OpenRouter API with outline analysis prompt."""
         user_prompt = ANALYSIS_USER_PROMPT_TEMPLATE.format(
             keyword=keyword,
@@ -348,56 +369,61 @@ class OutlineGenerator:
         }
 
         payload = {
-            "model": self.args.model,
+            "model": self.args.analysis_model,
             "messages": [
                 {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
-            "temperature": self.args.temperature,
-            "max_tokens": self.args.max_tokens
+            "temperature": ANA_TEMPERATURE,
+            "max_tokens": ANA_MAX_TOKENS
         }
 
+        failures = 0                # errors and timeouts; 429 retries are not failures
         for attempt in range(retries):
             try:
-                await self.rate_limiter.acquire()
+                await self.analysis_rate_limiter.acquire()
 
                 if self.verbose:
                     print(f"  [ANALYSIS] Attempt {attempt + 1}/{retries}...")
 
-                async with session.post(OPENROUTER_API_URL, headers=headers,
-                                        json=payload, timeout=self.timeout) as resp:
-                    if resp.status == 429:
-                        wait = (2 ** attempt) * 5
-                        print(f"  [RATE-LIMIT] Waiting {wait}s...")
-                        await asyncio.sleep(wait)
-                        continue
+                started = time.perf_counter()
+                reply = await self.analysis_router.post(session, OPENROUTER_API_URL, headers, payload,
+                                                         self.analysis_timeout, failures=failures, label=keyword)
+                if reply["status"] == 429:
+                    wait = (2 ** attempt) * 5
+                    print(f"  [RATE-LIMIT] Waiting {wait}s...")
+                    await asyncio.sleep(wait)
+                    continue
 
-                    if resp.status != 200:
-                        error = await resp.text()
-                        raise Exception(f"API {resp.status}: {error[:200]}")
+                if reply["status"] != 200:
+                    error = reply["text"]
+                    raise Exception(f"API {reply['status']}: {error[:200]}")
 
-                    result = await resp.json()
+                result = reply["data"]
 
-                    if "choices" not in result or not result["choices"]:
-                        raise Exception("Invalid API response: no choices")
+                if "choices" not in result or not result["choices"]:
+                    raise Exception("Invalid API response: no choices")
 
-                    if "message" not in result["choices"][0]:
-                        raise Exception("Invalid API response: no message")
+                if "message" not in result["choices"][0]:
+                    raise Exception("Invalid API response: no message")
 
-                    usage = result.get("usage", {})
-                    self.stats["tokens_used"] += usage.get("total_tokens", 0)
+                usage = result.get("usage", {})
+                self.stats["tokens_used"] += usage.get("total_tokens", 0)
+                self._log_usage("outline_analysis", reply["model"], usage, started)
 
-                    content = result["choices"][0]["message"]["content"]
-                    if not content or not content.strip():
-                        raise Exception("API returned empty content")
+                content = result["choices"][0]["message"]["content"]
+                if not content or not content.strip():
+                    raise Exception("API returned empty content")
 
-                    return {"content": content, "usage": usage}
+                return {"content": content, "usage": usage}
 
             except asyncio.TimeoutError:
+                failures += 1
                 print(f"  [ANALYSIS-TIMEOUT] Attempt {attempt + 1}/{retries}")
                 if attempt < retries - 1:
                     await asyncio.sleep((2 ** attempt) * 2)
             except Exception as e:
+                failures += 1
                 print(f"  [ANALYSIS-ERROR] Attempt {attempt + 1}: {str(e)[:100]}")
                 log_json(self.logger, "analysis_error", {
                     "keyword": keyword, "attempt": attempt + 1, "error": str(e)[:200]
@@ -408,8 +434,9 @@ class OutlineGenerator:
         print(f"  [ANALYSIS-FAILED] All {retries} attempts exhausted")
         return None
 
-    def _apply_analysis(self, outline: str, analysis_yaml_str: str) -> Optional[str]:
-        """Apply analysis decisions to produce a refined outline."""
+    @staticmethod
+    def _apply_analysis(outline: str, analysis_yaml_str: str) -> Optional[str]:
+        """Apply analysis decisions to produce a refined outline (runs in the process pool)."""
         try:
             # Clean YAML fences if present
             cleaned = analysis_yaml_str.strip()
@@ -429,13 +456,9 @@ class OutlineGenerator:
                     decisions[text.lower()] = entry
 
             refined_lines = []
-            for line in outline.split('\n'):
-                stripped = line.strip()
-
-                # Match heading tags
-                match = re.match(r'<(h[1-4])[^>]*>(.*?)</\1>', stripped, re.IGNORECASE)
-                if match:
-                    level, text = match.group(1).lower(), match.group(2).strip()
+            for line, parsed in zip(outline.split('\n'), parse_outline(outline).lines):
+                if parsed.kind == "heading":
+                    level, text = f"h{parsed.level}", parsed.text
 
                     # Always keep H1
                     if level == 'h1':
@@ -463,47 +486,83 @@ class OutlineGenerator:
             print(f"  [WARN] Failed to apply analysis: {e}")
             return None
 
-    def estimate_cost(self, keyword_count: int) -> Dict[str, Any]:
-        """Estimate API cost (generation + analysis passes)."""
-        skip_analysis = getattr(self.args, 'skip_analysis', False)
-        passes = 1 if skip_analysis else 2  # generation + analysis
-
-        input_tokens = keyword_count * EST_INPUT_TOKENS * passes
-        output_tokens = keyword_count * EST_OUTPUT_TOKENS * passes
-
-        input_cost = (input_tokens / 1000) * COST_PER_1K_INPUT
-        output_cost = (output_tokens / 1000) * COST_PER_1K_OUTPUT
-
-        return {
-            "keywords": keyword_count,
-            "passes": passes,
-            "est_input_tokens": input_tokens,
-            "est_output_tokens": output_tokens,
-            "est_input_cost": round(input_cost, 4),
-            "est_output_cost": round(output_cost, 4),
-            "est_total_cost": round(input_cost + output_cost, 4)
-        }
-
-    async def _call_api(self, session: aiohttp.ClientSession, keyword: str,
-                        keyword_index: int, serp_data: Dict, query_csv: str,
-                        retries: int = 3) -> Optional[Dict]:
-        """Call OpenRouter API with retry logic."""
+    def _log_usage(self, task: str, model: str, usage: Dict, started: float):
+        """Usage history for cost_estimator.py."""
+        log_json(self.logger, "api_usage", {
+            "task": task,
+            "model": model,
+            "keywords": 1,
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "latency_s": round(time.perf_counter() - started, 3)
+        })
 
-        # Build prompt variables
+    def _estimate_keyword(self, keyword: str, keyword_index: int,
+                          serp_data: Dict, query_csv: str) -> List[Dict]:
+        """Estimate the generation (+ analysis) requests from the rendered prompts."""
+        user_prompt = self._user_prompt(keyword, keyword_index, serp_data, query_csv)
+        gen = self.estimator.request("outline_generation", self.args.model,
+                                     [SYSTEM_PROMPT, user_prompt], self.args.max_tokens)
+        requests = [gen]
+        self.estimator.add_job([gen])
+        if not getattr(self.args, 'skip_analysis', False):
+            # The analysis prompt embeds the generated outline: use its predicted size.
+            # It runs in its own worker pool, so it is a separate job, not a second step.
+            ana = self.estimator.request(
+                "outline_analysis", self.args.analysis_model,
+                [ANALYSIS_SYSTEM_PROMPT, ANALYSIS_USER_PROMPT_TEMPLATE.format(keyword=keyword, raw_outline="")],
+                ANA_MAX_TOKENS, extra_tokens=gen["output_tokens"])
+            requests.append(ana)
+            self.estimator.add_job([ana])
+        return requests
+
+    def estimate_cost(self, keywords: List[str]) -> Dict[str, Any]:
+        """Estimate API cost and wall time for the keywords a run would process."""
+        force = getattr(self.args, 'force', False)
+        for i, keyword in enumerate(keywords, 1):
+            if not force and self.jobs.is_done(STAGE, keyword):
+                continue
+            output_path = self.output_dir / keyword / f"{keyword}-outline-optimized.md"
+            if self.args.incremental and output_path.exists() and not force:
+                continue
+            serp_data = self._load_serp_analysis(keyword)
+            if not serp_data:
+                continue
+            self._estimate_keyword(keyword, i, serp_data, self._load_master_queries(keyword))
+        return self.estimator.summary()
+
+    def _user_prompt(self, keyword: str, keyword_index: int, serp_data: Dict, query_csv: str) -> str:
+        """Rendered generation prompt (master-queries CSV fitted to its token budget)."""
         language = self._detect_language(serp_data)
         variables = self._extract_prompt_variables(serp_data)
         serp_yaml = self._format_serp_yaml(serp_data)
+        query_csv, usage = fit_to_budget(query_csv, QUERY_CSV_TOKENS, self.args.model,
+                                         stage="outline_generation.query_csv")
+        if usage["truncated"]:
+            log_json(self.logger, "token_budget", {"keyword": keyword, **usage})
 
-        user_prompt = USER_PROMPT_TEMPLATE.format(
+        return USER_PROMPT_TEMPLATE.format(
             keyword_index=keyword_index,
             keyword=keyword,
             source_context=SOURCE_CONTEXT,
             serp_analysis_yaml=serp_yaml,
-            query_csv=query_csv[:2000],
+            query_csv=query_csv,
             language=language,
             **variables
         )
 
+    async def _call_api(self, session: aiohttp.ClientSession, keyword: str,
+                        keyword_index: int, serp_data: Dict, query_csv: str,
+                        retries: int = GEN_RETRIES) -> Optional[Dict]:
+        """Call OpenRouter API with the full generation prompt."""
+        user_prompt = self._user_prompt(keyword, keyword_index, serp_data, query_csv)
+        return await self._complete(session, keyword, SYSTEM_PROMPT, user_prompt,
+                                    "outline_generation", retries)
+
+    async def _complete(self, session: aiohttp.ClientSession, keyword: str,
+                        system_prompt: str, user_prompt: str, task: str,
+                        retries: int = GEN_RETRIES) -> Optional[Dict]:
+        """One chat completion on the generation model, with retry logic."""
         headers = {
             "Authorization": f"Bearer {API_KEY}",
             "Content-Type": "application/json",
@@ -514,66 +573,71 @@ class OutlineGenerator:
         payload = {
             "model": self.args.model,
             "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             "temperature": self.args.temperature,
             "max_tokens": self.args.max_tokens
         }
 
+        failures = 0                # errors and timeouts; 429 retries are not failures
         for attempt in range(retries):
             try:
                 await self.rate_limiter.acquire()
 
                 if self.verbose:
-                    print(f"  [API] Attempt {attempt + 1}/{retries}...")
-
-                async with session.post(OPENROUTER_API_URL, headers=headers,
-                                        json=payload, timeout=self.timeout) as resp:
-                    if resp.status == 429:
-                        wait = (2 ** attempt) * 5
-                        print(f"  [RATE-LIMIT] Waiting {wait}s...")
-                        log_json(self.logger, "rate_limited", {
-                            "keyword": keyword, "attempt": attempt + 1, "wait": wait
-                        })
-                        await asyncio.sleep(wait)
-                        continue
+                    print(f"  [API] {task}: attempt {attempt + 1}/{retries}...")
+
+                started = time.perf_counter()
+                reply = await self.router.post(session, OPENROUTER_API_URL, headers, payload, self.timeout,
+                                                failures=failures, label=keyword)
+                if reply["status"] == 429:
+                    wait = (2 ** attempt) * 5
+                    print(f"  [RATE-LIMIT] Waiting {wait}s...")
+                    log_json(self.logger, "rate_limited", {
+                        "keyword": keyword, "attempt": attempt + 1, "wait": wait
+                    })
+                    await asyncio.sleep(wait)
+                    continue
 
-                    if resp.status != 200:
-                        error = await resp.text()
-                        print(f"  [API-ERROR] Status {resp.status}: {error[:100]}")
-                        raise Exception(f"API {resp.status}: {error[:200]}")
+                if reply["status"] != 200:
+                    error = reply["text"]
+                    print(f"  [API-ERROR] Status {reply['status']}: {error[:100]}")
+                    raise Exception(f"API {reply['status']}: {error[:200]}")
 
-                    result = await resp.json()
+                result = reply["data"]
 
-                    # Validate response structure
-                    if "choices" not in result or not result["choices"]:
-                        print(f"  [API-ERROR] Invalid response structure: {str(result)[:100]}")
-                        raise Exception("Invalid API response: no choices")
+                # Validate response structure
+                if "choices" not in result or not result["choices"]:
+                    print(f"  [API-ERROR] Invalid response structure: {str(result)[:100]}")
+                    raise Exception("Invalid API response: no choices")
 
-                    if "message" not in result["choices"][0]:
-                        print(f"  [API-ERROR] No message in choice: {str(result['choices'][0])[:100]}")
-                        raise Exception("Invalid API response: no message")
+                if "message" not in result["choices"][0]:
+                    print(f"  [API-ERROR] No message in choice: {str(result['choices'][0])[:100]}")
+                    raise Exception("Invalid API response: no message")
 
-                    usage = result.get("usage", {})
-                    self.stats["tokens_used"] += usage.get("total_tokens", 0)
+                usage = result.get("usage", {})
+                self.stats["tokens_used"] += usage.get("total_tokens", 0)
+                self._log_usage(task, reply["model"], usage, started)
 
-                    content = result["choices"][0]["message"]["content"]
-                    if not content or not content.strip():
-                        print(f"  [API-ERROR] Empty content returned")
-                        raise Exception("API returned empty content")
+                content = result["choices"][0]["message"]["content"]
+                if not content or not content.strip():
+                    print(f"  [API-ERROR] Empty content returned")
+                    raise Exception("API returned empty content")
 
-                    return {
-                        "content": content,
-                        "usage": usage
-                    }
+                return {
+                    "content": content,
+                    "usage": usage
+                }
 
             except asyncio.TimeoutError:
+                failures += 1
                 print(f"  [TIMEOUT] Attempt {attempt + 1}/{retries}")
                 log_json(self.logger, "timeout", {"keyword": keyword, "attempt": attempt + 1})
                 if attempt < retries - 1:
                     await asyncio.sleep((2 ** attempt) * 2)
             except aiohttp.ClientError as e:
+                failures += 1
                 print(f"  [NETWORK-ERROR] {type(e).__name__}: {str(e)[:100]}")
                 log_json(self.logger, "api_error", {
                     "keyword": keyword, "attempt": attempt + 1, "error": str(e)[:200]
@@ -581,6 +645,7 @@ class OutlineGenerator:
                 if attempt < retries - 1:
                     await asyncio.sleep((2 ** attempt) * 2)
             except Exception as e:
+                failures += 1
                 print(f"  [ERROR] Attempt {attempt + 1}: {str(e)[:100]}")
                 log_json(self.logger, "api_error", {
                     "keyword": keyword, "attempt": attempt + 1, "error": str(e)[:200]
@@ -591,50 +656,207 @@ class OutlineGenerator:
         print(f"  [FAILED] All {retries} attempts exhausted")
         return None
 
+    # ==========================================
+    # REPAIR (structurally invalid outlines)
+    # ==========================================
+    def _record_repair(self, keyword: str, path: str, success: bool, tokens: int, detail: Any):
+        stats = self.stats["repair"][path]
+        stats["attempts"] += 1
+        stats["success"] += success
+        stats["tokens"] += tokens
+        log_json(self.logger, "outline_repair", {
+            "keyword": keyword, "path": path, "success": success, "tokens": tokens, "detail": detail
+        })
+        print(f"  [REPAIR] {keyword}: {path} {'fixed' if success else 'failed'}"
+              + (f" ({tokens:,} tokens)" if tokens else ""))
+
+    async def _repair_outline(self, session: aiohttp.ClientSession, keyword: str,
+                              keyword_index: int, outline: str, issues: List[str],
+                              serp_data: Dict, query_csv: str) -> Tuple[Optional[str], int]:
+        """Try the repair paths cheapest first.
+
+        Returns (structurally valid outline or None, tokens spent on repair).
+        """
+        violation = next(i for i in issues if i.startswith("STRUCTURAL FAILURE")).split(": ", 1)[1]
+        spent = 0
+        for path in self.args.repair_paths:
+            if path == "deterministic":
+                fixed, actions = trim_outline(outline, keyword)
+                ok = fixed is not None and not self._validate_outline(fixed)[2]
+                if fixed is not None or actions:
+                    self._record_repair(keyword, path, ok, 0, actions)
+
+            elif path == "llm":
+                system_prompt, user_prompt = repair_prompt(outline, keyword, violation)
+                result = await self._complete(session, keyword, system_prompt, user_prompt, "outline_repair")
+                tokens = result["usage"].get("total_tokens", 0) if result else 0
+                fixed = self._clean_outline(result["content"]) if result else None
+                ok = fixed is not None and not self._validate_outline(fixed)[2]
+                self._record_repair(keyword, path, ok, tokens, violation)
+                spent += tokens
+
+            elif path == "regenerate":
+                result = await self._call_api(session, keyword, keyword_index, serp_data, query_csv)
+                tokens = result["usage"].get("total_tokens", 0) if result else 0
+                fixed = self._clean_outline(result["content"]) if result else None
+                ok = fixed is not None and not self._validate_outline(fixed)[2]
+                self._record_repair(keyword, path, ok, tokens, violation)
+                spent += tokens
+
+            else:
+                continue
+
+            if ok:
+                return fixed, spent
+        return None, spent
+
+    # ==========================================
+    # ANALYSIS STAGE (queue-connected to generation)
+    # ==========================================
+    def _queue_analysis(self, keyword: str, keyword_index: int, outline: str, output_path: Path):
+        """Hand a saved outline to the analysis workers."""
+        if self.analysis_queue is None:
+            return
+        self.jobs.requeue(ANALYSIS_STAGE, keyword)
+        self.analysis_queue.put_nowait({"keyword": keyword, "keyword_index": keyword_index,
+                                        "outline": outline, "output_path": output_path})
+
+    async def _resume_analysis(self, keyword: str, keyword_index: int, output_path: Path):
+        """Queue an existing outline whose analysis was queued but never finished."""
+        if self.analysis_queue is None or not output_path.exists():
+            return
+        if self.jobs.status(ANALYSIS_STAGE, keyword) not in ("pending", "running", "failed"):
+            return
+        print(f"  [ANALYSIS] {keyword}: resuming unfinished analysis")
+        self._queue_analysis(keyword, keyword_index, await read_text(output_path), output_path)
+
+    async def analyze_outline(self, session: aiohttp.ClientSession, keyword: str,
+                              keyword_index: int, outline: str, output_path: Path) -> bool:
+        """Analysis pass for one saved outline: analysis YAML + refined outline."""
+        try:
+            if self.verbose:
+                print(f"  [ANALYSIS] Running outline analysis: {keyword}")
+
+            self.jobs.start(ANALYSIS_STAGE, keyword)
+            analysis_result = await self._analyze_outline(session, keyword, keyword_index, outline)
+
+            if not analysis_result:
+                self.stats["analysis_failed"] += 1
+                self.jobs.fail(ANALYSIS_STAGE, keyword, "API call failed")
+                log_json(self.logger, "analysis_failed", {
+                    "keyword": keyword, "index": keyword_index
+                })
+                return False
+
+            keyword_dir = output_path.parent
+            tokens = analysis_result["usage"].get("total_tokens", 0)
+
+            # Save analysis YAML
+            analysis_path = keyword_dir / f"{keyword}-outline-analysis.yaml"
+            try:
+                await write_text(analysis_path, analysis_result["content"])
+                print(f"  [SAVED] {analysis_path}")
+                await run_io(self.deps.record, analysis_path, [output_path])
+            except Exception as e:
+                print(f"  [WARN] Failed to save analysis: {e}")
+
+            # Apply modifications to create refined outline
+            refined = await run_cpu(OutlineGenerator._apply_analysis,
+                                    outline, analysis_result["content"])
+            if refined:
+                refined_path = keyword_dir / f"{keyword}-outline-refined.md"
+                try:
+                    await write_text(refined_path, refined)
+                    print(f"  [SAVED] {refined_path}")
+                except Exception as e:
+                    print(f"  [WARN] Failed to save refined outline: {e}")
+
+            self.stats["analysis_success"] += 1
+            self.jobs.finish(ANALYSIS_STAGE, keyword, tokens=tokens)
+            log_json(self.logger, "analysis_success", {
+                "keyword": keyword, "index": keyword_index, "tokens": tokens
+            })
+            return True
+
+        except Exception as e:
+            print(f"  [ANALYSIS-ERROR] {keyword}: {str(e)[:100]}")
+            log_json(self.logger, "analysis_error", {"keyword": keyword, "error": str(e)[:200]})
+            self.stats["analysis_failed"] += 1
+            self.jobs.fail(ANALYSIS_STAGE, keyword, f"{type(e).__name__}: {e}")
+            return False
+
+    async def _analysis_worker(self, session: aiohttp.ClientSession):
+        """Take outlines off the queue until the ``None`` sentinel arrives."""
+        while True:
+            job = await self.analysis_queue.get()
+            try:
+                if job is None:
+                    return
+                await self.analyze_outline(session, **job)
+            finally:
+                self.analysis_queue.task_done()
+
+    # ==========================================
+    # GENERATION STAGE
+    # ==========================================
     async def generate_outline(self, session: aiohttp.ClientSession,
                                keyword: str, keyword_index: int) -> bool:
-        """Generate outline for a single keyword."""
+        """Generate outline for a single keyword (the saved outline is queued for analysis)."""
         async with self.semaphore:
             try:
                 if self.verbose:
                     print(f"\n[{keyword_index}] Processing: {keyword}")
 
                 force = getattr(self.args, 'force', False)
-
-                # Skip if completed (unless --force)
-                if keyword in self.checkpoint["completed"] and not force:
-                    print(f"  [SKIP] {keyword}: already in checkpoint completed list")
-                    self.stats["skipped"] += 1
-                    return True
+                stale_only = getattr(self.args, 'stale_only', False) and not force
 
                 # Define output path early
                 keyword_dir = self.output_dir / keyword
                 output_path = keyword_dir / f"{keyword}-outline-optimized.md"
 
+                # Skip if completed (unless --force; --stale-only decides by content hash)
+                if not force and not stale_only and self.jobs.is_done(STAGE, keyword):
+                    print(f"  [SKIP] {keyword}: already completed (job store)")
+                    self.stats["skipped"] += 1
+                    await self._resume_analysis(keyword, keyword_index, output_path)
+                    return True
+
                 if self.verbose:
                     print(f"  [OUTPUT] Target: {output_path}")
 
+                input_paths = [find_analysis(keyword_dir, keyword) or analysis_paths(keyword_dir, keyword)[0],
+                               keyword_dir / f"{keyword}-master-queries.csv"]
+                if stale_only:
+                    if await run_io(self.deps.skip_if_fresh, output_path, input_paths):
+                        print(f"  [SKIP] {keyword}: up to date ({output_path})")
+                        self.stats["skipped"] += 1
+                        await self._resume_analysis(keyword, keyword_index, output_path)
+                        return True
+                    print(f"  [STALE] {keyword}: {self.deps.check(output_path, input_paths)}")
+
                 # Skip if output exists (incremental mode, unless --force)
-                if self.args.incremental and output_path.exists() and not force:
+                elif self.args.incremental and output_path.exists() and not force:
                     print(f"  [SKIP] {keyword}: output file already exists ({output_path})")
                     self.stats["skipped"] += 1
+                    await self._resume_analysis(keyword, keyword_index, output_path)
                     return True
 
                 # Ensure keyword directory exists
                 keyword_dir.mkdir(parents=True, exist_ok=True)
 
                 # Load SERP analysis (input)
-                serp_data = self._load_serp_analysis(keyword)
+                serp_data = await run_io(self._load_serp_analysis, keyword)
                 if not serp_data:
                     print(f"  [SKIP] {keyword}: no SERP analysis file found")
                     log_json(self.logger, "skipped", {
                         "keyword": keyword, "reason": "no_serp_analysis"
                     })
+                    self.jobs.skip(STAGE, keyword, "no_serp_analysis")
                     self.stats["skipped"] += 1
                     return False
 
                 # Load master queries (input)
-                query_csv = self._load_master_queries(keyword)
+                query_csv = await run_io(self._load_master_queries, keyword)
                 if self.verbose:
                     has_queries = query_csv != "No query data available."
                     print(f"  [QUERIES] Available: {has_queries}")
@@ -642,12 +864,16 @@ class OutlineGenerator:
                 # Dry run - validate inputs only
                 if self.args.dry_run:
                     print(f"  [DRY-RUN] Would generate outline for: {keyword}")
+                    requests = self._estimate_keyword(keyword, keyword_index, serp_data, query_csv)
                     log_json(self.logger, "dry_run", {
                         "keyword": keyword,
                         "index": keyword_index,
                         "has_serp": True,
                         "has_queries": query_csv != "No query data available.",
-                        "language": self._detect_language(serp_data)
+                        "language": self._detect_language(serp_data),
+                        "prompt_tokens": sum(r["input_tokens"] for r in requests),
+                        "est_output_tokens": sum(r["output_tokens"] for r in requests),
+                        "est_cost": sum(r["cost"] or 0.0 for r in requests)
                     })
                     self.stats["success"] += 1
                     return True
@@ -656,18 +882,19 @@ class OutlineGenerator:
                 if self.verbose:
                     print(f"  [API] Calling OpenRouter ({self.args.model})...")
 
+                self.jobs.start(STAGE, keyword)
                 result = await self._call_api(session, keyword, keyword_index,
                                              serp_data, query_csv)
 
                 if not result:
                     print(f"  [FAILED] API call failed for: {keyword}")
-                    if keyword not in self.checkpoint["failed"]:
-                        self.checkpoint["failed"].append(keyword)
+                    self.jobs.fail(STAGE, keyword, "API call failed")
                     self.stats["failed"] += 1
                     return False
 
+                tokens = result["usage"].get("total_tokens", 0)
                 if self.verbose:
-                    print(f"  [API] Response received ({result['usage'].get('total_tokens', 0)} tokens)")
+                    print(f"  [API] Response received ({tokens} tokens)")
 
                 # Clean and validate output
                 outline = self._clean_outline(result["content"])
@@ -681,78 +908,48 @@ class OutlineGenerator:
                     })
                     self.stats["validation_warnings"] += len(issues)
 
-                # Structural failure = hard reject, do not save
+                # Structural failure: repair (trim -> repair prompt -> regenerate) before rejecting
                 if is_structural_failure:
-                    print(f"  [REJECTED] {keyword}: headline count outside 25-30 range")
+                    self.stats["structural_failures"] += 1
                     log_json(self.logger, "structural_failure", {
                         "keyword": keyword, "issues": issues
                     })
-                    self.stats["structural_failures"] += 1
-                    if keyword not in self.checkpoint["failed"]:
-                        self.checkpoint["failed"].append(keyword)
-                    self.stats["failed"] += 1
-                    return False
+                    repaired, repair_tokens = await self._repair_outline(
+                        session, keyword, keyword_index, outline, issues, serp_data, query_csv)
+                    tokens += repair_tokens
+                    if repaired is None:
+                        print(f"  [REJECTED] {keyword}: headline count outside "
+                              f"{HEADING_MIN}-{HEADING_MAX} range")
+                        self.jobs.fail(STAGE, keyword, f"structural failure: {', '.join(issues)}",
+                                       tokens=tokens)
+                        self.stats["failed"] += 1
+                        return False
+                    outline = repaired
+                    is_valid, issues, _ = self._validate_outline(outline)
 
                 # Save output
                 try:
-                    with open(output_path, 'w', encoding='utf-8') as f:
-                        f.write(outline)
+                    await write_text(output_path, outline)
                     print(f"  [SAVED] {output_path}")
+                    await run_io(self.deps.record, output_path, input_paths)
                 except Exception as e:
                     print(f"  [ERROR] Failed to save output: {e}")
                     raise
 
-                # Run outline analysis (post-generation evaluation)
-                if not getattr(self.args, 'skip_analysis', False):
-                    if self.verbose:
-                        print(f"  [ANALYSIS] Running outline analysis...")
-
-                    analysis_result = await self._analyze_outline(
-                        session, keyword, keyword_index, outline
-                    )
-
-                    if analysis_result:
-                        # Save analysis YAML
-                        analysis_path = keyword_dir / f"{keyword}-outline-analysis.yaml"
-                        try:
-                            with open(analysis_path, 'w', encoding='utf-8') as f:
-                                f.write(analysis_result["content"])
-                            print(f"  [SAVED] {analysis_path}")
-                        except Exception as e:
-                            print(f"  [WARN] Failed to save analysis: {e}")
-
-                        # Apply modifications to create refined outline
-                        refined = self._apply_analysis(outline, analysis_result["content"])
-                        if refined:
-                            refined_path = keyword_dir / f"{keyword}-outline-refined.md"
-                            try:
-                                with open(refined_path, 'w', encoding='utf-8') as f:
-                                    f.write(refined)
-                                print(f"  [SAVED] {refined_path}")
-                            except Exception as e:
-                                print(f"  [WARN] Failed to save refined outline: {e}")
-
-                        self.stats["analysis_success"] += 1
-                        log_json(self.logger, "analysis_success", {
-                            "keyword": keyword, "index": keyword_index,
-                            "tokens": analysis_result["usage"].get("total_tokens", 0)
-                        })
-                    else:
-                        self.stats["analysis_failed"] += 1
-                        log_json(self.logger, "analysis_failed", {
-                            "keyword": keyword, "index": keyword_index
-                        })
+                # Post-generation evaluation runs in the analysis stage; this slot is free now
+                self._queue_analysis(keyword, keyword_index, outline, output_path)
 
-                self.checkpoint["completed"].append(keyword)
+                self.jobs.finish(STAGE, keyword, tokens=tokens)
                 self.stats["success"] += 1
 
+                tree = parse_outline(outline)
                 log_json(self.logger, "success", {
                     "keyword": keyword,
                     "index": keyword_index,
-                    "h1": len(re.findall(r'<h1', outline, re.IGNORECASE)),
-                    "h2": len(re.findall(r'<h2', outline, re.IGNORECASE)),
-                    "h3": len(re.findall(r'<h3', outline, re.IGNORECASE)),
-                    "tokens": result["usage"].get("total_tokens", 0),
+                    "h1": tree.counts[1],
+                    "h2": tree.counts[2],
+                    "h3": tree.counts[3],
+                    "tokens": tokens,
                     "valid": is_valid
                 })
 
@@ -763,8 +960,8 @@ class OutlineGenerator:
                 log_json(self.logger, "error", {
                     "keyword": keyword, "error": str(e)[:200]
                 })
-                if keyword not in self.checkpoint["failed"]:
-                    self.checkpoint["failed"].append(keyword)
+                if self.jobs.status(STAGE, keyword) != "failed":
+                    self.jobs.fail(STAGE, keyword, f"{type(e).__name__}: {e}")
                     self.stats["failed"] += 1
                 return False
 
@@ -774,8 +971,7 @@ class OutlineGenerator:
         missing_serp = []
 
         for kw in keywords:
-            serp_file = self.output_dir / kw / f"{kw}-serp-analysis.yaml"
-            if serp_file.exists():
+            if find_analysis(self.output_dir / kw, kw):
                 valid.append(kw)
             else:
                 missing_serp.append(kw)
@@ -804,6 +1000,8 @@ class OutlineGenerator:
             return
 
         self.stats["total"] = len(keywords)
+        if not self.args.dry_run and not self.args.estimate_cost:
+            self.jobs.add_pending(STAGE, keywords)
 
         # Resume from checkpoint
         if self.args.resume_from:
@@ -816,18 +1014,9 @@ class OutlineGenerator:
 
         # Cost estimation mode
         if self.args.estimate_cost:
-            est = self.estimate_cost(len(keywords))
-            print("\n" + "=" * 55)
-            print("  Phase 3.1: Outline Generation - Cost Estimate")
-            print("=" * 55)
-            print(f"  Keywords to process:    {est['keywords']:,}")
-            print(f"  API passes per keyword: {est['passes']} ({'generation only' if est['passes'] == 1 else 'generation + analysis'})")
-            print(f"  Est. input tokens:      {est['est_input_tokens']:,}")
-            print(f"  Est. output tokens:     {est['est_output_tokens']:,}")
-            print(f"  Est. input cost:        ${est['est_input_cost']:.4f}")
-            print(f"  Est. output cost:       ${est['est_output_cost']:.4f}")
-            print(f"  Est. TOTAL cost:        ${est['est_total_cost']:.4f}")
-            print("=" * 55)
+            self.estimate_cost(keywords)
+            log_json(self.logger, "cost_estimate", self.estimator.print_report("Phase 3.1: Outline Generation"))
+            print(f"  Keywords in file: {len(keywords):,} (already done / no SERP analysis are not counted)")
             return
 
         # Pre-validate inputs
@@ -842,7 +1031,7 @@ class OutlineGenerator:
         if validation['valid_count'] == 0:
             print("\nError: No keywords have SERP analysis data available.")
             print(f"  Looking in: {self.output_dir.absolute()}")
-            print(f"  Expected structure: {self.output_dir}/{{keyword}}/{{keyword}}-serp-analysis.yaml")
+            print(f"  Expected structure: {self.output_dir}/{{keyword}}/{{keyword}}-serp-analysis.json (or .yaml)")
             return
 
         log_json(self.logger, "started", {
@@ -850,6 +1039,8 @@ class OutlineGenerator:
             "valid_inputs": validation['valid_count'],
             "concurrency": self.args.max_concurrency,
             "model": self.args.model,
+            "analysis_concurrency": self.args.analysis_concurrency,
+            "analysis_model": self.args.analysis_model,
             "dry_run": self.args.dry_run,
             "incremental": self.args.incremental
         })
@@ -862,11 +1053,21 @@ class OutlineGenerator:
         print(f"  Model: {self.args.model}")
         print(f"  Mode: {'DRY RUN' if self.args.dry_run else 'LIVE'}")
         print(f"  Force: {'YES' if getattr(self.args, 'force', False) else 'NO'}")
-        print(f"  Analysis: {'SKIP' if getattr(self.args, 'skip_analysis', False) else 'ENABLED'}")
+        print(f"  Analysis: {'SKIP' if getattr(self.args, 'skip_analysis', False) else 'ENABLED'}"
+              + ("" if getattr(self.args, 'skip_analysis', False)
+                 else f" ({self.args.analysis_model}, concurrency {self.args.analysis_concurrency})"))
         print(f"  Output: {self.output_dir.absolute()}")
         print(f"{'='*55}\n")
 
-        async with aiohttp.ClientSession() as session:
+        lag = LoopLagMonitor(lambda event, data: log_json(self.logger, event, data))
+        async with lag, aiohttp.ClientSession() as session:
+            # Analysis workers consume outlines as generation saves them
+            workers = []
+            if not self.args.dry_run and not getattr(self.args, 'skip_analysis', False):
+                self.analysis_queue = asyncio.Queue()
+                workers = [asyncio.ensure_future(self._analysis_worker(session))
+                           for _ in range(self.args.analysis_concurrency)]
+
             # Process in chunks for checkpointing
             for chunk_start in range(0, len(keywords), self.args.chunk_size):
                 chunk_end = min(chunk_start + self.args.chunk_size, len(keywords))
@@ -883,18 +1084,28 @@ class OutlineGenerator:
                 # Process concurrently
                 await asyncio.gather(*tasks, return_exceptions=True)
 
-                # Save checkpoint after each chunk
-                self.checkpoint["last_index"] = chunk_end
-                self._save_checkpoint()
-
                 log_json(self.logger, "chunk_done", {
                     "end": chunk_end,
                     "success": self.stats["success"],
-                    "failed": self.stats["failed"]
+                    "failed": self.stats["failed"],
+                    "analysis_queued": self.analysis_queue.qsize() if workers else 0
                 })
 
+            # Generation is done: let the analysis stage drain its queue
+            if workers:
+                if self.analysis_queue.qsize():
+                    print(f"Waiting for {self.analysis_queue.qsize()} queued outline analyses...")
+                for _ in workers:
+                    self.analysis_queue.put_nowait(None)
+                await asyncio.gather(*workers, return_exceptions=True)
+
         # Final summary
+        log_json(self.logger, "loop_lag_summary", lag.summary())
         log_json(self.logger, "completed", self.stats)
+        routing = self.router.summary()
+        log_json(self.logger, "routing_summary", routing)
+        analysis_routing = self.analysis_router.summary()
+        log_json(self.logger, "routing_summary", {"stage": ANALYSIS_STAGE, **analysis_routing})
 
         print(f"\n{'='*55}")
         print("  Outline Generation Complete")
@@ -903,18 +1114,36 @@ class OutlineGenerator:
         print(f"  Success:    {self.stats['success']}")
         print(f"  Failed:     {self.stats['failed']}")
         print(f"  Structural: {self.stats['structural_failures']}")
+        for path, r in self.stats["repair"].items():
+            if r["attempts"]:
+                print(f"  ├── repair {path}: {r['success']}/{r['attempts']} fixed, {r['tokens']:,} tokens")
         print(f"  Skipped:    {self.stats['skipped']}")
         print(f"  Tokens:     {self.stats['tokens_used']:,}")
         print(f"  Warnings:   {self.stats['validation_warnings']}")
         if not getattr(self.args, 'skip_analysis', False):
             print(f"  Analysis OK:{self.stats['analysis_success']}")
             print(f"  Analysis NG:{self.stats['analysis_failed']}")
+        print(f"  Loop lag:   {lag.report()}")
+        for name, r in (("Generation", routing), ("Analysis", analysis_routing)):
+            if r["hedged"] or r["fallbacks"]:
+                print(f"  {name}: hedged {r['hedged']} of {r['requests']} requests "
+                      f"({r['hedge_wins']} won, ~{r['hedge_overhead_prompt_tokens']:,} overhead prompt tokens), "
+                      f"{r['fallbacks']} fallbacks")
         print(f"{'='*55}")
-
-        if self.checkpoint["failed"]:
-            print(f"\nFailed keywords: {', '.join(self.checkpoint['failed'][:5])}")
-            if len(self.checkpoint["failed"]) > 5:
-                print(f"  ... +{len(self.checkpoint['failed']) - 5} more")
+        if self.args.dry_run:
+            log_json(self.logger, "cost_estimate", self.estimator.print_report("Phase 3.1: Outline Generation"))
+
+        failed = self.jobs.keywords(STAGE, "failed")
+        if failed:
+            print(f"\nFailed keywords: {', '.join(failed[:5])}")
+            if len(failed) > 5:
+                print(f"  ... +{len(failed) - 5} more")
+            print("  List them with: python scripts/job_store.py list --stage outline_generation --status failed")
+        failed_analysis = self.jobs.keywords(ANALYSIS_STAGE, "failed")
+        if failed_analysis and not getattr(self.args, 'skip_analysis', False):
+            print(f"\nFailed analyses: {', '.join(failed_analysis[:5])}"
+                  + (f" ... +{len(failed_analysis) - 5} more" if len(failed_analysis) > 5 else ""))
+            print("  They are retried on the next run (outline kept)")
 
 
 def parse_args():
@@ -927,7 +1156,10 @@ Examples:
   uv run scripts/outline_generation.py --dry-run
   uv run scripts/outline_generation.py --estimate-cost
   uv run scripts/outline_generation.py --incremental
+  uv run scripts/outline_generation.py --stale-only
   uv run scripts/outline_generation.py --max-concurrency=5
+  uv run scripts/outline_generation.py --repair-paths deterministic llm
+  uv run scripts/outline_generation.py --analysis-concurrency=20 --analysis-model=google/gemini-2.5-flash
   uv run scripts/outline_generation.py --resume-from=100
   uv run scripts/outline_generation.py --verbose
         """
@@ -949,14 +1181,25 @@ Examples:
                         help=f"Max output tokens (default: {DEFAULT_MAX_TOKENS})")
     parser.add_argument("--incremental", action="store_true",
                         help="Skip existing outputs (incremental mode)")
+    parser.add_argument("--stale-only", action="store_true",
+                        help="Only regenerate outlines whose inputs/prompts/config/code changed (see dep_tracker.py status)")
     parser.add_argument("--dry-run", action="store_true",
                         help="Validate inputs without API calls")
     parser.add_argument("--estimate-cost", action="store_true",
-                        help="Estimate cost before running")
+                        help="Estimate cost and wall time from the rendered prompts, then exit")
     parser.add_argument("--resume-from", type=str,
                         help="Continue from last checkpoint index")
     parser.add_argument("--skip-analysis", action="store_true",
                         help="Skip outline analysis phase (generate only)")
+    parser.add_argument("--repair-paths", nargs="*", choices=REPAIR_PATHS, default=DEFAULT_REPAIR_PATHS,
+                        help="Repairs tried, in order, for outlines outside "
+                             f"{HEADING_MIN}-{HEADING_MAX} headings; none = reject "
+                             f"(default: {' '.join(DEFAULT_REPAIR_PATHS)})")
+    parser.add_argument("--analysis-model", default=ANA_MODEL,
+                        help=f"OpenRouter model for the analysis pass (default: {ANA_MODEL})")
+    parser.add_argument("--analysis-concurrency", type=int, default=ANA_MAX_CONCURRENCY,
+                        help=f"Parallel analysis calls, independent of --max-concurrency "
+                             f"(default: {ANA_MAX_CONCURRENCY})")
     parser.add_argument("--force", action="store_true",
                         help="Overwrite existing outputs and ignore checkpoint completed list")
     parser.add_argument("--verbose", "-v", action="store_true",
@@ -978,4 +1221,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown()
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Repair paths for structurally invalid outlines (outline_generation.py).
+
+An outline whose total heading count falls outside HEADING_MIN-HEADING_MAX
+used to be discarded after it was paid for.  The generator now tries, in
+order of cost:
+
+    deterministic   ``trim_outline`` drops headings until the count fits:
+                    exact duplicates first (the validator's duplicate
+                    check), then the lowest-salience H4s, then H3s with no
+                    H4 left below them.  H1/H2, headings carrying a
+                    marker (Contextual Bridge / Antonym Context, see
+                    outline_tree.py) and headings sharing a line are
+                    never dropped.  Only fixes outlines that are too long.
+    llm             a small prompt holding just the outline and the
+                    violated constraint (``repair_prompt``)
+    regenerate      the full generation prompt again (last resort)
+
+Salience is the share of a heading's content words (thai_segmenter.word_tokens
+minus FUNCTION_WORDS such as และ / ของ / for) that also occur in the keyword
+or the H1: headings that drift furthest from the macro context go first.  A
+heading word also counts when a Thai context word of four or more characters
+overlaps it in the heading text, since segmentation can split a compound
+differently ("กรอบหน้าต่าง" -> กรอบหน้า + ต่าง still matches หน้าต่าง).
+
+Usage:
+    from outline_repair import count_headings, trim_outline, repair_prompt
+
+    fixed, actions = trim_outline(outline, keyword)   # (None, []) if it cannot fit
+    system, user = repair_prompt(outline, keyword, "total headings 34 (required 25-30)")
+"""
+
+import re
+from typing import List, Optional, Set, Tuple
+
+from config_loader import load_prompt
+from outline_tree import parse_outline
+from thai_segmenter import is_boundary, word_tokens
+
+HEADING_MIN = 25
+HEADING_MAX = 30
+
+REPAIR_SYSTEM_PROMPT = load_prompt("outline_repair_system.md")
+REPAIR_USER_PROMPT_TEMPLATE = load_prompt("outline_repair_user.md")
+
+# Connectives, particles and question words: never evidence that a heading is on topic
+FUNCTION_WORDS = frozenset((
+    "และ", "หรือ", "ของ", "ที่", "ใน", "กับ", "การ", "ความ", "เป็น", "มี", "ได้", "ให้",
+    "จาก", "ไป", "มา", "แล้ว", "ก็", "จะ", "ว่า", "โดย", "เพื่อ", "สำหรับ", "แบบ", "อย่าง",
+    "อย่างไร", "ยังไง", "อะไร", "ไหน", "ทำไม", "ไหม", "บ้าง", "ทุก", "แต่", "แต่ละ", "ถ้า",
+    "เมื่อ", "ซึ่ง", "นี้", "นั้น", "คือ", "ต้อง", "ควร", "ด้วย", "ถึง", "ตาม", "ต่อ", "กว่า",
+    "ที่สุด", "อยู่", "หรือไม่", "เช่น",
+    "and", "or", "of", "the", "for", "to", "in", "on", "with", "an", "is", "are", "how",
+    "what", "why", "which", "vs", "your",
+))
+# Thai context words this long can match inside a differently segmented compound
+_MIN_OVERLAP_CHARS = 4
+_THAI_RE = re.compile(r'[\u0E01-\u0E5B]')
+
+
+def count_headings(outline: str) -> int:
+    return parse_outline(outline).total
+
+
+def _content_words(text: str) -> List[str]:
+    return [t for t in word_tokens(text) if t not in FUNCTION_WORDS]
+
+
+def _context_words(keyword: str, h1: str) -> Set[str]:
+    """Content words of the macro context (keyword + H1)."""
+    return set(_content_words(keyword)) | set(_content_words(h1))
+
+
+def _salience(text: str, context: Set[str]) -> float:
+    lowered = text.lower()
+    spans, pos = [], 0
+    for token in word_tokens(text):
+        start = lowered.find(token, pos)
+        pos = start + len(token)
+        if token not in FUNCTION_WORDS:
+            spans.append((token, start, pos))
+    if not spans:
+        return 0.0
+    covered = [
+        (m.start(), m.end())
+        for word in context if len(word) >= _MIN_OVERLAP_CHARS and _THAI_RE.match(word)
+        for m in re.finditer(re.escape(word), lowered)
+        if is_boundary(lowered, m.start()) and is_boundary(lowered, m.end())
+    ]
+    hits = sum(1 for token, start, end in spans
+               if token in context or any(a < end and start < b for a, b in covered))
+    return hits / len(spans)
+
+
+def trim_outline(outline: str, keyword: str,
+                 max_headings: int = HEADING_MAX) -> Tuple[Optional[str], List[str]]:
+    """Drop headings until at most ``max_headings`` remain.
+
+    Returns ``(outline, actions)``; ``(None, actions)`` when the protected
+    headings alone exceed the limit, ``(None, [])`` when there is nothing
+    to trim (outline not too long).
+    """
+    tree = parse_outline(outline)
+    excess = tree.total - max_headings
+    if excess <= 0:
+        return None, []
+
+    # Headings run together on one line can only go together: keep them
+    lines = [h.line for h in tree.headings]
+    shared = {line for line in lines if lines.count(line) > 1}
+
+    def protected(h) -> bool:
+        return h.level <= 2 or h.marker is not None or h.line in shared
+
+    dropped, actions = set(), []    # indexes into tree.headings
+
+    # 1. Exact duplicates (same text as an earlier heading)
+    for n in tree.duplicates:
+        h = tree.headings[n]
+        if not protected(h) and len(dropped) < excess:
+            dropped.add(n)
+            actions.append(f"drop duplicate H{h.level}: {h.text}")
+
+    # 2. Lowest-salience leaves: H4s before H3s (an H3 with H4s left is not a leaf)
+    context = _context_words(keyword, tree.h1)
+    for target in (4, 3):
+        candidates = [
+            # later headings lose ties: the outline's order reflects priority
+            (_salience(h.text, context), -n, n)
+            for n, h in enumerate(tree.headings)
+            if h.level == target and not protected(h) and n not in dropped
+            and not tree.has_children(n, dropped)
+        ]
+        for score, _, n in sorted(candidates):
+            if len(dropped) >= excess:
+                break
+            dropped.add(n)
+            actions.append(f"drop H{target} (salience {score:.2f}): {tree.headings[n].text}")
+
+    if len(dropped) < excess:
+        return None, actions
+    drop_lines = {tree.headings[n].line for n in dropped}
+    return '\n'.join(line for i, line in enumerate(outline.split('\n'))
+                     if i not in drop_lines).strip(), actions
+
+
+def repair_prompt(outline: str, keyword: str, violation: str) -> Tuple[str, str]:
+    """``(system, user)`` messages asking the model to fix only ``violation``."""
+    total = count_headings(outline)
+    return REPAIR_SYSTEM_PROMPT, REPAIR_USER_PROMPT_TEMPLATE.format(
+        keyword=keyword,
+        violation=violation,
+        total=total,
+        heading_min=HEADING_MIN,
+        heading_max=HEADING_MAX,
+        raw_outline=outline
+    )
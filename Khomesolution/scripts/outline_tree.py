@@ -0,0 +1,180 @@
+"""
+Single-pass outline parser shared by the outline consumers.
+
+Outlines (``{keyword}-outline-optimized.md``) are HTML heading lines plus
+marker comments.  ``parse_outline`` tokenizes one in a single pass into an
+``OutlineTree``:
+
+    lines       every input line as ``Line(kind, level, text, raw, marker)``;
+                kind is heading / comment / blank / text, ``raw`` the
+                stripped line
+    headings    ``Heading(line, level, text, marker, parent)`` for every
+                ``<hN>...</hN>`` (several on one line each count): ``line``
+                indexes ``lines``, ``parent`` indexes ``headings`` (the
+                nearest heading above with a lower level, None for roots).
+                ``marker``: a marker comment on its own line belongs to the
+                next heading, an inline one to its own heading
+    counts      opening ``<hN`` tags per level (1-4), anywhere in the text
+                (what the outline validator has always counted)
+    markers     marker names (Contextual Bridge / Antonym Context) that
+                appear anywhere in the text, in a comment or not
+    duplicates  indexes of headings whose text (case-insensitive) repeats
+                an earlier heading
+    non_html    non-empty lines that are not tags or comments
+
+so validation is attribute checks instead of regex scans.  Trees are cached
+by content hash (TREE_CACHE_SIZE entries, least recently used evicted) and
+shared between callers: treat them as read-only.
+
+Consumers: outline_generation.py (validation, analysis merge),
+outline_repair.py, outline_answer.py (sections) and
+create_deepresearch_prompt.py (compact outline text).
+
+Usage:
+    from outline_tree import parse_outline
+
+    tree = parse_outline(outline)
+    tree.total, tree.counts[2], "Contextual Bridge" in tree.markers
+    for h in tree.headings: h.level, h.text, h.marker
+    tree.sections()   # [(section text, h2 text), ...]
+"""
+
+import re
+import hashlib
+from collections import OrderedDict, namedtuple
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+TREE_CACHE_SIZE = 256
+MARKERS = ("Contextual Bridge", "Antonym Context")
+
+Line = namedtuple("Line", "kind level text raw marker")
+Heading = namedtuple("Heading", "line level text marker parent")
+
+_LINE_RE = re.compile(r'<(h[1-4])[^>]*>(.*?)</\1>|<!--(.*?)-->', re.IGNORECASE | re.DOTALL)
+_HEADING_RE = re.compile(r'<(h[1-4])[^>]*>(.*?)</\1>', re.IGNORECASE | re.DOTALL)
+_OPEN_TAG_RE = re.compile(r'<h([1-4])[^>]*>', re.IGNORECASE)
+_COMMENT_RE = re.compile(r'<!--(.*?)-->', re.DOTALL)
+
+_tree_cache: "OrderedDict[bytes, OutlineTree]" = OrderedDict()
+
+
+def _marker(comment: str) -> Optional[str]:
+    lowered = comment.lower()
+    return next((m for m in MARKERS if m.lower() in lowered), None)
+
+
+class OutlineTree:
+    def __init__(self, lines: Tuple[Line, ...], headings: Tuple[Heading, ...],
+                 counts: Dict[int, int], markers: FrozenSet[str],
+                 duplicates: Tuple[int, ...], non_html: int):
+        self.lines = lines
+        self.headings = headings
+        self.counts = counts
+        self.markers = markers
+        self.duplicates = duplicates
+        self.non_html = non_html
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def h1(self) -> str:
+        return next((h.text for h in self.headings if h.level == 1), "")
+
+    def has_children(self, index: int, skip=()) -> bool:
+        """Whether heading ``index`` has a descendant not in ``skip``."""
+        level = self.headings[index].level
+        for j in range(index + 1, len(self.headings)):
+            if self.headings[j].level <= level:
+                return False
+            if j not in skip:
+                return True
+        return False
+
+    def sections(self) -> List[Tuple[str, str]]:
+        """One ``(section text, h2 text)`` per H2: the H2 line and the
+        heading/text lines below it (no H1, comments or blank lines)."""
+        sections = []
+        for line in self.lines:
+            if line.kind == "heading" and line.level == 2:
+                sections.append(([line.raw], line.text))
+            elif sections and (line.kind == "text" or (line.kind == "heading" and line.level > 2)):
+                sections[-1][0].append(line.raw)
+        return [("\n".join(raw), title) for raw, title in sections]
+
+    def render(self) -> str:
+        """Headings and comments only, one per line (blank and stray lines dropped)."""
+        return "\n".join(line.raw for line in self.lines if line.kind in ("heading", "comment"))
+
+
+def _parse(content: str) -> OutlineTree:
+    lines, headings, duplicates = [], [], []
+    counts = {1: 0, 2: 0, 3: 0, 4: 0}
+    seen = set()
+    stack: List[int] = []           # open heading indexes, by increasing level
+    pending = None                  # marker comment waiting for its heading
+    non_html = 0
+
+    for raw_line in content.split('\n'):
+        raw = raw_line.strip()
+        for tag in _OPEN_TAG_RE.finditer(raw):
+            counts[int(tag.group(1))] += 1
+        match = _LINE_RE.match(raw) if raw.startswith('<') else None
+        comment = match and not match.group(1)
+        if comment:
+            comment_marker = _marker(match.group(3))
+            if comment_marker:
+                pending = comment_marker
+
+        # Headings anywhere on the line (models sometimes run several together)
+        line_headings = list(_HEADING_RE.finditer(raw))
+        for n, found in enumerate(line_headings):
+            level, text = int(found.group(1)[1]), found.group(2).strip()
+            end = line_headings[n + 1].start() if n + 1 < len(line_headings) else len(raw)
+            inline = _COMMENT_RE.search(raw, found.end(), end)
+            marker = (_marker(inline.group(1)) if inline else None) or pending
+            pending = None
+
+            while stack and headings[stack[-1]].level >= level:
+                stack.pop()
+            index = len(headings)
+            headings.append(Heading(len(lines), level, text, marker, stack[-1] if stack else None))
+            stack.append(index)
+            key = text.lower()
+            if key in seen:
+                duplicates.append(index)
+            seen.add(key)
+
+        if match and match.group(1):
+            first = headings[-len(line_headings)]
+            lines.append(Line("heading", first.level, first.text, raw, first.marker))
+
+        elif comment:
+            lines.append(Line("comment", 0, match.group(3).strip(), raw, comment_marker))
+
+        elif not raw:
+            lines.append(Line("blank", 0, "", raw, None))
+
+        else:
+            if not raw.startswith('<'):
+                non_html += 1
+            lines.append(Line("text", 0, raw, raw, None))
+
+    markers = frozenset(m for m in MARKERS if m in content)
+    return OutlineTree(tuple(lines), tuple(headings), counts, markers,
+                       tuple(duplicates), non_html)
+
+
+def parse_outline(content: str) -> OutlineTree:
+    """Cached ``OutlineTree`` for ``content``."""
+    key = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+    tree = _tree_cache.get(key)
+    if tree is not None:
+        _tree_cache.move_to_end(key)
+        return tree
+    tree = _parse(content)
+    _tree_cache[key] = tree
+    if len(_tree_cache) > TREE_CACHE_SIZE:
+        _tree_cache.popitem(last=False)
+    return tree
@@ -0,0 +1,302 @@
+"""
+Compiled phrase-rewrite engine for optimize_research_data.py.
+
+The compression stages are ordered lists of ``(pattern, replacement)``
+rules that used to be applied with one ``re.sub`` pass per rule.  With
+``re.IGNORECASE`` and a leading ``\\b`` the regex engine cannot skip ahead
+to a literal prefix, so every rule cost a full character-by-character scan
+of the document even though a typical document triggers only a handful.
+
+``RewriteEngine`` compiles a rule list once and, per document:
+
+* lowercases the text once and finds which rules' leading literals (the
+  text every match must start with: ``It is important to note that``,
+  ``เพื่อที่จะ``, ``very`` ...) occur, in ONE scan with a combined
+  pattern: all literals merged into a trie-shaped alternation, so each
+  position is checked in time proportional to the literal length rather
+  than the number of rules;
+* skips rules whose literal does not occur, without touching the text;
+* for the rest, runs the compiled regex only at the literal's positions
+  (``pattern.match(text, pos)``) and splices the replacements in, exactly
+  as ``re.sub`` would.  Only the text around each splice is rescanned, so
+  literals a replacement creates are picked up for the rules after it.
+
+Rules are still applied one after another in list order, against the text
+the previous rule produced.  That is what keeps the output byte-identical
+to the old loop: rules overlap (``Remember, that`` / ``Remember,``) and an
+earlier deletion can join text into a later rule's phrase, which a single
+combined alternation would resolve differently, so the combined pattern
+only decides which rules run.  Rules whose phrase is absent cost nothing
+per document, so rule lists can grow to thousands of entries cheaply.
+
+Rules without a usable literal, and documents containing characters that
+``re.IGNORECASE`` folds differently from ``str.lower()`` (dotless i, long
+s ...), take the plain ``re.sub`` path.
+"""
+
+import re
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+Rule = Tuple[str, str]
+
+_META = set('.^$*+?{}[]|()')
+_QUANTIFIERS = set('*?{')
+# Escapes that stand for a single literal character
+_ESCAPED_LITERALS = set('.^$*+?{}[]|()\\/\'"-–, :;!#&%@~`<>=')
+# No cased characters above this code point
+_MAX_CASED = 0x1F000
+
+
+def _has_top_level_branch(pattern: str) -> bool:
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '[':
+            # Skip the class; a ']' right after '[' or '[^' is literal
+            i += 2 if pattern[i + 1:i + 2] == '^' else 1
+            i += 1
+            while i < len(pattern) and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == '|' and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def leading_literal(pattern: str) -> str:
+    """Literal text every match of ``pattern`` must start with ('' if none).
+
+    Skips a leading ``\\b``, then collects plain and escaped literal
+    characters up to the first regex construct.  A character followed by
+    an optional quantifier (``?``, ``*``, ``{``) is dropped, since a match
+    need not contain it.
+    """
+    if _has_top_level_branch(pattern):
+        return ''
+    i = 2 if pattern.startswith(r'\b') else 0
+    chars: List[str] = []
+    n = len(pattern)
+    while i < n:
+        ch = pattern[i]
+        if ch == '\\':
+            if i + 1 < n and pattern[i + 1] in _ESCAPED_LITERALS:
+                lit, step = pattern[i + 1], 2
+            else:
+                break  # \s, \d, \w, \b, backrefs ...
+        elif ch in _META:
+            break
+        else:
+            lit, step = ch, 1
+        nxt = pattern[i + step] if i + step < n else ''
+        if nxt in _QUANTIFIERS:
+            break
+        chars.append(lit)
+        i += step
+        if nxt == '+':
+            break
+    return ''.join(chars)
+
+
+@lru_cache(maxsize=None)
+def _case_partners() -> Dict[str, Set[str]]:
+    """Characters linked by single-character ``lower``/``upper``/``casefold``
+    or by sharing a (possibly multi-character) ``casefold``."""
+    partners: Dict[str, Set[str]] = {}
+    by_fold: Dict[str, str] = {}
+
+    def link(a: str, b: str) -> None:
+        partners.setdefault(a, set()).add(b)
+        partners.setdefault(b, set()).add(a)
+
+    for cp in range(_MAX_CASED):
+        ch = chr(cp)
+        for other in (ch.lower(), ch.upper(), ch.casefold()):
+            if len(other) == 1 and other != ch:
+                link(ch, other)
+        fold = ch.casefold()
+        if fold != ch:
+            if fold in by_fold:
+                link(ch, by_fold[fold])
+            else:
+                by_fold[fold] = ch
+    return partners
+
+
+def _trie_pattern(words: Sequence[str]) -> str:
+    """Alternation of ``words`` factored into a trie (``ver(?:ify|y)``).
+
+    At any position it matches the longest word that occurs there: sibling
+    branches start with different characters, and an optional continuation
+    is tried before stopping at a shorter word.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[None] = True
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child)
+                    for ch, child in sorted((k, v) for k, v in node.items() if k is not None)]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if None in node else body
+
+    return build(trie)
+
+
+def _fold_unsafe_chars(literal_chars: Set[str]) -> Set[str]:
+    """Characters IGNORECASE matches against ``literal_chars`` that
+    ``str.lower()`` does not map onto them (dotless i, long s, Kelvin sign ...).
+
+    Candidates are every character reachable through case mappings; the
+    regex engine itself decides which of them IGNORECASE folds together.
+    """
+    partners = _case_partners()
+    unsafe = set()
+    for ch in literal_chars:
+        pattern = re.compile(re.escape(ch), re.IGNORECASE)
+        seen, todo = {ch}, [ch]
+        while todo:
+            for other in partners.get(todo.pop(), ()):
+                if other not in seen:
+                    seen.add(other)
+                    todo.append(other)
+        unsafe.update(c for c in seen
+                      if c.lower() != ch.lower() and pattern.fullmatch(c))
+    return unsafe
+
+
+class RewriteEngine:
+    """Ordered ``(pattern, replacement)`` rules applied with ``re.sub`` semantics."""
+
+    def __init__(self, rules: Sequence[Rule], flags: int = re.IGNORECASE):
+        self.rules: List[Rule] = list(rules)
+        self.flags = flags
+        self.compiled = [re.compile(p, flags) for p, _ in self.rules]
+        self.fold = bool(flags & re.IGNORECASE)
+        # Identifies the rule set, e.g. for stage caches keyed on "rules changed"
+        self.fingerprint = hashlib.sha256(
+            repr((int(flags), self.rules)).encode('utf-8')).hexdigest()
+
+        self.literals: List[str] = []
+        for pattern, _ in self.rules:
+            lit = leading_literal(pattern)
+            if self.fold:
+                folded = lit.lower()
+                lit = folded if len(folded) == len(lit) else ''
+            self.literals.append(lit)
+
+        # One scan finds every literal present; a hit also implies the
+        # literals that are prefixes of it
+        words = sorted(set(lit for lit in self.literals if lit))
+        self._scan = re.compile(_trie_pattern(words)) if words else None
+        self._implied = {w: {v for v in words if w.startswith(v)} for w in words}
+        self._window = max(map(len, words), default=0) - 1
+
+        self._unsafe = None
+        if self.fold:
+            unsafe = _fold_unsafe_chars(set(''.join(self.literals)))
+            if unsafe:
+                self._unsafe = re.compile('[' + ''.join(re.escape(c) for c in sorted(unsafe)) + ']')
+
+    def _key(self, text: str) -> Optional[str]:
+        """Text the literals are searched in (None -> plain re.sub)."""
+        if not self.fold:
+            return text
+        key = text.lower()
+        if len(key) != len(text):
+            return None
+        if self._unsafe is not None and self._unsafe.search(text):
+            return None
+        return key
+
+    def _present(self, key: str, start: int = 0, end: Optional[int] = None) -> Set[str]:
+        """Literals occurring in ``key`` (starting within ``key[start:end]``)."""
+        found: Set[str] = set()
+        if self._scan is None:
+            return found
+        end = len(key) if end is None else min(end, len(key))
+        m = self._scan.search(key, max(start, 0), end)
+        while m is not None:
+            # Occurrences overlap (``very`` / ``ery``): resume one past the start
+            found |= self._implied[m.group()]
+            m = self._scan.search(key, m.start() + 1, end)
+        return found
+
+    def _fold_piece(self, piece: str) -> Optional[str]:
+        folded = piece.lower()
+        if len(folded) != len(piece):
+            return None
+        if self._unsafe is not None and self._unsafe.search(piece):
+            return None
+        return folded
+
+    def _sub_at(self, pattern, replacement, text, key, literal):
+        """``pattern.sub(replacement, text)``, trying only where ``literal`` occurs.
+
+        Returns the new text, its search key, kept in step piece by piece
+        (key is None if a replacement brought in a character that cannot be
+        folded safely), and the ``(start, end)`` of each replacement in it.
+        """
+        pieces, key_pieces, splices = [], [], []
+        last = 0
+        offset = 0                  # length change so far: new position = old + offset
+        pos = key.find(literal)
+        while pos != -1:
+            m = pattern.match(text, pos)
+            if m is not None:
+                out = m.expand(replacement)
+                pieces.append(text[last:pos])
+                pieces.append(out)
+                splices.append((pos + offset, pos + offset + len(out)))
+                offset += len(out) - (m.end() - pos)
+                if key_pieces is not None:
+                    folded = out if not self.fold else self._fold_piece(out)
+                    if folded is None:
+                        key_pieces = None
+                    else:
+                        key_pieces.append(key[last:pos])
+                        key_pieces.append(folded)
+                last = m.end()
+                pos = key.find(literal, last)
+            else:
+                pos = key.find(literal, pos + 1)
+        if not pieces:
+            return text, key, splices
+        pieces.append(text[last:])
+        if key_pieces is None:
+            return ''.join(pieces), None, splices
+        key_pieces.append(key[last:])
+        return ''.join(pieces), ''.join(key_pieces), splices
+
+    def apply(self, text: str) -> str:
+        key = self._key(text)
+        present = self._present(key) if key is not None else set()
+        for (_, replacement), pattern, literal in zip(self.rules, self.compiled, self.literals):
+            if key is None or not literal:
+                new = pattern.sub(replacement, text)
+                if new != text:
+                    text = new
+                    key = self._key(text)
+                    present = self._present(key) if key is not None else set()
+            elif literal in present:
+                text, key, splices = self._sub_at(pattern, replacement, text, key, literal)
+                if key is None:
+                    continue
+                # A literal the replacement created must overlap it
+                for start, end in splices:
+                    present |= self._present(key, start - self._window, end + self._window)
+        return text
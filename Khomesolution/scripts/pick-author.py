@@ -13,6 +13,8 @@ from bs4 import BeautifulSoup
 # CONFIGURATION (loaded from config.yaml)
 # ==========================================
 from config_loader import get_openrouter_config, get_model_config, load_prompt
+from token_budget import fit_to_budget, format_usage, get_stage_budget
+from offload import LoopLagMonitor, read_text, run_cpu, shutdown
 
 _or_cfg = get_openrouter_config()
 _model_cfg = get_model_config("pick_author")
@@ -23,6 +25,7 @@ OPENROUTER_API_KEY = _or_cfg["api_key"]
 HTTP_REFERER = _or_cfg["http_referer"]
 PA_TEMPERATURE = _model_cfg.get("temperature", 0.2)
 PA_X_TITLE = _model_cfg.get("x_title", "Privato Author Picker")
+PA_ARTICLE_TOKENS = get_stage_budget(_model_cfg, "article", 1600)
 
 # WordPress Configuration
 WP_API_URL = os.getenv("WP_API_URL")  # e.g., "https://your-site.com/wp-json/wp/v2"
@@ -35,6 +38,12 @@ WP_APP_PASSWORD = os.getenv(
 AUTHOR_SELECT_PROMPT = load_prompt("pick_author_system.md")
 
 
+def extract_article_text(html_content: str) -> str:
+    """Text of the article without tags (runs in the process pool)."""
+    soup = BeautifulSoup(html_content, "html.parser")
+    return soup.get_text(separator=" ", strip=True)
+
+
 class WordPressPublisher:
     def __init__(self, args):
         self.input_html_dir = Path("output/research")
@@ -62,8 +71,10 @@ class WordPressPublisher:
             "X-Title": PA_X_TITLE,
         }
 
-        # ตัดเนื้อหาบางส่วนเพื่อประหยัด Token
-        summary = article_text[:2000]
+        # ตัดเนื้อหาตาม token budget เพื่อประหยัด Token
+        summary, usage = fit_to_budget(article_text, PA_ARTICLE_TOKENS, AI_MODEL_NAME,
+                                       stage="pick_author.article")
+        print(f"   🧮 {format_usage(usage)}")
 
         # แปลง List ผู้เขียนเป็น String ย่อๆ
         authors_str = json.dumps(
@@ -173,15 +184,11 @@ class WordPressPublisher:
             print(f"[{keyword}] Processing Phase 9...")
 
             # 2. อ่านข้อมูล
-            with open(html_path, "r", encoding="utf-8") as f:
-                html_content = f.read()
-
-            with open(meta_path, "r", encoding="utf-8") as f:
-                metadata = json.load(f)
+            html_content = await read_text(html_path)
+            metadata = json.loads(await read_text(meta_path))
 
             # ใช้ BeautifulSoup ดึง Text มาวิเคราะห์เพื่อเลือก Author
-            soup = BeautifulSoup(html_content, "html.parser")
-            text_for_analysis = soup.get_text(separator=" ", strip=True)
+            text_for_analysis = await run_cpu(extract_article_text, html_content)
 
             # 3. เลือก Author (AI Grok)
             # ถ้าไม่มี authors ให้ใช้ default (เช่น ID 1)
@@ -219,8 +226,10 @@ class WordPressPublisher:
 
         print(f"Starting Phase 9: Publishing {len(keywords)} articles to WordPress.")
 
-        tasks = [self.process_keyword(kw, authors) for kw in keywords]
-        await asyncio.gather(*tasks)
+        async with LoopLagMonitor() as lag:
+            tasks = [self.process_keyword(kw, authors) for kw in keywords]
+            await asyncio.gather(*tasks)
+        print(f"Event loop: {lag.report()}")
 
 
 # ==========================================
@@ -241,4 +250,7 @@ if __name__ == "__main__":
         print("Please export them before running.")
     else:
         publisher = WordPressPublisher(args)
-        asyncio.run(publisher.run(args.keywords))
+        try:
+            asyncio.run(publisher.run(args.keywords))
+        finally:
+            shutdown()
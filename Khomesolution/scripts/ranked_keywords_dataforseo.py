@@ -0,0 +1,299 @@
+"""
+Phase 1.2 (API): Competitor ranked keywords via DataForSEO Labs.
+
+Headless alternative to ahref_data_collection.py.  For the top competitor
+URLs of every keyword (from ``{keyword}-competitions.json``) it calls
+``dataforseo_labs/google/ranked_keywords/live`` and writes the same
+``Keyword, Volume, Organic traffic`` CSVs the browser flow produces:
+
+    data/exports/{keyword}/all_urls/{url}.csv   one file per competitor URL
+    data/exports/{keyword}/{keyword}.csv        merged, deduped by keyword
+
+so merge_keyword_ahref_dataforseo.py consumes them unchanged.  URLs that
+already have a CSV (an earlier run, or a UTF-16 browser export) are not
+fetched again, and ``{keyword}.csv`` is rebuilt from every file in
+``all_urls/`` with the browser flow's own merge, so API rows are added to
+existing exports rather than replacing them.
+
+Each unique URL is fetched once even when it ranks for several keywords.
+Requests run concurrently (bounded by --max-concurrency); a URL with more
+ranked keywords than one page holds is paged with ``offset``.
+
+Usage:
+    python scripts/ranked_keywords_dataforseo.py
+    python scripts/ranked_keywords_dataforseo.py --max-keywords 2000 --max-concurrency 10
+    python scripts/ranked_keywords_dataforseo.py --api-base http://127.0.0.1:8080   # local stand-in
+    python scripts/ranked_keywords_dataforseo.py --replay tests/fixtures/dataforseo \
+        --dir tests/fixtures/ahrefs/research --output-dir /tmp/exports           # recorded, offline
+"""
+
+import os
+import re
+import csv
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urlparse, unquote
+
+import aiohttp
+
+from keyword_clustering import normalize_url
+from ahref_data_collection import merge_keyword_csv
+from dataforseo_client import (
+    API_BASE, LOCATION_CODE, LANGUAGE_CODE, DataForSEOClient, load_credentials,
+)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+RESEARCH_DIR = "output/research"
+EXPORTS_DIR = "data/exports"
+
+ENDPOINT = "/v3/dataforseo_labs/google/ranked_keywords/live"
+
+TOP_N_URLS = 3
+PAGE_LIMIT = 1000             # API maximum per request
+MAX_KEYWORDS_PER_URL = 1000
+MAX_CONCURRENCY = 5
+REQUEST_TIMEOUT = 120
+
+# Same exclusions as the browser flow
+IGNORE_DOMAINS = [
+    "pinterest.com", "pantip.com", "facebook.com", "shopee.co.th", "lazada.co.th",
+    "youtube.com", "instagram.com", "tiktok.com", "twitter.com", "nocnoc.com"
+]
+
+CSV_COLUMNS = ["Keyword", "Volume", "Organic traffic"]
+
+
+# ---------------------------------------------------------------------------
+# Targets
+# ---------------------------------------------------------------------------
+def csv_name_for_url(url):
+    """Per-URL CSV name, same scheme as ahref_data_collection.filename_from_url."""
+    parsed = urlparse(unquote(url))
+    domain = parsed.netloc.lower()
+    path = parsed.path.strip('/')
+    name = f"{domain}-{path.replace('/', '-')}" if path else domain
+    name = re.sub(r'[^\w\s\-\u0E00-\u0E7F.]', '-', name).strip().replace(' ', '_')
+    return name[:100] + ".csv"
+
+
+def load_competitor_urls(research_dir=RESEARCH_DIR, top_n=TOP_N_URLS):
+    """keyword -> top-N competitor URLs by rank, skipping IGNORE_DOMAINS."""
+    targets = {}
+    if not os.path.isdir(research_dir):
+        return targets
+
+    for folder in sorted(os.listdir(research_dir)):
+        path = os.path.join(research_dir, folder, f"{folder}-competitions.json")
+        if not os.path.isfile(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"  Skip invalid JSON {path}: {e}")
+            continue
+        if not isinstance(data, list):
+            continue
+
+        data.sort(key=lambda x: x.get("rank", 999) if isinstance(x, dict) else 999)
+        urls = []
+        for entry in data:
+            url = entry.get("url", "") if isinstance(entry, dict) else ""
+            if not url:
+                continue
+            url = unquote(url)
+            domain = urlparse(url).netloc.lower()
+            if domain.startswith("www."):
+                domain = domain[4:]
+            if any(blk in domain for blk in IGNORE_DOMAINS):
+                continue
+            urls.append(url)
+            if len(urls) >= top_n:
+                break
+        if urls:
+            targets[folder] = urls
+    return targets
+
+
+# ---------------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------------
+def build_payload(target_url, limit, offset):
+    return [{
+        "target": target_url,
+        "location_code": LOCATION_CODE,
+        "language_code": LANGUAGE_CODE,
+        "item_types": ["organic"],
+        "order_by": ["ranked_serp_element.serp_item.etv,desc"],
+        "limit": limit,
+        "offset": offset,
+    }]
+
+
+def parse_ranked_items(task):
+    """Flatten a ranked_keywords task into (keyword, volume, traffic) rows plus total_count."""
+    rows = []
+    total_count = 0
+    for result in task.get("result") or []:
+        if not isinstance(result, dict):
+            continue
+        total_count = max(total_count, result.get("total_count") or 0)
+        for item in result.get("items") or []:
+            keyword_data = item.get("keyword_data") or {}
+            keyword = keyword_data.get("keyword")
+            if not keyword:
+                continue
+            volume = (keyword_data.get("keyword_info") or {}).get("search_volume") or 0
+            serp_item = (item.get("ranked_serp_element") or {}).get("serp_item") or {}
+            traffic = serp_item.get("etv") or 0
+            rows.append((keyword, int(volume), int(round(traffic))))
+    return rows, total_count
+
+
+async def fetch_ranked_keywords(client, target_url, max_keywords):
+    """All ranked keywords for one URL, paging with offset up to max_keywords."""
+    rows = []
+    offset = 0
+    while offset < max_keywords:
+        limit = min(PAGE_LIMIT, max_keywords - offset)
+        task = await client.post_ok(ENDPOINT, build_payload(target_url, limit, offset),
+                                    record_key=f"{normalize_url(target_url)}|{offset}")
+        page_rows, total_count = parse_ranked_items(task)
+        rows.extend(page_rows)
+        offset += limit
+        if len(page_rows) < limit or offset >= total_count:
+            break
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+def write_url_csv(path, rows):
+    """Write via a temp file + os.replace: ``path`` may be a hard link into
+    the shared ``_url_cache`` (ahref_data_collection.py), which must never be
+    rewritten in place."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+async def collect(args):
+    targets = load_competitor_urls(args.dir, args.top_n)
+    if not targets:
+        print("No competitions JSON found. Run serp_collections.py first.")
+        return
+
+    # Dedupe URLs across keywords -- one API fetch per unique URL
+    by_url = {}
+    for keyword, urls in targets.items():
+        for url in urls:
+            dest = os.path.join(args.output_dir, keyword, "all_urls", csv_name_for_url(url))
+            by_url.setdefault(normalize_url(url), {"url": url, "dests": []})["dests"].append(dest)
+
+    pending = {norm: item for norm, item in by_url.items()
+               if args.force or not all(os.path.exists(d) for d in item["dests"])}
+    refs = sum(len(item["dests"]) for item in by_url.values())
+    print(f"Targets: {refs} references -> {len(by_url)} unique URLs ({len(pending)} to fetch)")
+
+    login, password = load_credentials()
+    if pending and not (login and password) and args.api_base == API_BASE:
+        print("❌ Error: DATAFORSEO_LOGIN / DATAFORSEO_PASSWORD not set")
+        return
+
+    stats = {"fetched": 0, "failed": 0, "rows": 0}
+    if pending:
+        auth = aiohttp.BasicAuth(login or "", password or "")
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        semaphore = asyncio.Semaphore(args.max_concurrency)
+        async with aiohttp.ClientSession(auth=auth, timeout=timeout) as session:
+            client = DataForSEOClient(session, args.api_base, semaphore, args.record_dir)
+
+            async def run_one(item):
+                try:
+                    rows = await fetch_ranked_keywords(client, item["url"], args.max_keywords)
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"  ❌ {item['url']}: {e}")
+                    return
+                for dest in item["dests"]:
+                    write_url_csv(dest, rows)
+                stats["fetched"] += 1
+                stats["rows"] += len(rows)
+                print(f"  ✅ {item['url']}: {len(rows)} keywords -> {len(item['dests'])} keyword folder(s)")
+
+            await asyncio.gather(*(run_one(item) for item in pending.values()))
+        print(f"\nAPI requests: {client.requests_made}")
+
+    # Browser exports (UTF-16 TSV) and API files side by side: same merge as the browser flow
+    for keyword in targets:
+        keyword_dir = os.path.join(args.output_dir, keyword)
+        if os.path.isdir(os.path.join(keyword_dir, "all_urls")):
+            merge_keyword_csv(keyword_dir, keyword)
+
+    print(f"\nFetched {stats['fetched']} URL(s), {stats['failed']} failed, {stats['rows']} ranked keyword rows")
+
+
+async def replay(args):
+    """collect() against dataforseo_replay.py serving the recordings in ``args.replay``."""
+    from dataforseo_replay import start as start_replay
+
+    runner, args.api_base = await start_replay(args.replay)
+    print(f"🧪 Replaying {len(runner.app['recordings'])} recorded responses from {args.replay}")
+    try:
+        await collect(args)
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Phase 1.2 (API): Competitor ranked keywords via DataForSEO Labs"
+    )
+    parser.add_argument("--dir", default=RESEARCH_DIR,
+                        help=f"Research directory with competitions JSON (default: {RESEARCH_DIR})")
+    parser.add_argument("--output-dir", default=EXPORTS_DIR,
+                        help=f"Exports directory (default: {EXPORTS_DIR})")
+    parser.add_argument("--top-n", type=int, default=TOP_N_URLS,
+                        help=f"Competitor URLs per keyword (default: {TOP_N_URLS})")
+    parser.add_argument("--max-keywords", type=int, default=MAX_KEYWORDS_PER_URL,
+                        help=f"Ranked keywords to fetch per URL (default: {MAX_KEYWORDS_PER_URL})")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help=f"Concurrent API requests (default: {MAX_CONCURRENCY})")
+    parser.add_argument("--timeout", type=int, default=REQUEST_TIMEOUT,
+                        help=f"Request timeout in seconds (default: {REQUEST_TIMEOUT})")
+    parser.add_argument("--api-base", default=API_BASE,
+                        help=f"API base URL, e.g. a local stand-in server (default: {API_BASE})")
+    parser.add_argument("--record-dir", default=None,
+                        help="Save raw API responses here (for replay by a stand-in server)")
+    parser.add_argument("--replay", default=None, metavar="RECORD_DIR",
+                        help="Serve responses recorded with --record-dir instead of calling the API "
+                             "(e.g. tests/fixtures/dataforseo)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-fetch URLs whose CSVs already exist")
+    args = parser.parse_args()
+
+    print("Phase 1.2 (API): DataForSEO Labs ranked keywords")
+    print("=" * 60)
+    start = time.time()
+    asyncio.run(replay(args) if args.replay else collect(args))
+    print(f"Done in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
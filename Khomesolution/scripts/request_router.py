@@ -0,0 +1,187 @@
+"""
+Tail-latency controls for OpenRouter calls: hedged requests and fallback routing.
+
+One POST attempt normally waits for the full ClientTimeout before the
+caller's retry loop backs off and tries the same model again.  The router
+puts two controls in front of ``session.post``:
+
+    hedge      when a request is still running after the ``hedge_percentile``
+               of that model's recent latencies (rolling window, at least
+               HEDGE_MIN_SAMPLES successes seen), an identical second
+               request is fired; the first successful response wins and the
+               other is cancelled.  A cancelled primary's elapsed time goes
+               into the window as a lower bound of its latency, so slow
+               requests cut short by a hedge still pull the percentile up
+    fallback   once a call has failed ``fallback_after`` times in a row
+               (errors and timeouts; 429 retries do not count) the retry
+               goes to ``fallback_model`` instead
+
+Every hedge is logged (``hedge`` event) with the extra prompt tokens it
+sent, so the token overhead of hedging can be weighed against the latency
+it saves; ``summary()`` totals it for the run.  The overhead is prompt
+tokens only: a cancelled request never returns its completion usage.
+
+Config (per stage, under ``models.<stage>`` in config.yaml):
+    hedge_percentile: 90        # 0 disables hedging
+    fallback_model: "x-ai/grok-4-fast"
+    fallback_after: 2           # consecutive failures before the fallback
+
+Usage in a stage:
+    from request_router import RequestRouter
+
+    router = RequestRouter(_model_cfg, rate_limiter, lambda e, d: log_json(logger, e, d))
+    failures = 0                            # errors/timeouts so far, not 429s
+    for attempt in range(retries):
+        reply = await router.post(session, url, headers, payload, timeout,
+                                  failures=failures, label=keyword)
+        if reply["status"] == 200:
+            result = reply["data"]          # parsed JSON, reply["model"] served it
+"""
+
+import time
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from token_budget import count_tokens
+
+LATENCY_WINDOW = 100        # latencies kept per model
+HEDGE_MIN_SAMPLES = 10      # successes needed before the percentile is trusted
+HEDGE_MIN_DELAY = 2.0       # never hedge sooner than this (seconds)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (non-empty)."""
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class RequestRouter:
+    def __init__(self, cfg: Dict[str, Any], rate_limiter=None,
+                 log: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.hedge_percentile = cfg.get("hedge_percentile", 0) or 0
+        self.fallback_model = cfg.get("fallback_model")
+        self.fallback_after = cfg.get("fallback_after", 2)
+        self.rate_limiter = rate_limiter
+        self.log = log or (lambda event, data: None)
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0,
+                      "hedge_overhead_prompt_tokens": 0, "fallbacks": 0}
+
+    # ==========================================
+    # ROUTING
+    # ==========================================
+    def route(self, model: str, failures: int) -> str:
+        """Model for a call that has already failed ``failures`` times in a row
+        (errors and timeouts; rate-limit retries are not failures)."""
+        if self.fallback_model and self.fallback_after and failures >= self.fallback_after:
+            return self.fallback_model
+        return model
+
+    def hedge_after(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging, None while hedging is off or
+        there are too few latency samples for ``model``."""
+        samples = self.latencies.get(model)
+        if not self.hedge_percentile or not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, percentile(samples, self.hedge_percentile))
+
+    def _observe(self, model: str, latency: float):
+        self.latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    # ==========================================
+    # POST
+    # ==========================================
+    async def _attempt(self, session, url: str, headers: Dict, payload: Dict, timeout) -> Dict[str, Any]:
+        started = time.perf_counter()
+        async with session.post(url, headers=headers, json=payload, timeout=timeout) as resp:
+            reply = {"status": resp.status, "model": payload["model"], "data": None, "text": ""}
+            if resp.status == 200:
+                reply["data"] = await resp.json()
+            else:
+                reply["text"] = await resp.text()
+        reply["latency_s"] = time.perf_counter() - started
+        return reply
+
+    async def post(self, session, url: str, headers: Dict, payload: Dict, timeout,
+                   failures: int = 0, label: str = "") -> Dict[str, Any]:
+        """One (possibly hedged) attempt.
+
+        Returns ``{"status", "data", "text", "model", "latency_s", "hedged"}``;
+        network errors and timeouts are raised as by ``session.post`` when
+        no request succeeded.
+        """
+        model = self.route(payload["model"], failures)
+        if model != payload["model"]:
+            self.stats["fallbacks"] += 1
+            self.log("fallback_model", {"keyword": label, "from": payload["model"], "to": model,
+                                        "failures": failures})
+            payload = {**payload, "model": model}
+        self.stats["requests"] += 1
+
+        started = time.perf_counter()
+        tasks: List[asyncio.Task] = [asyncio.ensure_future(
+            self._attempt(session, url, headers, payload, timeout))]
+        threshold = self.hedge_after(model)
+        if threshold is not None:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done and self.rate_limiter:
+                await self.rate_limiter.acquire()
+            if not tasks[0].done():
+                tasks.append(asyncio.ensure_future(self._attempt(session, url, headers, payload, timeout)))
+
+        try:
+            winner, reply = await self._first_success(tasks)
+        finally:
+            # Only the primary can still be running when the hedge wins
+            primary_cut = not tasks[0].done()
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        reply["hedged"] = len(tasks) > 1
+        if reply["status"] == 200:
+            self._observe(model, reply["latency_s"])
+            if primary_cut:
+                # Censored: the primary would have taken at least this long
+                self._observe(model, time.perf_counter() - started)
+        if reply["hedged"]:
+            # The losing request is cancelled (or failed): its prompt was
+            # sent anyway, so count it as the hedge overhead.  Prompt tokens
+            # only, a cancelled request never reports its completion tokens.
+            overhead = sum(count_tokens(m.get("content", ""), model) for m in payload.get("messages", []))
+            self.stats["hedged"] += 1
+            self.stats["hedge_wins"] += winner == 1
+            self.stats["hedge_overhead_prompt_tokens"] += overhead
+            self.log("hedge", {"keyword": label, "model": model, "after_s": round(threshold, 2),
+                               "winner": "hedge" if winner == 1 else "primary",
+                               "latency_s": round(reply["latency_s"], 2),
+                               "overhead_prompt_tokens": overhead})
+        return reply
+
+    @staticmethod
+    async def _first_success(tasks: List[asyncio.Task]) -> Tuple[int, Dict[str, Any]]:
+        """``(task index, reply)`` of the first 200 reply; else of the last
+        non-200 reply; else the last error is raised."""
+        pending = set(tasks)
+        last, error = None, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif task.result()["status"] == 200:
+                    return tasks.index(task), task.result()
+                else:
+                    last = (tasks.index(task), task.result())
+        if last is not None:
+            return last
+        raise error
+
+    def summary(self) -> Dict[str, Any]:
+        s = dict(self.stats)
+        s["hedge_rate"] = round(s["hedged"] / s["requests"], 4) if s["requests"] else 0.0
+        s["latency_p50"] = {m: round(percentile(v, 50), 2) for m, v in self.latencies.items() if v}
+        s["latency_p90"] = {m: round(percentile(v, 90), 2) for m, v in self.latencies.items() if v}
+        return s
@@ -0,0 +1,318 @@
+"""
+Cross-document fact store for data/deep-research.
+
+Research for related keywords (หน้าต่างกันเสียง / กระจกกันเสียง ...) repeats
+the same facts.  This pass fingerprints every paragraph (line) of every
+research document with MinHash (near_duplicates.find_representatives over
+thai_segmenter word tokens), keeps one copy of each fact, and rewrites
+each document as a list of references into that store:
+
+    data/deep-research/_fact_store.json
+      facts:      {"f00012": {"text": ..., "tokens": 143, "keywords": [...]}}
+      documents:  {keyword: {"source": ..., "sha256": ..., "items": [
+                      {"text": "## Heading", "sep": "\\n"},   # kept as is
+                      {"fact": "f00012", "sep": "\\n"}, ...]}}
+      stats:      corpus-wide duplicate ratio and token savings
+
+Headings and short lines (< MIN_FACT_TOKENS) stay literal in each
+document.  The source of each keyword is the file outline_answer.py reads
+(``<kw>-research-optimized.md``), falling back to the optimizer's
+``<kw>-research.optimized.md`` and then the raw ``<kw>-research.md``.
+
+``assemble_research(store, keywords, max_tokens)`` builds prompt research
+text from one or more keywords with every fact included once, in document
+order, skipping whole facts that no longer fit the token budget.
+``related_keywords(store, keyword)`` lists the keyword followed by its
+cluster siblings (data/kw-semantic/keyword_clusters.json, written by
+keyword_clustering.py) that have current research in the store, so a
+prompt can draw on the whole cluster without paying for shared facts twice.
+
+Usage:
+    python scripts/research_facts.py                    # build + report
+    python scripts/research_facts.py --method exact --threshold 0.7
+"""
+
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from md_blocks import classify, iter_blocks
+from near_duplicates import find_representatives
+from token_budget import DEFAULT_MODEL, count_tokens
+
+RESEARCH_DIR = Path("data/deep-research")
+STORE_FILENAME = "_fact_store.json"
+CLUSTERS_PATH = Path("data/kw-semantic/keyword_clusters.json")
+STORE_VERSION = 1
+
+FACT_THRESHOLD = 0.65       # same similarity threshold as the optimizer's redundancy stage
+FACT_METHOD = "minhash"
+MIN_FACT_TOKENS = 12        # shorter lines (labels, headings-as-text) stay per-document
+
+
+# ==========================================
+# SOURCES
+# ==========================================
+def research_source(research_dir: Path, keyword: str) -> Optional[Path]:
+    """The research file prompts use for ``keyword`` (optimized first)."""
+    for name in (f"{keyword}-research-optimized.md", f"{keyword}-research.optimized.md",
+                 f"{keyword}-research.md"):
+        path = research_dir / name
+        if path.exists():
+            return path
+    return None
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def discover_keywords(research_dir: Path) -> List[str]:
+    return sorted(p.name[:-len("-research.md")] for p in research_dir.glob("*-research.md")
+                  if ".optimized." not in p.name)
+
+
+# ==========================================
+# BUILD
+# ==========================================
+def _paragraphs(text: str):
+    """(line, separator) pairs: optimized research puts one paragraph per
+    line, so each line of each markdown block is a unit."""
+    for block in iter_blocks(text):
+        lines = block.text.split("\n")
+        for k, line in enumerate(lines):
+            yield line, "\n" if k < len(lines) - 1 else block.sep
+
+
+def build_store(research_dir: Path, keywords: Sequence[str], threshold: float = FACT_THRESHOLD,
+                method: str = FACT_METHOD, model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    documents: Dict[str, Dict[str, Any]] = {}
+    candidates: List[Tuple[str, int]] = []   # (keyword, item index) of fact-sized lines
+    texts: List[str] = []
+
+    for keyword in keywords:
+        source = research_source(research_dir, keyword)
+        if source is None:
+            print(f"  ⚠️ {keyword}: no research file, skipped")
+            continue
+        text = source.read_text(encoding="utf-8")
+        items = []
+        for line, sep in _paragraphs(text):
+            items.append({"text": line, "sep": sep})
+            if classify(line) != "heading" and count_tokens(line, model) >= MIN_FACT_TOKENS:
+                candidates.append((keyword, len(items) - 1))
+                texts.append(line.strip())
+        documents[keyword] = {"source": source.name, "sha256": _file_hash(source),
+                              "tokens": count_tokens(text, model), "items": items}
+
+    # Cluster fact-sized lines across the whole corpus; the first
+    # occurrence (keyword order, then document order) is the stored text
+    reps = find_representatives(texts, threshold, method)
+    facts: Dict[str, Dict[str, Any]] = {}
+    fact_ids: Dict[int, str] = {}
+    for idx, rep in enumerate(reps):
+        if rep not in fact_ids:
+            fact_ids[rep] = f"f{len(fact_ids):05d}"
+            facts[fact_ids[rep]] = {"text": texts[rep], "tokens": count_tokens(texts[rep], model),
+                                    "keywords": []}
+        keyword, item_idx = candidates[idx]
+        fact = facts[fact_ids[rep]]
+        if keyword not in fact["keywords"]:
+            fact["keywords"].append(keyword)
+        item = documents[keyword]["items"][item_idx]
+        documents[keyword]["items"][item_idx] = {"fact": fact_ids[rep], "sep": item["sep"]}
+
+    return {
+        "version": STORE_VERSION,
+        "threshold": threshold,
+        "method": method,
+        "model": model,
+        "facts": facts,
+        "documents": documents,
+        "stats": store_stats(facts, documents, len(texts), model),
+    }
+
+
+def store_stats(facts: Dict[str, Any], documents: Dict[str, Any], blocks: int,
+                model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    """Duplicate ratios and token savings if every fact were sent once."""
+    literal_tokens = sum(count_tokens(item["text"], model)
+                         for doc in documents.values() for item in doc["items"] if "text" in item)
+    fact_refs = [item["fact"] for doc in documents.values() for item in doc["items"] if "fact" in item]
+    referenced_tokens = sum(facts[f]["tokens"] for f in fact_refs)
+    unique_tokens = sum(f["tokens"] for f in facts.values())
+    total_tokens = literal_tokens + referenced_tokens
+
+    per_keyword = {}
+    for keyword, doc in documents.items():
+        ids = [item["fact"] for item in doc["items"] if "fact" in item]
+        shared = [f for f in ids if len(facts[f]["keywords"]) > 1]
+        per_keyword[keyword] = {
+            "facts": len(ids),
+            "shared_facts": len(shared),
+            "shared_tokens": sum(facts[f]["tokens"] for f in shared),
+            "repeated_in_document": len(ids) - len(set(ids)),
+        }
+
+    return {
+        "documents": len(documents),
+        "fact_blocks": blocks,
+        "unique_facts": len(facts),
+        "shared_facts": sum(1 for f in facts.values() if len(f["keywords"]) > 1),
+        "duplicate_ratio": round(1 - len(facts) / blocks, 4) if blocks else 0.0,
+        "tokens_total": total_tokens,
+        "tokens_deduplicated": literal_tokens + unique_tokens,
+        "token_savings": referenced_tokens - unique_tokens,
+        "token_savings_ratio": round((referenced_tokens - unique_tokens) / total_tokens, 4) if total_tokens else 0.0,
+        "per_keyword": per_keyword,
+    }
+
+
+def save_store(store: Dict[str, Any], research_dir: Path) -> Path:
+    path = research_dir / STORE_FILENAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(store, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+def load_store(research_dir: Path = RESEARCH_DIR) -> Optional[Dict[str, Any]]:
+    try:
+        store = json.loads((research_dir / STORE_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return store if store.get("version") == STORE_VERSION else None
+
+
+def is_current(store: Dict[str, Any], keyword: str, research_dir: Path = RESEARCH_DIR) -> bool:
+    """True if ``keyword`` is in the store and its source file is unchanged."""
+    doc = store.get("documents", {}).get(keyword)
+    if doc is None:
+        return False
+    source = research_dir / doc["source"]
+    return source.exists() and _file_hash(source) == doc["sha256"]
+
+
+def _normalize(name: str) -> str:
+    # Cluster folders are sanitized keywords (spaces -> underscores)
+    return " ".join(name.replace("_", " ").lower().split())
+
+
+def related_keywords(store: Dict[str, Any], keyword: str, research_dir: Path = RESEARCH_DIR,
+                     clusters_path: Path = CLUSTERS_PATH) -> List[str]:
+    """``keyword`` followed by its cluster siblings with current research in the store.
+
+    Siblings are matched on either their keyword or their folder name; a
+    keyword that is in no cluster (or no clusters file) gets ``[keyword]``.
+    """
+    try:
+        clusters = json.loads(clusters_path.read_text(encoding="utf-8"))["clusters"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return [keyword]
+
+    by_name = {_normalize(k): k for k in store.get("documents", {})}
+    target = _normalize(keyword)
+    for cluster in clusters:
+        members = cluster.get("keywords", [])
+        if not any(target in (_normalize(m.get("keyword", "")), _normalize(m.get("folder", "")))
+                   for m in members):
+            continue
+        related = [keyword]
+        for m in members:
+            for name in (m.get("keyword", ""), m.get("folder", "")):
+                doc_key = by_name.get(_normalize(name))
+                if doc_key and doc_key not in related and is_current(store, doc_key, research_dir):
+                    related.append(doc_key)
+                    break
+        return related
+    return [keyword]
+
+
+# ==========================================
+# PROMPT ASSEMBLY
+# ==========================================
+def assemble_research(store: Dict[str, Any], keywords: Sequence[str], max_tokens: int = 0,
+                      model: str = DEFAULT_MODEL) -> Tuple[str, Dict[str, Any]]:
+    """Research text for ``keywords`` with each fact included once.
+
+    Documents are walked in order; a fact already included (by an earlier
+    keyword or earlier in the same document) is skipped.  With
+    ``max_tokens`` > 0, facts that would overflow the budget are left out
+    whole (later, smaller ones may still fit).  Returns ``(text, usage)``.
+    """
+    seen = set()
+    parts: List[str] = []
+    used = 0
+    usage = {"keywords": list(keywords), "budget": max_tokens, "facts": 0,
+             "facts_deduplicated": 0, "facts_over_budget": 0, "tokens_source": 0}
+
+    for keyword in keywords:
+        doc = store["documents"].get(keyword)
+        if doc is None:
+            continue
+        usage["tokens_source"] += doc["tokens"]
+        for item in doc["items"]:
+            if "fact" in item:
+                if item["fact"] in seen:
+                    usage["facts_deduplicated"] += 1
+                    continue
+                fact = store["facts"][item["fact"]]
+                text, tokens = fact["text"], fact["tokens"]
+            else:
+                text = item["text"]
+                tokens = count_tokens(text, model)
+            if max_tokens and used + tokens > max_tokens:
+                if "fact" in item:
+                    usage["facts_over_budget"] += 1
+                continue
+            if "fact" in item:
+                seen.add(item["fact"])
+                usage["facts"] += 1
+            parts.append(text + (item["sep"] or "\n\n"))
+            used += tokens
+
+    text = "".join(parts).strip()
+    usage["tokens"] = count_tokens(text, model)
+    return text, usage
+
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="Build the cross-document research fact store")
+    parser.add_argument("--dir", default=str(RESEARCH_DIR), help="Research directory")
+    parser.add_argument("--keyword", action="append", help="Only these keywords (repeatable)")
+    parser.add_argument("--threshold", type=float, default=FACT_THRESHOLD,
+                        help=f"Similarity above which two paragraphs are one fact (default: {FACT_THRESHOLD})")
+    parser.add_argument("--method", choices=["auto", "exact", "minhash"], default=FACT_METHOD,
+                        help=f"Near-duplicate search (default: {FACT_METHOD})")
+    args = parser.parse_args()
+
+    research_dir = Path(args.dir)
+    keywords = args.keyword or discover_keywords(research_dir)
+    if not keywords:
+        print(f"No research files found in {research_dir}")
+        sys.exit(1)
+
+    print(f"├── Fingerprinting {len(keywords)} research documents in {research_dir}")
+    store = build_store(research_dir, keywords, args.threshold, args.method)
+    path = save_store(store, research_dir)
+
+    s = store["stats"]
+    for keyword, k in s["per_keyword"].items():
+        print(f"│   ├── {keyword}: {k['facts']} facts, {k['shared_facts']} shared "
+              f"(~{k['shared_tokens']:,} tokens), {k['repeated_in_document']} repeated in-document")
+    print(f"├── Fact blocks: {s['fact_blocks']:,} → {s['unique_facts']:,} unique "
+          f"({s['duplicate_ratio']:.1%} duplicate, {s['shared_facts']:,} shared across keywords)")
+    print(f"├── Tokens: {s['tokens_total']:,} → {s['tokens_deduplicated']:,} "
+          f"(saves {s['token_savings']:,}, {s['token_savings_ratio']:.1%})")
+    print(f"└── Saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Schema and fast decoding for title_analysis SERP analyses.
+
+The analysis has twelve top-level sections (``REQUIRED_SECTIONS``) and a
+few size limits the prompt asks for (knowledge graph nodes/edges,
+entities, opportunity gaps, dominant title patterns).  Both the JSON
+Schema sent as ``response_format`` and ``title_analysis.validate_yaml_schema``
+are built from the constants below, so the two cannot drift apart.
+
+* ``response_format()`` -- OpenRouter structured-output request body
+  (non-strict: sections keep free-form fields, the limits are advisory).
+* ``decode_analysis(text)`` -- JSON response -> dict.  With msgspec the
+  response is decoded straight into typed structs (top-level sections
+  must be objects/arrays, knowledge graph lists must be lists); a
+  well-formed response of the wrong shape, or with top-level or
+  ``knowledge_graph`` keys the structs do not declare, is returned untyped
+  with every key kept, as the orjson/json path would.  Without msgspec orjson (or the stdlib
+  ``json`` decoder) is used.
+* ``yaml_load(text)`` / ``yaml_dump(data)`` -- libyaml's ``CSafeLoader`` /
+  ``CSafeDumper`` when PyYAML was built with it, the pure-Python classes
+  otherwise.
+
+Stored analyses: ``<kw>-serp-analysis.json`` is the canonical artifact
+(compact JSON, written with orjson when installed and read back through
+``decode_analysis``); ``<kw>-serp-analysis.yaml`` is a human-readable
+sidecar.  ``find_analysis`` / ``load_analysis`` prefer the JSON file and
+fall back to the YAML of analyses written before it existed.
+
+Usage:
+    from serp_schema import decode_analysis, response_format, yaml_load
+
+    payload["response_format"] = response_format()
+    data = decode_analysis(content) or safe_yaml_load(content)
+
+    save_analysis(data, keyword_dir, keyword)
+    data = load_analysis(find_analysis(keyword_dir, keyword))
+
+Corpus timings and migration (from the Khomesolution folder):
+    python scripts/serp_schema.py bench      # YAML vs JSON load/dump times
+    python scripts/serp_schema.py convert    # write .json for YAML-only analyses
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import yaml
+
+try:
+    import msgspec
+    HAS_MSGSPEC = True
+except ImportError:
+    HAS_MSGSPEC = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+REQUIRED_SECTIONS = [
+    "meta", "intent", "ymyl", "lexical_signals", "pattern_signals",
+    "entity_signals", "knowledge_graph", "competitor_matrix",
+    "paa_and_related", "consensus_signals", "opportunity_gaps",
+    "title_generation_signals"
+]
+
+# Predicate types for Knowledge Graph (TITLE-FOCUSED LEAN)
+VALID_PREDICATES = [
+    "is_a", "aka", "related_to", "has_attribute", "has_quantity",
+    "has_duration", "has_cost", "has_benefit", "has_risk", "requires",
+    "time_to_result", "compared_with", "alternative_to", "suitable_for",
+    "defined_as", "available_at"
+]
+
+# LEAN COMPUTE CONSTRAINTS (PROMPTS/title_analysis_system.md)
+MAX_KG_NODES = 12
+MAX_KG_EDGES = 18
+MAX_ENTITIES = 8
+MAX_OPPORTUNITY_GAPS = 3
+MAX_TITLE_PATTERNS = 2
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+OUTPUT_DIR = Path("output/research")
+JSON_SUFFIX = "-serp-analysis.json"
+YAML_SUFFIX = "-serp-analysis.yaml"
+
+
+# ==========================================
+# JSON SCHEMA
+# ==========================================
+def _object(**properties) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties} if properties else {"type": "object"}
+
+
+def _array(items: Dict[str, Any] = None, max_items: int = None) -> Dict[str, Any]:
+    schema = {"type": "array", "items": items or _object()}
+    if max_items:
+        schema["maxItems"] = max_items
+    return schema
+
+
+def analysis_json_schema() -> Dict[str, Any]:
+    """JSON Schema of the analysis document."""
+    sections = {name: _object() for name in REQUIRED_SECTIONS}
+    sections["pattern_signals"] = _object(
+        dominant_title_patterns=_array(max_items=MAX_TITLE_PATTERNS),
+        angles_observed=_array(),
+    )
+    sections["entity_signals"] = _object(entities=_array(max_items=MAX_ENTITIES))
+    sections["knowledge_graph"] = _object(
+        nodes=_array(_object(id={"type": "string"}, canonical={"type": "string"}), MAX_KG_NODES),
+        edges=_array(_object(subject_id={"type": "string"},
+                             predicate={"type": "string", "enum": VALID_PREDICATES},
+                             object_id={"type": ["string", "null"]}), MAX_KG_EDGES),
+        central_concepts=_array({"type": "string"}),
+    )
+    sections["competitor_matrix"] = _array()
+    sections["opportunity_gaps"] = _array(max_items=MAX_OPPORTUNITY_GAPS)
+    return {"type": "object", "properties": sections, "required": list(REQUIRED_SECTIONS)}
+
+
+def response_format() -> Dict[str, Any]:
+    """``response_format`` for an OpenRouter chat completion request."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "serp_analysis", "strict": False, "schema": analysis_json_schema()},
+    }
+
+
+# ==========================================
+# DECODING
+# ==========================================
+if HAS_MSGSPEC:
+    _Section = Union[Dict[str, Any], msgspec.UnsetType]
+    _Items = Union[List[Dict[str, Any]], msgspec.UnsetType]
+
+    class KnowledgeGraph(msgspec.Struct, omit_defaults=True, forbid_unknown_fields=True):
+        nodes: _Items = msgspec.UNSET
+        edges: _Items = msgspec.UNSET
+        central_concepts: Union[List[Any], msgspec.UnsetType] = msgspec.UNSET
+
+    class SerpAnalysis(msgspec.Struct, omit_defaults=True, forbid_unknown_fields=True):
+        # Absent sections stay UNSET (and absent after to_builtins) so
+        # validate_yaml_schema still reports them as missing
+        meta: _Section = msgspec.UNSET
+        intent: _Section = msgspec.UNSET
+        ymyl: _Section = msgspec.UNSET
+        lexical_signals: _Section = msgspec.UNSET
+        pattern_signals: _Section = msgspec.UNSET
+        entity_signals: Union[Dict[str, Any], List[Any], msgspec.UnsetType] = msgspec.UNSET
+        knowledge_graph: Union[KnowledgeGraph, msgspec.UnsetType] = msgspec.UNSET
+        competitor_matrix: _Items = msgspec.UNSET
+        paa_and_related: _Section = msgspec.UNSET
+        consensus_signals: _Section = msgspec.UNSET
+        opportunity_gaps: _Items = msgspec.UNSET
+        title_generation_signals: _Section = msgspec.UNSET
+        quality_score: Union[float, msgspec.UnsetType] = msgspec.UNSET   # added by title_analysis
+
+    _DECODER = msgspec.json.Decoder(SerpAnalysis)
+
+
+def decode_analysis(content: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    """Decode a JSON analysis; None if ``content`` is not a JSON object."""
+    if HAS_MSGSPEC:
+        try:
+            return msgspec.to_builtins(_DECODER.decode(content))
+        except msgspec.ValidationError:
+            # Valid JSON, unexpected shape or keys the structs do not declare:
+            # keep everything (the typed decode would drop unknown keys) and
+            # let validation report what is wrong
+            try:
+                data = msgspec.json.decode(content)
+            except msgspec.DecodeError:
+                return None
+        except msgspec.DecodeError:
+            return None
+    elif HAS_ORJSON:
+        try:
+            data = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return None
+    else:
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return None
+    return data if isinstance(data, dict) else None
+
+
+def encode_analysis(data: Dict[str, Any]) -> bytes:
+    if HAS_ORJSON:
+        # YAML analyses can have int/bool keys, which json.dumps accepts
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def yaml_load(content: str) -> Any:
+    return yaml.load(content, Loader=YAML_LOADER)
+
+
+def yaml_dump(data: Any, **kwargs) -> str:
+    """``yaml.dump`` through the C dumper; defaults match title_analysis' output."""
+    kwargs.setdefault("allow_unicode", True)
+    kwargs.setdefault("default_flow_style", False)
+    kwargs.setdefault("sort_keys", False)
+    return yaml.dump(data, Dumper=YAML_DUMPER, **kwargs)
+
+
+# ==========================================
+# STORED ANALYSES
+# ==========================================
+def analysis_paths(keyword_dir: Path, keyword: str) -> Tuple[Path, Path]:
+    """(canonical JSON, YAML sidecar) paths of a keyword's analysis."""
+    return keyword_dir / f"{keyword}{JSON_SUFFIX}", keyword_dir / f"{keyword}{YAML_SUFFIX}"
+
+
+def find_analysis(keyword_dir: Path, keyword: str) -> Optional[Path]:
+    """The file to read: the JSON artifact, else a legacy YAML-only analysis."""
+    for path in analysis_paths(keyword_dir, keyword):
+        if path.exists():
+            return path
+    return None
+
+
+def save_analysis(data: Dict[str, Any], keyword_dir: Path, keyword: str, sidecar: bool = True) -> Path:
+    """Write the JSON artifact (and the YAML sidecar); returns the JSON path."""
+    json_path, yaml_path = analysis_paths(keyword_dir, keyword)
+    keyword_dir.mkdir(parents=True, exist_ok=True)
+    tmp = json_path.with_name(json_path.name + ".tmp")
+    tmp.write_bytes(encode_analysis(data))
+    tmp.replace(json_path)
+    if sidecar:
+        yaml_path.write_text(yaml_dump(data), encoding="utf-8")
+    return json_path
+
+
+def load_analysis(path: Optional[Path]) -> Optional[Dict[str, Any]]:
+    if path is None or not path.exists():
+        return None
+    if path.suffix == ".json":
+        return decode_analysis(path.read_bytes())
+    data = yaml_load(path.read_text(encoding="utf-8"))
+    return data if isinstance(data, dict) else None
+
+
+# ==========================================
+# CLI: BENCH / CONVERT
+# ==========================================
+def _yaml_files(output_dir: Path) -> List[Path]:
+    return sorted(output_dir.glob(f"*/*{YAML_SUFFIX}"))
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(output_dir: Path, repeat: int) -> None:
+    files = _yaml_files(output_dir)
+    if not files:
+        print(f"No *{YAML_SUFFIX} files in {output_dir}")
+        return
+    texts = [f.read_text(encoding="utf-8") for f in files]
+    docs = [yaml_load(t) for t in texts]
+    blobs = [encode_analysis(d) for d in docs]
+
+    rows = [
+        ("load  yaml.safe_load (pure Python)", lambda: [yaml.safe_load(t) for t in texts]),
+        ("load  yaml CSafeLoader", lambda: [yaml_load(t) for t in texts]),
+        (f"load  JSON ({'msgspec typed' if HAS_MSGSPEC else 'orjson' if HAS_ORJSON else 'json'})",
+         lambda: [decode_analysis(b) for b in blobs]),
+        ("dump  yaml.dump (pure Python)",
+         lambda: [yaml.dump(d, allow_unicode=True, default_flow_style=False, sort_keys=False) for d in docs]),
+        ("dump  yaml CSafeDumper", lambda: [yaml_dump(d) for d in docs]),
+        (f"dump  JSON ({'orjson' if HAS_ORJSON else 'json'})", lambda: [encode_analysis(d) for d in docs]),
+    ]
+    print(f"├── {len(files)} analyses, {sum(map(len, texts)) / 1e3:.0f} KB YAML / "
+          f"{sum(map(len, blobs)) / 1e3:.0f} KB JSON, {repeat} repeats")
+    for i, (label, fn) in enumerate(rows):
+        branch = "└──" if i == len(rows) - 1 else "├──"
+        t = _time(fn, repeat)
+        print(f"{branch} {label:<36} {t * 1e3:9.2f} ms  ({t / len(files) * 1e6:,.0f} us/file)")
+
+
+def convert(output_dir: Path, force: bool = False) -> int:
+    converted = 0
+    for yaml_path in _yaml_files(output_dir):
+        keyword = yaml_path.name[:-len(YAML_SUFFIX)]
+        json_path, _ = analysis_paths(yaml_path.parent, keyword)
+        if json_path.exists() and not force:
+            continue
+        data = load_analysis(yaml_path)
+        if data is None:
+            print(f"├── ⚠️ {yaml_path}: not a YAML mapping, skipped")
+            continue
+        save_analysis(data, yaml_path.parent, keyword, sidecar=False)
+        converted += 1
+        print(f"├── {json_path}")
+    print(f"└── Converted {converted} analyses")
+    return converted
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    parser = argparse.ArgumentParser(description="SERP analysis artifact tools")
+    parser.add_argument("--dir", default=str(OUTPUT_DIR), help=f"Research output directory (default: {OUTPUT_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="Time YAML vs JSON load/dump over the stored analyses")
+    p_bench.add_argument("--repeat", type=int, default=20)
+    p_convert = sub.add_parser("convert", help="Write the JSON artifact for YAML-only analyses")
+    p_convert.add_argument("--force", action="store_true", help="Rewrite existing JSON files too")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(Path(args.dir), args.repeat)
+    elif args.command == "convert":
+        convert(Path(args.dir), args.force)
+
+
+if __name__ == "__main__":
+    main()
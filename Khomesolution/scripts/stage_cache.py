@@ -0,0 +1,244 @@
+"""
+Content-addressed stage cache for optimize_research_data.py.
+
+Each pipeline stage's output is stored under a key derived from
+
+    (hash of the stage input, stage name, hash of the stage's rules)
+
+so a rerun walks the stages, following cached outputs by hash without
+loading or re-running them, and only starts executing at the first stage
+whose input or rules changed.
+
+A stage's "rules" fingerprint is computed from its code, not declared by
+hand: the source of the stage function plus every module-level value it
+references -- compiled regexes, rule lists, thresholds, rewrite engines
+(via their ``fingerprint``), data files (``Path`` values, by content:
+the Thai word list ...), and, recursively, the helper functions and
+classes it calls (including those imported from other modules).  Editing
+one regex in a late stage therefore invalidates that stage and the ones
+after it, and nothing else.  Module-level memo tables (dicts named
+``*_cache``, ``*_memo``, ``*_stats`` or ``*_fingerprints``, such as
+``_stage_fingerprints``) are runtime state, not rules, and are skipped so
+the fingerprint is the same before and after a run fills them.
+
+Layout (under ``<research dir>/.stage_cache/``)::
+
+    blobs/<h[:2]>/<h>.md      stage outputs, by content hash
+    entries/<key>.json        {"output": h, ...extra}  one file per key
+    outputs/<stem>.json       manifest of the last written .optimized.md
+
+One file per entry (written with ``os.replace``) keeps concurrent
+``--workers`` processes from clobbering each other.
+"""
+
+import os
+import re
+import sys
+import json
+import types
+import hashlib
+import inspect
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CACHE_DIRNAME = ".stage_cache"
+_MEMO_NAME_RE = re.compile(r"_(?:cache|memo|stats|fingerprints)$")
+_SCRIPTS_DIR = Path(__file__).resolve().parent
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ==========================================
+# RULE FINGERPRINTS
+# ==========================================
+def _code_names(code: types.CodeType):
+    """Global/attribute names used by ``code`` and its nested functions."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _is_local(obj) -> bool:
+    """Defined in a module of this scripts folder (not stdlib/site-packages)."""
+    module_file = getattr(sys.modules.get(getattr(obj, "__module__", None)), "__file__", None)
+    return bool(module_file) and Path(module_file).resolve().parent == _SCRIPTS_DIR
+
+
+def _source(obj) -> str:
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        code = getattr(obj, "__code__", None)
+        return code.co_code.hex() if code is not None else obj.__qualname__
+
+
+def _is_memo(name: str, value) -> bool:
+    """A module-level memo/cache table: filled at runtime, not a rule."""
+    return isinstance(value, dict) and bool(_MEMO_NAME_RE.search(name))
+
+
+def _update(h, value, seen) -> None:
+    """Feed a stable description of ``value`` into hash ``h``."""
+    if isinstance(value, (types.FunctionType, type)) and not _is_local(value):
+        # Library code: its behaviour is pinned by the installed version
+        h.update(f"{getattr(value, '__module__', '')}.{value.__qualname__}".encode("utf-8"))
+    elif isinstance(value, (types.FunctionType, type)):
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        h.update(_source(value).encode("utf-8"))
+        functions = [value] if isinstance(value, types.FunctionType) else [
+            v for v in vars(value).values() if isinstance(v, types.FunctionType)]
+        for fn in functions:
+            for name in sorted(_code_names(fn.__code__)):
+                if name in fn.__globals__ and not _is_memo(name, fn.__globals__[name]):
+                    _update(h, fn.__globals__[name], seen)
+    elif isinstance(getattr(value, "__wrapped__", None), types.FunctionType):
+        # lru_cache / functools.wraps: fingerprint the wrapped function
+        _update(h, value.__wrapped__, seen)
+    elif isinstance(value, Path):
+        # Data files a stage loads (thai_segmenter.WORDS_PATH ...): their content
+        h.update(f"path:{value.name}:".encode("utf-8"))
+        if value.is_file():
+            h.update(hashlib.sha256(value.read_bytes()).digest())
+    elif isinstance(value, re.Pattern):
+        h.update(f"re:{value.pattern!r}:{value.flags}".encode("utf-8"))
+    elif isinstance(getattr(value, "fingerprint", None), str):
+        h.update(value.fingerprint.encode("utf-8"))
+    elif isinstance(value, (str, bytes, int, float, bool, type(None))):
+        h.update(repr(value).encode("utf-8"))
+    elif isinstance(value, (list, tuple)):
+        h.update(b"[")
+        for item in value:
+            _update(h, item, seen)
+        h.update(b"]")
+    elif isinstance(value, dict):
+        h.update(b"{")
+        for k, v in value.items():
+            _update(h, k, seen)
+            _update(h, v, seen)
+        h.update(b"}")
+    elif isinstance(value, (set, frozenset)):
+        h.update(repr(sorted(map(repr, value))).encode("utf-8"))
+    # modules, loggers, other live objects: not rules
+
+
+def rules_fingerprint(*parts: Any) -> str:
+    """Hash of functions (with everything they reference) and parameters."""
+    h = hashlib.sha256()
+    seen: set = set()
+    for part in parts:
+        _update(h, part, seen)
+    return h.hexdigest()
+
+
+# ==========================================
+# STORE
+# ==========================================
+class StageCache:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_dir(cls, base_dir) -> "StageCache":
+        return cls(Path(base_dir) / CACHE_DIRNAME)
+
+    @staticmethod
+    def key(input_hash: str, stage: str, rules_hash: str) -> str:
+        return hashlib.sha256(f"{input_hash}|{stage}|{rules_hash}".encode("utf-8")).hexdigest()
+
+    def _write(self, path: Path, data: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _blob(self, h: str) -> Path:
+        return self.root / "blobs" / h[:2] / f"{h}.md"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached entry for ``key`` if its output blob is still present."""
+        try:
+            entry = json.loads((self.root / "entries" / f"{key}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if not self._blob(entry.get("output", "")).exists():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, text: str, **extra) -> str:
+        """Store a stage output; returns its content hash."""
+        h = text_hash(text)
+        blob = self._blob(h)
+        if not blob.exists():
+            self._write(blob, text)
+        self.put_entry(key, h, **extra)
+        return h
+
+    def put_entry(self, key: str, output_hash: str, **extra) -> None:
+        self._write(self.root / "entries" / f"{key}.json",
+                    json.dumps({"output": output_hash, **extra}, ensure_ascii=False))
+
+    def open_blob(self) -> "BlobWriter":
+        """Incremental writer for a stage output that is produced in pieces."""
+        return BlobWriter(self)
+
+    def load_text(self, h: str) -> Optional[str]:
+        try:
+            with open(self._blob(h), "r", encoding="utf-8", newline="") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # Manifest of written outputs (hash-based skip check)
+    def read_manifest(self, stem: str) -> Dict[str, Any]:
+        try:
+            return json.loads((self.root / "outputs" / f"{stem}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def write_manifest(self, stem: str, manifest: Dict[str, Any]) -> None:
+        self._write(self.root / "outputs" / f"{stem}.json",
+                    json.dumps(manifest, ensure_ascii=False, indent=1))
+
+
+class BlobWriter:
+    """Streams a blob to a temp file while hashing it; ``close()`` files it
+    under its content hash and returns the hash."""
+
+    def __init__(self, cache: StageCache):
+        self._cache = cache
+        tmp_dir = cache.root / "blobs"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._tmp = tmp_dir / f"tmp-{os.getpid()}-{id(self)}"
+        self._file = open(self._tmp, "w", encoding="utf-8", newline="")
+        self._hash = hashlib.sha256()
+
+    def write(self, text: str) -> None:
+        self._file.write(text)
+        self._hash.update(text.encode("utf-8"))
+
+    def discard(self) -> None:
+        self._file.close()
+        os.remove(self._tmp)
+
+    def close(self) -> str:
+        self._file.close()
+        h = self._hash.hexdigest()
+        blob = self._cache._blob(h)
+        if blob.exists():
+            os.remove(self._tmp)
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._tmp, blob)
+        return h
@@ -0,0 +1,211 @@
+"""
+Dictionary-based Thai word segmentation (pure Python, offline).
+
+Thai is written without spaces between words, so similarity code used to
+fall back to character n-grams for Thai text and keyword matching simply
+deleted whitespace.  ``word_tokens`` gives both a word-level view instead:
+
+    word_tokens("การติดตั้งหน้าต่างกระจก UPVC ราคาถูก")
+    -> ['การ', 'ติดตั้ง', 'หน้าต่าง', 'กระจก', 'upvc', 'ราคา', 'ถูก']
+
+* Thai runs are segmented by maximal matching over a dictionary trie:
+  the segmentation with the fewest unknown characters, then the fewest
+  words (ties go to longer words first).  A word may only end where a new character cluster can start (not
+  before a tone mark / following vowel, not after a leading vowel), and
+  text not covered by the dictionary becomes one token per unknown run.
+* Latin/digit runs use scikit-learn's default token pattern (lowercased
+  words of 2+ characters), so English features are unchanged.
+
+The trie is array-backed -- per node a slice of sorted edge labels and
+child ids in flat ``array``s, searched with ``bisect`` -- and is built
+once per process from the bundled word list ``thai_words.txt.gz`` (the
+PyThaiNLP ``words_th`` list, CC0, Thai-only entries).  Extra words (brand
+names, product terms) can be added with ``THAI_EXTRA_WORDS`` files.
+
+Usage:
+    from thai_segmenter import segment, word_tokens
+
+    segment("หน้าต่างกันเสียง")        # ['หน้าต่าง', 'กัน', 'เสียง']
+    word_tokens(line)                   # features for similarity / indexing
+"""
+
+import re
+import gzip
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List
+
+WORDS_PATH = Path(__file__).resolve().parent / "thai_words.txt.gz"
+# Optional plain-text lists (one word per line) merged into the dictionary
+THAI_EXTRA_WORDS: List[Path] = []
+
+SEGMENT_CACHE_SIZE = 8192
+
+_THAI_RUN_RE = re.compile(r'[\u0E01-\u0E5B]+')
+# Thai runs, or sklearn's default word pattern restricted to non-Thai characters
+_TOKEN_RE = re.compile(r'[\u0E01-\u0E5B]+|\b[^\W\u0E00-\u0E7F][^\W\u0E00-\u0E7F]+\b')
+_THAI_LETTER_RE = re.compile(r'[\u0E01-\u0E2E]')
+
+# A boundary may not fall before these (they attach to the previous consonant) ...
+_NO_BREAK_BEFORE = frozenset('\u0E30\u0E31\u0E32\u0E33\u0E34\u0E35\u0E36\u0E37\u0E38\u0E39\u0E3A'
+                             '\u0E45\u0E47\u0E48\u0E49\u0E4A\u0E4B\u0E4C\u0E4D\u0E4E')
+# ... or after leading vowels (they precede the consonant they belong to)
+_NO_BREAK_AFTER = frozenset('\u0E40\u0E41\u0E42\u0E43\u0E44')
+
+
+# ==========================================
+# TRIE
+# ==========================================
+class Trie:
+    """Array-backed prefix tree.
+
+    Node ``n``'s children are ``labels[first[n]:first[n] + count[n]]``
+    (sorted code points) with node ids ``child[...]`` at the same offsets;
+    ``terminal[n]`` marks the end of a word.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        words = sorted({w for w in words if w})
+        self.first = array('I', [0])
+        self.count = array('I', [0])
+        self.terminal = bytearray(1)
+        self.labels = array('I')
+        self.child = array('I')
+        self.size = len(words)
+
+        # Breadth-first over (node, [lo, hi) range of the sorted words, depth):
+        # the words under a node share a prefix, so its children are the
+        # distinct characters at ``depth`` within the range, already sorted.
+        queue = [(0, 0, len(words), 0)]
+        for node, lo, hi, depth in queue:
+            if lo < hi and len(words[lo]) == depth:
+                self.terminal[node] = 1
+                lo += 1
+            self.first[node] = len(self.labels)
+            start = lo
+            while start < hi:
+                ch = words[start][depth]
+                end = start + 1
+                while end < hi and words[end][depth] == ch:
+                    end += 1
+                new = len(self.terminal)
+                self.first.append(0)
+                self.count.append(0)
+                self.terminal.append(0)
+                self.labels.append(ord(ch))
+                self.child.append(new)
+                queue.append((new, start, end, depth + 1))
+                start = end
+            self.count[node] = len(self.labels) - self.first[node]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def prefix_ends(self, text: str, start: int) -> List[int]:
+        """End offsets of every dictionary word that starts at ``text[start]``."""
+        labels, child, first, count, terminal = self.labels, self.child, self.first, self.count, self.terminal
+        ends = []
+        node = 0
+        for pos in range(start, len(text)):
+            lo = first[node]
+            hi = lo + count[node]
+            c = ord(text[pos])
+            i = bisect_left(labels, c, lo, hi)
+            if i == hi or labels[i] != c:
+                break
+            node = child[i]
+            if terminal[node]:
+                ends.append(pos + 1)
+        return ends
+
+
+def _read_words(path: Path) -> List[str]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+@lru_cache(maxsize=1)
+def get_trie() -> Trie:
+    """The dictionary trie, built on first use and kept for the process."""
+    words = _read_words(WORDS_PATH)
+    for extra in THAI_EXTRA_WORDS:
+        words += _read_words(Path(extra))
+    return Trie(words)
+
+
+# ==========================================
+# SEGMENTATION
+# ==========================================
+def _can_break(text: str, pos: int) -> bool:
+    return (pos == len(text)
+            or (text[pos] not in _NO_BREAK_BEFORE and text[pos - 1] not in _NO_BREAK_AFTER))
+
+
+def is_boundary(text: str, pos: int) -> bool:
+    """Whether a Thai word may start or end at ``pos`` in ``text``."""
+    return pos == 0 or _can_break(text, pos)
+
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def _segment_run(run: str) -> tuple:
+    """Maximal matching over one run of Thai characters."""
+    trie = get_trie()
+    n = len(run)
+    # best[i] = (unknown chars, words) for run[:i]; back[i] = start of the last token
+    best = [(0, 0)] + [(n + 1, n + 1)] * n
+    back = [0] * (n + 1)
+    known = [False] * (n + 1)
+    for i in range(n):
+        if best[i][0] > n or not _can_break(run, i):
+            continue
+        unknown, words = best[i]
+        for j in trie.prefix_ends(run, i):
+            # ``<=``: on a tie the later split wins, i.e. longer words first
+            if _can_break(run, j) and (unknown, words + 1) <= best[j]:
+                best[j], back[j], known[j] = (unknown, words + 1), i, True
+        # Unknown step: to the next position a token can end at
+        j = i + 1
+        while not _can_break(run, j):
+            j += 1
+        if (unknown + j - i, words + 1) < best[j]:
+            best[j], back[j], known[j] = (unknown + j - i, words + 1), i, False
+
+    tokens, unknown_end = [], None
+    j = n
+    while j > 0:
+        i = back[j]
+        if known[j]:
+            tokens.append(run[i:j])
+            unknown_end = None
+        elif unknown_end is None:
+            tokens.append(run[i:j])
+            unknown_end = j
+        else:
+            # Consecutive unknown steps become one token
+            tokens[-1] = run[i:unknown_end]
+        j = i
+    return tuple(reversed(tokens))
+
+
+def segment(text: str) -> List[str]:
+    """Thai words in ``text``, in order (non-Thai text is skipped)."""
+    words = []
+    for m in _THAI_RUN_RE.finditer(text):
+        words.extend(_segment_run(m.group()))
+    return words
+
+
+def word_tokens(text: str) -> List[str]:
+    """Word features for similarity/indexing: Thai words plus lowercased latin words."""
+    tokens = []
+    for m in _TOKEN_RE.finditer(text.lower()):
+        token = m.group()
+        if _THAI_RUN_RE.match(token):
+            # Keep words; drop bare punctuation such as ๆ / ฯ
+            tokens.extend(w for w in _segment_run(token) if _THAI_LETTER_RE.search(w))
+        else:
+            tokens.append(token)
+    return tokens
@@ -4,6 +4,7 @@ import json
 import os
 import argparse
 import logging
+import re
 import time
 from datetime import datetime
 from pathlib import Path
@@ -11,6 +12,15 @@ from aiohttp import ClientSession, ClientTimeout
 from typing import List, Dict, Optional, Any
 
 from config_loader import get_openrouter_config, get_model_config, load_prompt
+from dep_tracker import DepTracker
+from job_store import JobStore
+from token_budget import count_tokens
+from cost_estimator import CostEstimator
+from request_router import RequestRouter
+from offload import LoopLagMonitor, run_cpu, run_io, shutdown
+from serp_schema import (REQUIRED_SECTIONS, VALID_PREDICATES, MAX_KG_NODES, MAX_KG_EDGES, MAX_ENTITIES,
+                         MAX_OPPORTUNITY_GAPS, MAX_TITLE_PATTERNS, analysis_paths, decode_analysis,
+                         find_analysis, response_format, save_analysis, yaml_load)
 
 # --- Configuration (loaded from config.yaml) ---
 _or_cfg = get_openrouter_config()
@@ -26,12 +36,20 @@ MAX_TOKENS = _model_cfg.get("max_tokens", 8000)
 TIMEOUT_SECONDS = _model_cfg.get("timeout", 90)
 CHUNK_SIZE = _model_cfg.get("chunk_size", 500)
 QUALITY_THRESHOLD = _model_cfg.get("quality_threshold", 0.7)
+# Ask for JSON matching serp_schema (response_format) instead of free-form YAML
+STRUCTURED_OUTPUT = _model_cfg.get("structured_output", True)
+# Multi-keyword packing: >0 groups keywords into one request up to this many user-prompt tokens
+PACK_TOKENS = _model_cfg.get("pack_tokens", 0)
+PACK_MAX_KEYWORDS = _model_cfg.get("pack_max_keywords", 4)
+# Also write the human-readable <kw>-serp-analysis.yaml next to the JSON artifact
+YAML_SIDECAR = _model_cfg.get("yaml_sidecar", True)
 X_TITLE = _model_cfg.get("x_title", "Privato Content SERP Analyzer")
 
 OUTPUT_DIR = "output/research"
 KEYWORDS_FILE = "data/keywords/keywords.txt"
 CHECKPOINT_DIR = "checkpoints"
-CHECKPOINT_FILE = "title_analysis_checkpoint.json"
+CHECKPOINT_FILE = "title_analysis_checkpoint.json"   # legacy JSON checkpoint, imported into the job store
+STAGE = "title_analysis"
 LOG_DIR = "logs"
 LOG_FILE = "llm_analysis.log"
 
@@ -39,17 +57,28 @@ LOG_FILE = "llm_analysis.log"
 RATE_LIMIT_RPM = _model_cfg.get("rate_limit_rpm", 60)
 RATE_LIMIT_TPM = 60000
 
-# Predicate types for Knowledge Graph (TITLE-FOCUSED LEAN)
-VALID_PREDICATES = [
-    "is_a", "aka", "related_to", "has_attribute", "has_quantity",
-    "has_duration", "has_cost", "has_benefit", "has_risk", "requires",
-    "time_to_result", "compared_with", "alternative_to", "suitable_for",
-    "defined_as", "available_at"
-]
-
 # --- System & User Prompts (loaded from PROMPTS/) ---
 SYSTEM_PROMPT = load_prompt("title_analysis_system.md")
 USER_PROMPT_TEMPLATE = load_prompt("title_analysis_user.md")
+# Appended to the user prompt in structured-output mode (the prompts describe YAML)
+JSON_OUTPUT_INSTRUCTION = (
+    "\n\nOUTPUT FORMAT OVERRIDE: emit the same structure as ONE JSON object "
+    "(same keys, lists as JSON arrays, null for unknowns). No YAML, no code fences."
+)
+# Packed requests: one document per keyword, each after its delimiter line
+PACK_DELIMITER = "=== KEYWORD: {keyword} ==="
+PACK_INSTRUCTION = (
+    "The {count} SERP snapshots below are independent. Analyze EACH one on its own and emit, "
+    "for every keyword in the order given, its delimiter line exactly as written "
+    "(=== KEYWORD: <keyword> ===) followed by one complete {doc_format} per the schema. "
+    "Return nothing else.\n\n"
+)
+PACK_YAML_FORMAT = "YAML document"
+PACK_JSON_FORMAT = "JSON object (same keys, lists as JSON arrays, null for unknowns; no code fences)"
+_PACK_DELIMITER_RE = re.compile(r'^[ \t]*=== KEYWORD: (.+?) ===[ \t]*$', re.MULTILINE)
+# meta.query of a packed document (YAML or JSON), to cross-check its keyword
+_META_QUERY_RE = re.compile(r'(?:^[ \t]*|[{,][ \t]*)"?query"?[ \t]*:[ \t]*("(?:[^"\\\n]|\\.)*"|[^,}\n]*)',
+                            re.MULTILINE)
 
 
 def setup_logging():
@@ -80,24 +109,6 @@ def log_json(logger, event: str, data: Dict[str, Any]):
     logger.info(json.dumps(log_entry, ensure_ascii=False))
 
 
-def load_checkpoint() -> Dict[str, Any]:
-    """Load checkpoint file if exists."""
-    checkpoint_path = Path(CHECKPOINT_DIR) / CHECKPOINT_FILE
-    if checkpoint_path.exists():
-        with open(checkpoint_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"completed": [], "failed": [], "last_index": 0}
-
-
-def save_checkpoint(checkpoint: Dict[str, Any]):
-    """Save checkpoint file."""
-    Path(CHECKPOINT_DIR).mkdir(parents=True, exist_ok=True)
-    checkpoint_path = Path(CHECKPOINT_DIR) / CHECKPOINT_FILE
-    checkpoint["updated_at"] = datetime.now().isoformat()
-    with open(checkpoint_path, 'w', encoding='utf-8') as f:
-        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
-
-
 def load_keywords(keywords_file: str) -> List[str]:
     """Load keywords from file."""
     with open(keywords_file, 'r', encoding='utf-8') as f:
@@ -243,17 +254,63 @@ def format_paa_questions(keywords_data: Dict) -> str:
 
 
 def strip_yaml_fences(content: str) -> str:
-    """Remove markdown code fences from YAML content."""
+    """Remove markdown code fences (```yaml / ```json / ```) from YAML or JSON content."""
     content = content.strip()
-    if content.startswith("```yaml"):
-        content = content[7:]
-    elif content.startswith("```"):
-        content = content[3:]
+    if content.startswith("```"):
+        # Drop the fence line including any language tag
+        newline = content.find("\n")
+        content = content[newline + 1:] if newline != -1 else content[3:]
     if content.endswith("```"):
         content = content[:-3]
     return content.strip()
 
 
+def _pack_key(text: str) -> str:
+    """Keyword identity that ignores whitespace and case ("ประตู หน้าบ้าน" == "ประตูหน้าบ้าน")."""
+    return re.sub(r'\s+', '', text).casefold()
+
+
+def split_packed_response(content: str, keywords: List[str]) -> Dict[str, str]:
+    """Per-keyword documents of a packed response (keywords without one are absent).
+
+    Documents are matched to keywords by delimiter name, exactly and then
+    ignoring whitespace/case; a document whose name matches nothing takes
+    the keyword at its own position only if that keyword is still
+    unclaimed.  A document whose ``meta.query`` names a different keyword
+    is dropped, so a swap is retried individually instead of being saved
+    under the wrong keyword.
+    """
+    matches = list(_PACK_DELIMITER_RE.finditer(content))
+    bodies = [content[m.end():matches[i + 1].start() if i + 1 < len(matches) else len(content)].strip()
+              for i, m in enumerate(matches)]
+    names = [m.group(1).strip().strip('"\'') for m in matches]
+    by_key = {_pack_key(k): k for k in keywords}
+
+    assigned: Dict[int, str] = {}
+    for i, name in enumerate(names):
+        if name in keywords and name not in assigned.values():
+            assigned[i] = name
+    for i, name in enumerate(names):
+        keyword = by_key.get(_pack_key(name))
+        if i not in assigned and keyword and keyword not in assigned.values():
+            assigned[i] = keyword
+    if len(matches) == len(keywords):
+        # Unrecognized names: go by order, but never onto a keyword another document claimed
+        for i in range(len(names)):
+            if i not in assigned and keywords[i] not in assigned.values():
+                assigned[i] = keywords[i]
+
+    docs: Dict[str, str] = {}
+    for i, keyword in assigned.items():
+        query = _META_QUERY_RE.search(bodies[i])
+        query = query.group(1).strip().strip('"\'') if query else ""
+        if query and _pack_key(query) != _pack_key(keyword):
+            continue
+        if bodies[i]:
+            docs[keyword] = bodies[i]
+    return docs
+
+
 def sanitize_yaml_content(content: str) -> str:
     """Sanitize YAML content to handle common LLM output issues.
 
@@ -375,64 +432,42 @@ def sanitize_yaml_content(content: str) -> str:
 def extract_yaml_sections(content: str) -> Optional[Dict]:
     """Extract YAML sections manually as a last resort fallback.
 
-    Parses the content section by section to salvage what we can.
+    Parses the content section by section to salvage what we can.  Section
+    headers are located in one pass over the lines; each section runs to
+    the next header found (in any order) or the end of the content.
     """
-    import re
-
-    required_sections = [
-        "meta", "intent", "ymyl", "lexical_signals", "pattern_signals",
-        "entity_signals", "knowledge_graph", "competitor_matrix",
-        "paa_and_related", "consensus_signals", "opportunity_gaps",
-        "title_generation_signals"
-    ]
+    lines = content.split('\n')
+    headers = {f"{section}:": section for section in REQUIRED_SECTIONS}
+    starts = []
+    for idx, line in enumerate(lines):
+        section = headers.get(line.strip())
+        if section:
+            starts.append((idx, section))
 
     result = {}
-
-    # Try to find each section and extract its content
-    for i, section in enumerate(required_sections):
-        # Pattern to match section start
-        pattern = rf'^{section}:\s*$'
-        lines = content.split('\n')
-
-        section_start = None
-        for idx, line in enumerate(lines):
-            if re.match(pattern, line.strip()):
-                section_start = idx
-                break
-
-        if section_start is not None:
-            # Find next section or end
-            section_end = len(lines)
-            for next_section in required_sections[i + 1:]:
-                for idx in range(section_start + 1, len(lines)):
-                    if re.match(rf'^{next_section}:\s*$', lines[idx].strip()):
-                        section_end = idx
-                        break
-                if section_end != len(lines):
-                    break
-
-            # Extract section content
-            section_lines = lines[section_start + 1:section_end]
-            section_content = '\n'.join([section] + [':'] + section_lines)
-
-            try:
-                parsed = yaml.safe_load(f"{section}:\n" + '\n'.join(section_lines))
-                if parsed and section in parsed:
-                    result[section] = parsed[section]
-            except yaml.YAMLError:
-                # Store raw content as fallback
-                result[section] = {"_raw": '\n'.join(section_lines)}
+    for n, (section_start, section) in enumerate(starts):
+        if section in result:
+            continue
+        section_end = starts[n + 1][0] if n + 1 < len(starts) else len(lines)
+        section_lines = lines[section_start + 1:section_end]
+        try:
+            parsed = yaml_load(f"{section}:\n" + '\n'.join(section_lines))
+            if parsed and section in parsed:
+                result[section] = parsed[section]
+        except yaml.YAMLError:
+            # Store raw content as fallback
+            result[section] = {"_raw": '\n'.join(section_lines)}
 
     return result if result else None
 
 
-def safe_yaml_load(content: str, keyword: str = "", logger=None) -> Optional[Dict]:
+def safe_yaml_load(content: str, keyword: str = "") -> Optional[Dict]:
     """Safely load YAML with multiple fallback strategies."""
     errors = []
 
     # Strategy 1: Direct parse
     try:
-        data = yaml.safe_load(content)
+        data = yaml_load(content)
         if isinstance(data, dict):
             return data
     except yaml.YAMLError as e:
@@ -441,19 +476,17 @@ def safe_yaml_load(content: str, keyword: str = "", logger=None) -> Optional[Dic
     # Strategy 2: Sanitize and retry
     try:
         sanitized = sanitize_yaml_content(content)
-        data = yaml.safe_load(sanitized)
+        data = yaml_load(sanitized)
         if isinstance(data, dict):
             return data
     except yaml.YAMLError as e:
         errors.append(f"Sanitized parse: {str(e)[:100]}")
 
     # Strategy 3: Try JSON (LLM might output JSON instead)
-    try:
-        data = json.loads(content)
-        if isinstance(data, dict):
-            return data
-    except json.JSONDecodeError as e:
-        errors.append(f"JSON parse: {str(e)[:100]}")
+    data = decode_analysis(content)
+    if data is not None:
+        return data
+    errors.append("JSON parse: not a JSON object")
 
     # Strategy 4: Section-by-section extraction
     try:
@@ -482,17 +515,10 @@ def safe_yaml_load(content: str, keyword: str = "", logger=None) -> Optional[Dic
 
 def validate_yaml_schema(data: Dict) -> tuple[bool, List[str]]:
     """Validate YAML against expected schema."""
-    required_sections = [
-        "meta", "intent", "ymyl", "lexical_signals", "pattern_signals",
-        "entity_signals", "knowledge_graph", "competitor_matrix",
-        "paa_and_related", "consensus_signals", "opportunity_gaps",
-        "title_generation_signals"
-    ]
-
     errors = []
 
     # Check required sections
-    for section in required_sections:
+    for section in REQUIRED_SECTIONS:
         if section not in data:
             errors.append(f"Missing required section: {section}")
 
@@ -502,10 +528,10 @@ def validate_yaml_schema(data: Dict) -> tuple[bool, List[str]]:
         nodes = kg.get("nodes", [])
         edges = kg.get("edges", [])
 
-        if len(nodes) > 12:
-            errors.append(f"Knowledge graph has {len(nodes)} nodes (max 12)")
-        if len(edges) > 18:
-            errors.append(f"Knowledge graph has {len(edges)} edges (max 18)")
+        if len(nodes) > MAX_KG_NODES:
+            errors.append(f"Knowledge graph has {len(nodes)} nodes (max {MAX_KG_NODES})")
+        if len(edges) > MAX_KG_EDGES:
+            errors.append(f"Knowledge graph has {len(edges)} edges (max {MAX_KG_EDGES})")
 
         # Validate predicate values
         for edge in edges:
@@ -518,24 +544,24 @@ def validate_yaml_schema(data: Dict) -> tuple[bool, List[str]]:
         entities = data["entity_signals"]
         if isinstance(entities, dict):
             entity_list = entities.get("entities", [])
-            if isinstance(entity_list, list) and len(entity_list) > 8:
-                errors.append(f"Entity signals has {len(entity_list)} entities (max 8)")
-        elif isinstance(entities, list) and len(entities) > 8:
-            errors.append(f"Entity signals has {len(entities)} entities (max 8)")
+            if isinstance(entity_list, list) and len(entity_list) > MAX_ENTITIES:
+                errors.append(f"Entity signals has {len(entity_list)} entities (max {MAX_ENTITIES})")
+        elif isinstance(entities, list) and len(entities) > MAX_ENTITIES:
+            errors.append(f"Entity signals has {len(entities)} entities (max {MAX_ENTITIES})")
 
     # Validate opportunity_gaps constraint (max 3)
     if "opportunity_gaps" in data:
         gaps = data["opportunity_gaps"]
-        if isinstance(gaps, list) and len(gaps) > 3:
-            errors.append(f"Opportunity gaps has {len(gaps)} entries (max 3)")
+        if isinstance(gaps, list) and len(gaps) > MAX_OPPORTUNITY_GAPS:
+            errors.append(f"Opportunity gaps has {len(gaps)} entries (max {MAX_OPPORTUNITY_GAPS})")
 
     # Validate dominant_title_patterns constraint (max 2)
     if "pattern_signals" in data:
         ps = data["pattern_signals"]
         if isinstance(ps, dict):
             patterns = ps.get("dominant_title_patterns", [])
-            if isinstance(patterns, list) and len(patterns) > 2:
-                errors.append(f"Dominant title patterns has {len(patterns)} entries (max 2)")
+            if isinstance(patterns, list) and len(patterns) > MAX_TITLE_PATTERNS:
+                errors.append(f"Dominant title patterns has {len(patterns)} entries (max {MAX_TITLE_PATTERNS})")
 
     return len(errors) == 0, errors
 
@@ -545,14 +571,7 @@ def calculate_quality_score(data: Dict) -> float:
     score = 0.0
     max_score = 12.0  # One point per section
 
-    required_sections = [
-        "meta", "intent", "ymyl", "lexical_signals", "pattern_signals",
-        "entity_signals", "knowledge_graph", "competitor_matrix",
-        "paa_and_related", "consensus_signals", "opportunity_gaps",
-        "title_generation_signals"
-    ]
-
-    for section in required_sections:
+    for section in REQUIRED_SECTIONS:
         if section in data and data[section]:
             score += 1.0
 
@@ -581,6 +600,30 @@ def calculate_quality_score(data: Dict) -> float:
     return min(score / (max_score + 1.5), 1.0)
 
 
+def parse_analysis(content: str, structured: bool, keyword: str = "") -> Dict[str, Any]:
+    """Parse + validate + score one response (CPU-bound, runs in the process pool).
+
+    Returns {"data", "json_fallback", "errors", "quality_score"}; data is
+    None when every parsing strategy failed.
+    """
+    yaml_content = strip_yaml_fences(content)
+    data = None
+    json_fallback = False
+    if structured:
+        data = decode_analysis(yaml_content)
+        json_fallback = data is None
+    if data is None:
+        data = safe_yaml_load(yaml_content, keyword=keyword)
+    if data is None:
+        return {"data": None, "json_fallback": json_fallback, "errors": [], "quality_score": 0.0}
+
+    is_valid, errors = validate_yaml_schema(data)
+    quality_score = calculate_quality_score(data)
+    data["quality_score"] = quality_score
+    return {"data": data, "json_fallback": json_fallback, "errors": [] if is_valid else errors,
+            "quality_score": quality_score}
+
+
 class RateLimiter:
     """Simple rate limiter for API calls."""
 
@@ -607,31 +650,90 @@ class SERPAnalyzer:
         self.semaphore = asyncio.Semaphore(args.max_concurrency)
         self.rate_limiter = RateLimiter(RATE_LIMIT_RPM)
         self.logger = setup_logging()
-        self.checkpoint = load_checkpoint()
+        self.router = RequestRouter(_model_cfg, self.rate_limiter,
+                                    lambda event, data: log_json(self.logger, event, data))
+        self.jobs = JobStore()
+        self.jobs.import_checkpoint(STAGE, Path(CHECKPOINT_DIR) / CHECKPOINT_FILE)
+        self.deps = DepTracker(STAGE, config=["title_analysis"],
+                               prompts=["title_analysis_system.md", "title_analysis_user.md"])
+        self.estimator = CostEstimator(args.max_concurrency, RATE_LIMIT_RPM) if args.dry_run else None
         self.stats = {
             "total": 0,
             "success": 0,
             "failed": 0,
             "skipped": 0,
-            "total_tokens": 0
+            "total_tokens": 0,
+            "requests": 0,
+            "packed_requests": 0,
+            "packed_keywords": 0
         }
 
+    def _user_prompt(self, keyword: str, serp_data: Dict) -> str:
+        """Per-keyword user prompt (SERP payload formatted into the template)."""
+        return USER_PROMPT_TEMPLATE.format(
+            keyword=keyword,
+            competitors_data=format_competitors_data(serp_data.get("competitions", {})),
+            related_keywords=format_related_keywords(serp_data.get("keywords", {})),
+            paa_questions=format_paa_questions(serp_data.get("keywords", {}))
+        )
+
+    def _messages(self, keyword: str, serp_data: Dict) -> List[Dict[str, str]]:
+        user_prompt = self._user_prompt(keyword, serp_data)
+        if self.args.structured_output:
+            user_prompt += JSON_OUTPUT_INSTRUCTION
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _pack_messages(self, pack: List[Dict]) -> List[Dict[str, str]]:
+        doc_format = PACK_JSON_FORMAT if self.args.structured_output else PACK_YAML_FORMAT
+        user_prompt = PACK_INSTRUCTION.format(count=len(pack), doc_format=doc_format) + "\n\n".join(
+            f"{PACK_DELIMITER.format(keyword=item['keyword'])}\n{item['prompt']}" for item in pack)
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _estimate(self, messages: List[Dict[str, str]], keywords: int = 1) -> Dict[str, Any]:
+        """Dry run: cost/latency of one request from its rendered messages."""
+        prompts = [m["content"] for m in messages]
+        if self.args.structured_output and keywords == 1:
+            prompts.append(json.dumps(response_format(), ensure_ascii=False))
+        req = self.estimator.request(STAGE, MODEL, prompts, self.args.max_tokens * keywords, keywords)
+        self.estimator.add_job([req])
+        return req
+
     async def call_openrouter(self, session: ClientSession, keyword: str,
                                serp_data: Dict, retry_count: int = 3) -> Optional[Dict]:
         """Call OpenRouter API with retry logic."""
+        payload = {
+            "model": MODEL,
+            "messages": self._messages(keyword, serp_data),
+            "temperature": self.args.temperature,
+            "max_tokens": self.args.max_tokens
+        }
+        if self.args.structured_output:
+            payload["response_format"] = response_format()
 
-        # Format prompt data
-        competitors_text = format_competitors_data(serp_data.get("competitions", {}))
-        related_text = format_related_keywords(serp_data.get("keywords", {}))
-        paa_text = format_paa_questions(serp_data.get("keywords", {}))
+        return await self._post(session, payload, keyword, retry_count)
 
-        user_prompt = USER_PROMPT_TEMPLATE.format(
-            keyword=keyword,
-            competitors_data=competitors_text,
-            related_keywords=related_text,
-            paa_questions=paa_text
-        )
+    async def call_openrouter_pack(self, session: ClientSession, pack: List[Dict],
+                                   retry_count: int = 3) -> Optional[Dict]:
+        """One request for several keywords: one delimited document per keyword."""
+        payload = {
+            "model": MODEL,
+            "messages": self._pack_messages(pack),
+            "temperature": self.args.temperature,
+            # --max-tokens is per keyword
+            "max_tokens": self.args.max_tokens * len(pack)
+        }
+
+        label = "+".join(item["keyword"] for item in pack)
+        return await self._post(session, payload, label, retry_count, keywords=len(pack))
 
+    async def _post(self, session: ClientSession, payload: Dict, keyword: str,
+                    retry_count: int = 3, keywords: int = 1) -> Optional[Dict]:
         headers = {
             "Authorization": f"Bearer {OPENROUTER_API_KEY}",
             "Content-Type": "application/json",
@@ -639,51 +741,50 @@ class SERPAnalyzer:
             "X-Title": X_TITLE
         }
 
-        payload = {
-            "model": MODEL,
-            "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": self.args.temperature,
-            "max_tokens": self.args.max_tokens
-        }
-
+        failures = 0                # errors and timeouts; 429 retries are not failures
         for attempt in range(retry_count):
             try:
                 await self.rate_limiter.acquire()
 
-                async with session.post(
-                    OPENROUTER_API_URL,
-                    headers=headers,
-                    json=payload,
-                    timeout=ClientTimeout(total=self.args.timeout)
-                ) as resp:
-                    if resp.status == 429:
-                        # Rate limited - exponential backoff
-                        wait_time = (2 ** attempt) * 5
-                        log_json(self.logger, "rate_limited", {
-                            "keyword": keyword,
-                            "attempt": attempt + 1,
-                            "wait_seconds": wait_time
-                        })
-                        await asyncio.sleep(wait_time)
-                        continue
-
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        raise Exception(f"API error {resp.status}: {error_text}")
-
-                    result = await resp.json()
-
-                    # Track token usage
-                    usage = result.get("usage", {})
-                    self.stats["total_tokens"] += usage.get("total_tokens", 0)
-
-                    content = result["choices"][0]["message"]["content"]
-                    return {"content": content, "usage": usage}
+                started = time.perf_counter()
+                reply = await self.router.post(session, OPENROUTER_API_URL, headers, payload,
+                                                ClientTimeout(total=self.args.timeout),
+                                                failures=failures, label=keyword)
+                if reply["status"] == 429:
+                    # Rate limited - exponential backoff
+                    wait_time = (2 ** attempt) * 5
+                    log_json(self.logger, "rate_limited", {
+                        "keyword": keyword,
+                        "attempt": attempt + 1,
+                        "wait_seconds": wait_time
+                    })
+                    await asyncio.sleep(wait_time)
+                    continue
+
+                if reply["status"] != 200:
+                    raise Exception(f"API error {reply['status']}: {reply['text']}")
+
+                result = reply["data"]
+
+                # Track token usage
+                usage = result.get("usage", {})
+                self.stats["total_tokens"] += usage.get("total_tokens", 0)
+                self.stats["requests"] += 1
+                # Usage history for cost_estimator.py
+                log_json(self.logger, "api_usage", {
+                    "task": STAGE,
+                    "model": reply["model"],
+                    "keywords": keywords,
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                    "latency_s": round(time.perf_counter() - started, 3)
+                })
+
+                content = result["choices"][0]["message"]["content"]
+                return {"content": content, "usage": usage}
 
             except asyncio.TimeoutError:
+                failures += 1
                 log_json(self.logger, "timeout", {
                     "keyword": keyword,
                     "attempt": attempt + 1
@@ -691,6 +792,7 @@ class SERPAnalyzer:
                 if attempt < retry_count - 1:
                     await asyncio.sleep((2 ** attempt) * 2)
             except Exception as e:
+                failures += 1
                 log_json(self.logger, "api_error", {
                     "keyword": keyword,
                     "attempt": attempt + 1,
@@ -701,143 +803,257 @@ class SERPAnalyzer:
 
         return None
 
-    async def analyze_keyword(self, session: ClientSession, keyword: str) -> bool:
-        """Analyze a single keyword."""
+    async def _prepare(self, keyword: str) -> tuple:
+        """Skip checks and input loading: ``(result, None)`` when the keyword is
+        done with (skipped), else ``(None, item)`` for the API step."""
         verbose = getattr(self.args, 'verbose', False)
+        if verbose:
+            print(f"\n[PROCESSING] Keyword: {keyword}")
+
+        # Check if output file already exists on disk (skip unless --force is set)
+        keyword_dir = Path(OUTPUT_DIR) / keyword
+        output_path, _ = analysis_paths(keyword_dir, keyword)
+        # Analyses from before the JSON artifact only have the YAML file
+        existing = find_analysis(keyword_dir, keyword)
+        if verbose:
+            print(f"  [OUTPUT] Target: {output_path.absolute()}")
+
+        input_paths = [keyword_dir / f"{keyword}-competitions.json",
+                       keyword_dir / f"{keyword}-keywords.json"]
+        if self.args.stale_only and not self.args.force:
+            if await run_io(self.deps.skip_if_fresh, existing or output_path, input_paths):
+                print(f"  [SKIP] Up to date: {(existing or output_path).absolute()}")
+                self.stats["skipped"] += 1
+                log_json(self.logger, "skipped", {"keyword": keyword, "reason": "up_to_date"})
+                return True, None
+            print(f"  [STALE] {keyword}: {self.deps.check(existing or output_path, input_paths)}")
+        elif not self.args.force and existing:
+            print(f"  [SKIP] Output already exists: {existing.absolute()}")
+            self.stats["skipped"] += 1
+            log_json(self.logger, "skipped", {"keyword": keyword, "reason": "output_exists"})
+            return True, None
+
+        # Load SERP data with verbose output
+        serp_data = await run_io(load_serp_data, keyword, verbose=verbose)
+        debug = serp_data.get("debug", {})
+
+        if not serp_data["competitions"] and not serp_data["keywords"]:
+            # Print specific reasons for missing data
+            print(f"  [SKIP] No input data found for: {keyword}")
+            print(f"         Keyword dir: {debug.get('keyword_dir', 'N/A')}")
+            print(f"         competitions.json: {debug.get('comp_status', 'N/A')}")
+            print(f"           Path: {debug.get('comp_path', 'N/A')}")
+            print(f"         keywords.json: {debug.get('kw_status', 'N/A')}")
+            print(f"           Path: {debug.get('kw_path', 'N/A')}")
+
+            log_json(self.logger, "skipped", {
+                "keyword": keyword,
+                "reason": "no_serp_data",
+                "debug": debug
+            })
+            self.jobs.skip(STAGE, keyword, "no_serp_data")
+            self.stats["skipped"] += 1
+            return False, None
 
+        return None, {"keyword": keyword, "serp_data": serp_data,
+                      "keyword_dir": keyword_dir, "input_paths": input_paths}
+
+    async def analyze_keyword(self, session: ClientSession, keyword: str) -> bool:
+        """Analyze a single keyword."""
         try:
             async with self.semaphore:
-                if verbose:
-                    print(f"\n[PROCESSING] Keyword: {keyword}")
-
-                # Check if output file already exists on disk (skip unless --force is set)
-                output_path = Path(OUTPUT_DIR) / keyword / f"{keyword}-serp-analysis.yaml"
-                if verbose:
-                    print(f"  [OUTPUT] Target: {output_path.absolute()}")
-
-                if not self.args.force and output_path.exists():
-                    print(f"  [SKIP] Output already exists: {output_path.absolute()}")
-                    self.stats["skipped"] += 1
-                    log_json(self.logger, "skipped", {"keyword": keyword, "reason": "output_exists"})
-                    return True
-
-                # Load SERP data with verbose output
-                serp_data = load_serp_data(keyword, verbose=verbose)
-                debug = serp_data.get("debug", {})
-
-                if not serp_data["competitions"] and not serp_data["keywords"]:
-                    # Print specific reasons for missing data
-                    print(f"  [SKIP] No input data found for: {keyword}")
-                    print(f"         Keyword dir: {debug.get('keyword_dir', 'N/A')}")
-                    print(f"         competitions.json: {debug.get('comp_status', 'N/A')}")
-                    print(f"           Path: {debug.get('comp_path', 'N/A')}")
-                    print(f"         keywords.json: {debug.get('kw_status', 'N/A')}")
-                    print(f"           Path: {debug.get('kw_path', 'N/A')}")
-
-                    log_json(self.logger, "skipped", {
-                        "keyword": keyword,
-                        "reason": "no_serp_data",
-                        "debug": debug
-                    })
-                    self.stats["skipped"] += 1
-                    return False
+                done, item = await self._prepare(keyword)
+            if done is not None:
+                return done
 
-            # Dry run mode - just estimate
+            # Dry run mode - estimate from the rendered prompt
             if self.args.dry_run:
+                req = self._estimate(self._messages(keyword, item["serp_data"]))
                 log_json(self.logger, "dry_run", {
                     "keyword": keyword,
-                    "estimated_tokens": 5000  # Rough estimate
+                    "prompt_tokens": req["input_tokens"],
+                    "est_output_tokens": req["output_tokens"],
+                    "est_cost": req["cost"]
                 })
                 return True
 
-            # Call API
-            result = await self.call_openrouter(session, keyword, serp_data)
-            if not result:
-                self.checkpoint["failed"].append(keyword)
-                self.stats["failed"] += 1
-                return False
+            return await self._analyze_item(session, item)
 
-            # Parse and validate YAML
-            try:
-                yaml_content = strip_yaml_fences(result["content"])
-                analysis_data = safe_yaml_load(yaml_content, keyword=keyword, logger=self.logger)
+        except Exception as e:
+            # Top-level catch-all to ensure the function never raises
+            log_json(self.logger, "fatal_error", {
+                "keyword": keyword,
+                "error": str(e)[:200],
+                "type": type(e).__name__
+            })
+            if self.jobs.status(STAGE, keyword) != "failed":
+                self.jobs.fail(STAGE, keyword, f"{type(e).__name__}: {e}")
+                self.stats["failed"] += 1
+            return False
 
-                if analysis_data is None:
-                    log_json(self.logger, "yaml_parse_error", {
-                        "keyword": keyword,
-                        "error": "All parsing strategies failed - raw response saved for debugging"
-                    })
-                    self.checkpoint["failed"].append(keyword)
-                    self.stats["failed"] += 1
-                    # Continue to next keyword instead of raising exception
-                    return False
-
-                # Validate schema
-                is_valid, errors = validate_yaml_schema(analysis_data)
-                if not is_valid:
-                    log_json(self.logger, "validation_errors", {
-                        "keyword": keyword,
-                        "errors": errors
-                    })
-                    # Continue with partial data instead of failing
+    async def _analyze_item(self, session: ClientSession, item: Dict) -> bool:
+        """API call + parse/save for one prepared keyword."""
+        keyword = item["keyword"]
+        self.jobs.start(STAGE, keyword)
+        result = await self.call_openrouter(session, keyword, item["serp_data"])
+        if not result:
+            self.jobs.fail(STAGE, keyword, "API call failed")
+            self.stats["failed"] += 1
+            return False
+        return await self._save_analysis(item, result["content"], result["usage"].get("total_tokens", 0))
 
-                # Calculate quality score
-                quality_score = calculate_quality_score(analysis_data)
-                analysis_data["quality_score"] = quality_score
+    async def _save_analysis(self, item: Dict, content: str, tokens: int, final: bool = True) -> bool:
+        """Parse, validate and save one analysis document.
 
-                # Quality gate check - warn but don't fail for low quality
-                if quality_score < QUALITY_THRESHOLD:
-                    log_json(self.logger, "quality_warning", {
-                        "keyword": keyword,
-                        "quality_score": quality_score,
-                        "threshold": QUALITY_THRESHOLD,
-                        "action": "saving_anyway"
-                    })
+        With ``final=False`` (a section of a packed response) a parse failure
+        is only logged, so the caller can retry the keyword on its own.
+        """
+        keyword = item["keyword"]
 
-                # Save output regardless of quality (user can filter later)
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    yaml.dump(analysis_data, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+        def failed(error: str) -> bool:
+            if final:
+                self.jobs.fail(STAGE, keyword, error)
+                self.stats["failed"] += 1
+            return False
 
-                self.checkpoint["completed"].append(keyword)
-                self.stats["success"] += 1
+        # Parse and validate YAML (off the event loop)
+        try:
+            parsed = await run_cpu(parse_analysis, content, self.args.structured_output, keyword)
+            analysis_data = parsed["data"]
+            if parsed["json_fallback"]:
+                log_json(self.logger, "json_parse_fallback", {"keyword": keyword})
 
-                log_json(self.logger, "success", {
+            if analysis_data is None:
+                log_json(self.logger, "yaml_parse_error", {
                     "keyword": keyword,
-                    "quality_score": quality_score,
-                    "tokens_used": result["usage"].get("total_tokens", 0)
+                    "error": "All parsing strategies failed - raw response saved for debugging",
+                    "packed": not final
                 })
+                # Continue to next keyword instead of raising exception
+                return failed("All parsing strategies failed")
 
-                return True
-
-            except yaml.YAMLError as e:
-                log_json(self.logger, "yaml_parse_error", {
+            # Validate schema
+            errors = parsed["errors"]
+            if errors:
+                log_json(self.logger, "validation_errors", {
                     "keyword": keyword,
-                    "error": str(e)[:200]
+                    "errors": errors
                 })
-                self.checkpoint["failed"].append(keyword)
-                self.stats["failed"] += 1
-                return False
-            except Exception as e:
-                log_json(self.logger, "processing_error", {
+                # A packed section missing most sections was likely cut off: retry alone
+                missing = sum(1 for e in errors if e.startswith("Missing required section"))
+                if not final and missing > len(REQUIRED_SECTIONS) // 2:
+                    return failed(f"{missing} sections missing")
+                # Continue with partial data instead of failing
+
+            quality_score = parsed["quality_score"]
+
+            # Quality gate check - warn but don't fail for low quality
+            if quality_score < QUALITY_THRESHOLD:
+                log_json(self.logger, "quality_warning", {
                     "keyword": keyword,
-                    "error": str(e)[:200]
+                    "quality_score": quality_score,
+                    "threshold": QUALITY_THRESHOLD,
+                    "action": "saving_anyway"
                 })
-                self.checkpoint["failed"].append(keyword)
-                self.stats["failed"] += 1
-                return False
 
+            # Save output regardless of quality (user can filter later)
+            output_path = await run_io(save_analysis, analysis_data, item["keyword_dir"], keyword,
+                                       sidecar=self.args.yaml_sidecar)
+            await run_io(self.deps.record, output_path, item["input_paths"])
+
+            self.jobs.finish(STAGE, keyword, tokens=tokens)
+            self.stats["success"] += 1
+
+            log_json(self.logger, "success", {
+                "keyword": keyword,
+                "quality_score": quality_score,
+                "tokens_used": tokens,
+                "packed": not final
+            })
+
+            return True
+
+        except yaml.YAMLError as e:
+            log_json(self.logger, "yaml_parse_error", {
+                "keyword": keyword,
+                "error": str(e)[:200]
+            })
+            return failed(f"{type(e).__name__}: {e}")
         except Exception as e:
-            # Top-level catch-all to ensure the function never raises
-            log_json(self.logger, "fatal_error", {
+            log_json(self.logger, "processing_error", {
                 "keyword": keyword,
-                "error": str(e)[:200],
-                "type": type(e).__name__
+                "error": str(e)[:200]
             })
-            if keyword not in self.checkpoint["failed"]:
-                self.checkpoint["failed"].append(keyword)
-                self.stats["failed"] += 1
-            return False
+            return failed(f"{type(e).__name__}: {e}")
+
+    # ==========================================
+    # MULTI-KEYWORD PACKING
+    # ==========================================
+    async def _build_packs(self, keywords: List[str]) -> List[List[Dict]]:
+        """Prepare ``keywords`` and group them, in order, into packs whose user
+        prompts total at most --pack-tokens (and --pack-max-keywords each)."""
+        packs: List[List[Dict]] = []
+        current: List[Dict] = []
+        current_tokens = 0
+        for keyword in keywords:
+            done, item = await self._prepare(keyword)
+            if done is not None:
+                continue
+            item["prompt"] = self._user_prompt(keyword, item["serp_data"])
+            item["tokens"] = count_tokens(item["prompt"], MODEL)
+            if current and (current_tokens + item["tokens"] > self.args.pack_tokens
+                            or len(current) >= self.args.pack_max_keywords):
+                packs.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += item["tokens"]
+        if current:
+            packs.append(current)
+        return packs
+
+    async def analyze_pack(self, session: ClientSession, pack: List[Dict]) -> bool:
+        """Analyze a pack in one request; keywords whose section is missing
+        or unusable are retried individually."""
+        keywords = [item["keyword"] for item in pack]
+        if self.args.dry_run:
+            messages = (self._messages(keywords[0], pack[0]["serp_data"]) if len(pack) == 1
+                        else self._pack_messages(pack))
+            req = self._estimate(messages, len(pack))
+            log_json(self.logger, "dry_run_pack", {
+                "keywords": keywords,
+                "prompt_tokens": req["input_tokens"],
+                "est_output_tokens": req["output_tokens"],
+                "est_cost": req["cost"]
+            })
+            return True
+        if len(pack) == 1:
+            return await self._analyze_item(session, pack[0])
+
+        for keyword in keywords:
+            self.jobs.start(STAGE, keyword)
+        result = await self.call_openrouter_pack(session, pack)
+
+        retry = list(pack)
+        if result:
+            docs = split_packed_response(result["content"], keywords)
+            tokens = result["usage"].get("total_tokens", 0) // len(pack)
+            self.stats["packed_requests"] += 1
+            saved = await asyncio.gather(*(self._save_analysis(item, docs[item["keyword"]], tokens, final=False)
+                                           for item in pack if item["keyword"] in docs))
+            saved_ok = iter(saved)
+            retry = [item for item in pack
+                     if item["keyword"] not in docs or not next(saved_ok)]
+            self.stats["packed_keywords"] += len(pack) - len(retry)
+        log_json(self.logger, "pack_done", {
+            "keywords": keywords,
+            "api_ok": bool(result),
+            "retry": [item["keyword"] for item in retry]
+        })
+
+        for item in retry:
+            print(f"  [RETRY] {item['keyword']}: no usable section in packed response, analyzing alone")
+        results = await asyncio.gather(*(self._analyze_item(session, item) for item in retry))
+        return all(results)
 
     async def run(self):
         """Run the analysis pipeline."""
@@ -859,9 +1075,11 @@ class SERPAnalyzer:
 
         self.stats["total"] = len(keywords)
 
-        # Reset checkpoint if --force is set
+        if not self.args.dry_run:
+            self.jobs.add_pending(STAGE, keywords)
+
+        # --force: job states are overwritten as keywords are rerun
         if self.args.force:
-            self.checkpoint = {"completed": [], "failed": [], "last_index": 0}
             print("Force mode: ignoring checkpoint and overwriting existing outputs")
             log_json(self.logger, "force_mode", {"action": "checkpoint_reset"})
 
@@ -884,7 +1102,8 @@ class SERPAnalyzer:
         })
 
         timeout = ClientTimeout(total=self.args.timeout)
-        async with ClientSession(timeout=timeout) as session:
+        lag = LoopLagMonitor(lambda event, data: log_json(self.logger, event, data))
+        async with lag, ClientSession(timeout=timeout) as session:
             # Process in chunks for checkpointing
             for chunk_start in range(0, len(keywords), self.args.chunk_size):
                 chunk_end = min(chunk_start + self.args.chunk_size, len(keywords))
@@ -897,24 +1116,31 @@ class SERPAnalyzer:
                 })
 
                 # Process chunk concurrently - return_exceptions prevents one failure from stopping others
-                tasks = [self.analyze_keyword(session, kw) for kw in chunk]
+                if self.args.pack_tokens:
+                    packs = await self._build_packs(chunk)
+                    units = [[item["keyword"] for item in pack] for pack in packs]
+                    tasks = [self.analyze_pack(session, pack) for pack in packs]
+                    if packs:
+                        n = sum(map(len, units))
+                        print(f"  [PACK] {n} keywords in {len(packs)} requests "
+                              f"(~{(n - len(packs)) * count_tokens(SYSTEM_PROMPT, MODEL):,} system-prompt tokens saved)")
+                else:
+                    units = [[kw] for kw in chunk]
+                    tasks = [self.analyze_keyword(session, kw) for kw in chunk]
                 results = await asyncio.gather(*tasks, return_exceptions=True)
 
                 # Log any unexpected exceptions
-                for kw, result in zip(chunk, results):
+                for unit, result in zip(units, results):
                     if isinstance(result, Exception):
-                        log_json(self.logger, "unexpected_error", {
-                            "keyword": kw,
-                            "error": str(result)[:200],
-                            "type": type(result).__name__
-                        })
-                        if kw not in self.checkpoint["failed"]:
-                            self.checkpoint["failed"].append(kw)
-                            self.stats["failed"] += 1
-
-                # Save checkpoint after each chunk
-                self.checkpoint["last_index"] = chunk_end
-                save_checkpoint(self.checkpoint)
+                        for kw in unit:
+                            log_json(self.logger, "unexpected_error", {
+                                "keyword": kw,
+                                "error": str(result)[:200],
+                                "type": type(result).__name__
+                            })
+                            if self.jobs.status(STAGE, kw) not in ("done", "failed"):
+                                self.jobs.fail(STAGE, kw, f"{type(result).__name__}: {result}")
+                                self.stats["failed"] += 1
 
                 log_json(self.logger, "chunk_completed", {
                     "chunk_end": chunk_end,
@@ -924,6 +1150,9 @@ class SERPAnalyzer:
                 })
 
         # Final summary
+        log_json(self.logger, "loop_lag_summary", lag.summary())
+        routing = self.router.summary()
+        log_json(self.logger, "routing_summary", routing)
         log_json(self.logger, "completed", {
             "total": self.stats["total"],
             "success": self.stats["success"],
@@ -940,6 +1169,17 @@ class SERPAnalyzer:
         print(f"Failed: {self.stats['failed']}")
         print(f"Skipped: {self.stats['skipped']}")
         print(f"Total tokens used: {self.stats['total_tokens']}")
+        print(f"API requests: {self.stats['requests']}")
+        if self.args.pack_tokens:
+            print(f"Packed requests: {self.stats['packed_requests']} "
+                  f"({self.stats['packed_keywords']} keywords saved from packed responses)")
+        print(f"Event loop: {lag.report()}")
+        if routing["hedged"] or routing["fallbacks"]:
+            print(f"Hedged requests: {routing['hedged']} of {routing['requests']} "
+                  f"({routing['hedge_wins']} won by the hedge, ~{routing['hedge_overhead_prompt_tokens']:,} overhead prompt tokens)")
+            print(f"Fallback-model requests: {routing['fallbacks']}")
+        if self.estimator:
+            log_json(self.logger, "cost_estimate", self.estimator.print_report("Phase 2.1: SERP Analysis"))
 
 
 def parse_args():
@@ -1007,6 +1247,37 @@ def parse_args():
         action="store_true",
         help="Ignore checkpoint file and overwrite existing outputs"
     )
+    parser.add_argument(
+        "--no-structured-output",
+        dest="structured_output",
+        action="store_false",
+        default=STRUCTURED_OUTPUT,
+        help="Request free-form YAML instead of schema-constrained JSON (config: structured_output)"
+    )
+    parser.add_argument(
+        "--no-yaml-sidecar",
+        dest="yaml_sidecar",
+        action="store_false",
+        default=YAML_SIDECAR,
+        help="Only write the JSON artifact, not the human-readable -serp-analysis.yaml (config: yaml_sidecar)"
+    )
+    parser.add_argument(
+        "--pack-tokens",
+        type=int,
+        default=PACK_TOKENS,
+        help=f"Pack several keywords into one request up to this many user-prompt tokens; 0 = off (default: {PACK_TOKENS})"
+    )
+    parser.add_argument(
+        "--pack-max-keywords",
+        type=int,
+        default=PACK_MAX_KEYWORDS,
+        help=f"Keywords per packed request at most; --max-tokens applies per keyword (default: {PACK_MAX_KEYWORDS})"
+    )
+    parser.add_argument(
+        "--stale-only",
+        action="store_true",
+        help="Only (re)run keywords whose analysis is missing or older than its inputs/prompts/config/code"
+    )
     parser.add_argument(
         "--verbose", "-v",
         action="store_true",
@@ -1031,4 +1302,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown()
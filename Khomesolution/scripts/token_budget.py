@@ -0,0 +1,244 @@
+"""
+Shared token accounting for Khomesolution scripts.
+
+* ``count_tokens(text, model)`` -- one tiktoken encoder per model family,
+  created once, and an LRU of counts keyed by a content hash so the same
+  document is never encoded twice.
+* ``truncate_to_tokens(text, max_tokens, model)`` -- cuts to a token budget
+  on paragraph, then line, then sentence boundaries; only falls back to a
+  hard token cut when a single sentence is larger than the budget.
+* ``fit_to_budget(text, max_tokens, model, stage)`` -- truncate plus a
+  utilization record (tokens before/after, budget, % used) for the caller
+  to log.
+
+Without tiktoken (or when its BPE files cannot be loaded) counts fall back
+to an estimate that treats Thai separately: a Thai character is close to
+one token, not a quarter of one, so ``len(text) // 4`` undercounts Thai
+prompts several-fold.
+
+Stage budgets (config.yaml, ``models.<stage>.token_budgets``) that replaced
+character cuts were sized at ~1.27 Thai characters per token (o200k_base on
+article text), so the old context size is kept: 15000 chars -> 12000
+tokens, 2000 chars -> 1600 tokens.
+
+Usage:
+    from token_budget import count_tokens, fit_to_budget
+
+    n = count_tokens(text, "google/gemini-3-flash-preview")
+    text, usage = fit_to_budget(article_text, 4000, MODEL_NAME, stage="meta_description.article")
+"""
+
+import re
+import hashlib
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+logger = logging.getLogger("token_budget")
+
+DEFAULT_MODEL = "gpt-4"
+COUNT_CACHE_SIZE = 4096
+
+# Model family -> tiktoken encoding.  Non-OpenAI models served through
+# OpenRouter (Gemini, Grok, ...) have no public tokenizer; o200k_base is
+# the closest multilingual proxy.
+_ENCODING_BY_PREFIX = (
+    ("gpt-4o", "o200k_base"),
+    ("gpt-4.1", "o200k_base"),
+    ("o1", "o200k_base"),
+    ("o3", "o200k_base"),
+    ("o4", "o200k_base"),
+    ("gpt-4", "cl100k_base"),
+    ("gpt-3.5", "cl100k_base"),
+)
+_PROXY_ENCODING = "o200k_base"
+
+_THAI_RE = re.compile(r'[\u0E00-\u0E7F]')
+_PARAGRAPH_SPLIT_RE = re.compile(r'(\n\s*\n)')
+# English sentences end in .!?; Thai has no terminator, a space between Thai words marks the break
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+|(?<=[\u0E00-\u0E7F])\s+(?=[\u0E00-\u0E7F])')
+
+
+# ==========================================
+# ENCODERS
+# ==========================================
+def encoding_name_for(model: str) -> str:
+    """tiktoken encoding used for ``model`` (``openai/gpt-4o`` -> o200k_base)."""
+    name = (model or DEFAULT_MODEL).split("/")[-1].lower()
+    for prefix, encoding in _ENCODING_BY_PREFIX:
+        if name.startswith(prefix):
+            return encoding
+    return _PROXY_ENCODING
+
+
+@lru_cache(maxsize=None)
+def get_encoder(encoding_name: str):
+    """Cached tiktoken encoder, or None when tiktoken is unavailable/offline."""
+    if not HAS_TIKTOKEN:
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:  # BPE download failure, unknown encoding ...
+        logger.warning("tiktoken encoding %s unavailable (%s); using estimate", encoding_name, e)
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer-free estimate: ~1 token per Thai character, ~4 chars per token otherwise."""
+    thai = len(_THAI_RE.findall(text))
+    return thai + (len(text) - thai) // 4
+
+
+# ==========================================
+# COUNTING (LRU keyed by content hash)
+# ==========================================
+_count_cache: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    if not text:
+        return 0
+    encoding_name = encoding_name_for(model)
+    key = (encoding_name, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    cached = _count_cache.get(key)
+    if cached is not None:
+        _count_cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+        return cached
+
+    _cache_stats["misses"] += 1
+    enc = get_encoder(encoding_name)
+    n = len(enc.encode(text, disallowed_special=())) if enc is not None else estimate_tokens(text)
+    _count_cache[key] = n
+    if len(_count_cache) > COUNT_CACHE_SIZE:
+        _count_cache.popitem(last=False)
+    return n
+
+
+def cache_info() -> Dict[str, int]:
+    return {**_cache_stats, "size": len(_count_cache)}
+
+
+# ==========================================
+# TRUNCATION
+# ==========================================
+def _split_keep(text: str, level: int) -> List[str]:
+    """Split into units that concatenate back to ``text``.
+
+    level 0: paragraphs (blank-line separated), 1: lines, 2: sentences.
+    """
+    if level == 0:
+        parts = _PARAGRAPH_SPLIT_RE.split(text)
+        # re-attach each separator to the unit before it
+        return [parts[i] + (parts[i + 1] if i + 1 < len(parts) else '')
+                for i in range(0, len(parts), 2)]
+    if level == 1:
+        return text.splitlines(keepends=True)
+    units, last = [], 0
+    for m in _SENTENCE_SPLIT_RE.finditer(text):
+        units.append(text[last:m.end()])
+        last = m.end()
+    units.append(text[last:])
+    return [u for u in units if u]
+
+
+def _hard_cut(text: str, max_tokens: int, model: str) -> str:
+    enc = get_encoder(encoding_name_for(model))
+    if enc is not None:
+        # Decode a token prefix; drop a trailing partial (replacement) char
+        return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens]).rstrip('�')
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def _take_units(text: str, max_tokens: int, model: str, level: int,
+                allow_hard_cut: bool = True) -> str:
+    """Longest prefix of whole units at ``level`` that fits ``max_tokens``.
+
+    Unit counts are summed (each one cached); the first unit that does not
+    fit is filled from at the next level down (paragraph -> lines ->
+    sentences).  A mid-sentence cut only happens when nothing else fits.
+    The joined prefix is then counted exactly and trimmed, since merges
+    across unit boundaries can shift the total slightly.
+    """
+    if level > 2:
+        return _hard_cut(text, max_tokens, model) if allow_hard_cut else ''
+
+    kept: List[str] = []
+    running = 0
+    for unit in _split_keep(text, level):
+        n = count_tokens(unit, model)
+        if running + n <= max_tokens:
+            kept.append(unit)
+            running += n
+            continue
+        partial = _take_units(unit, max_tokens - running, model, level + 1,
+                              allow_hard_cut and not kept)
+        if partial:
+            kept.append(partial)
+        break
+
+    while kept and count_tokens(''.join(kept), model) > max_tokens:
+        kept.pop()
+    return ''.join(kept)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """Cut ``text`` to at most ``max_tokens`` on paragraph/line/sentence boundaries."""
+    if not text or max_tokens is None or count_tokens(text, model) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ''
+    return _take_units(text, max_tokens, model, 0).rstrip()
+
+
+def fit_to_budget(text: str, max_tokens: int, model: str = DEFAULT_MODEL,
+                  stage: str = "") -> Tuple[str, Dict[str, Any]]:
+    """Truncate to budget and return ``(text, usage)`` for the caller to log."""
+    tokens_in = count_tokens(text, model)
+    fitted = truncate_to_tokens(text, max_tokens, model) if tokens_in > max_tokens else text
+    tokens_out = count_tokens(fitted, model) if fitted is not text else tokens_in
+    usage = {
+        "stage": stage,
+        "model": model,
+        "encoding": encoding_name_for(model) if get_encoder(encoding_name_for(model)) else "estimate",
+        "budget": max_tokens,
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "utilization": round(tokens_out / max_tokens, 3) if max_tokens else 0.0,
+        "truncated": tokens_out < tokens_in,
+    }
+    logger.info("budget %s", usage)
+    return fitted, usage
+
+
+def format_usage(usage: Dict[str, Any]) -> str:
+    """One-line summary, e.g. ``article 3120/4000 tok (78%) cut from 9800``."""
+    line = (f"{usage['stage'] or 'prompt'} {usage['tokens_out']}/{usage['budget']} tok "
+            f"({usage['utilization']:.0%})")
+    if usage["truncated"]:
+        line += f" cut from {usage['tokens_in']}"
+    return line
+
+
+def get_stage_budget(model_cfg: Dict[str, Any], part: str, default: int) -> int:
+    """``token_budgets.<part>`` from a config.yaml model section."""
+    budgets = model_cfg.get("token_budgets") or {}
+    try:
+        return int(budgets.get(part, default))
+    except (TypeError, ValueError):
+        return default
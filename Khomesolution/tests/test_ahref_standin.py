@@ -0,0 +1,57 @@
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from ahref_standin import EXPORT_FIXTURE, start  # noqa: E402
+
+
+def test_standin_serves_page_and_fixture_export():
+    aiohttp = pytest.importorskip("aiohttp")
+
+    async def fetch():
+        runner, template = await start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(template.format("https%3A%2F%2Fexample.com%2F")) as resp:
+                    page = await resp.text()
+                base = template.split("/organic-keywords")[0]
+                async with session.get(f"{base}/export.csv?target=x") as resp:
+                    return page, resp.headers["Content-Disposition"], await resp.read()
+        finally:
+            await runner.cleanup()
+
+    page, disposition, body = asyncio.run(fetch())
+    assert "CSV (UTF-16, best for Excel)" in page
+    assert disposition.startswith("attachment")
+    assert body == EXPORT_FIXTURE.read_bytes()
+
+
+def chromium_installed():
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        return Path(p.chromium.executable_path).exists()
+
+
+def test_export_flow_runs_offline(tmp_path):
+    pytest.importorskip("playwright")
+    pytest.importorskip("dotenv")
+    pytest.importorskip("requests")
+    if not chromium_installed():
+        pytest.skip("playwright chromium is not installed (python -m playwright install chromium)")
+    import ahref_data_collection as adc
+
+    asyncio.run(adc.run_standin(pages=2, headless=True, output_dir=str(tmp_path)))
+
+    # facebook.com is ignored; the shared example-home.com URL is exported once for both keywords
+    with open(tmp_path / "_url_cache" / "index.json", encoding="utf-8") as f:
+        assert len(json.load(f)) == 3
+    for keyword in ("ประตูหน้าบ้าน", "ประตูรั้วหน้าบ้าน"):
+        merged = tmp_path / keyword / f"{keyword}.csv"
+        assert merged.exists() and os.path.getsize(merged) > 0
+        assert len(os.listdir(tmp_path / keyword / "all_urls")) == 2
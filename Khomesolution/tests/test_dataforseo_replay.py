@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import csv
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from dataforseo_replay import FIXTURE_DIR, STATUS_NOT_RECORDED, start  # noqa: E402
+
+RESEARCH_FIXTURE = FIXTURE_DIR.parent / "ahrefs" / "research"
+BROWSER_EXPORT = FIXTURE_DIR.parent / "ahrefs" / "organic-keywords.csv"
+
+
+def post_all(payloads):
+    import aiohttp
+
+    async def run():
+        runner, api_base = await start(FIXTURE_DIR)
+        try:
+            async with aiohttp.ClientSession() as session:
+                replies = []
+                for endpoint, payload in payloads:
+                    async with session.post(api_base + endpoint, json=payload) as resp:
+                        replies.append(await resp.json())
+                return replies
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def test_replays_recorded_response_and_flags_unrecorded():
+    recording = json.loads(next(FIXTURE_DIR.glob("*.json")).read_text(encoding="utf-8"))
+    other = [{**recording["request"][0], "limit": 1}]
+    hit, miss = post_all([(recording["endpoint"], recording["request"]),
+                          (recording["endpoint"], other)])
+    assert hit == recording["response"]
+    assert miss["tasks"][0]["status_code"] == STATUS_NOT_RECORDED
+
+
+def run_replay(output_dir):
+    import ranked_keywords_dataforseo as rk
+
+    args = argparse.Namespace(
+        dir=str(RESEARCH_FIXTURE), output_dir=str(output_dir), top_n=rk.TOP_N_URLS,
+        max_keywords=rk.MAX_KEYWORDS_PER_URL, max_concurrency=2, timeout=30,
+        api_base=rk.API_BASE, record_dir=None, replay=str(FIXTURE_DIR), force=False)
+    asyncio.run(rk.replay(args))
+
+
+def read_merged(output_dir, keyword):
+    with open(output_dir / keyword / f"{keyword}.csv", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_ranked_keywords_end_to_end(tmp_path):
+    pytest.importorskip("dotenv")
+    pytest.importorskip("playwright")
+    import ranked_keywords_dataforseo as rk
+
+    run_replay(tmp_path)
+
+    for keyword in ("ประตูหน้าบ้าน", "ประตูรั้วหน้าบ้าน"):
+        rows = read_merged(tmp_path, keyword)
+        assert rows and list(rows[0]) == rk.CSV_COLUMNS
+
+
+def test_existing_browser_export_is_merged_not_replaced(tmp_path):
+    pytest.importorskip("dotenv")
+    pytest.importorskip("playwright")
+    import ranked_keywords_dataforseo as rk
+
+    keyword = "ประตูหน้าบ้าน"
+    url = rk.load_competitor_urls(str(RESEARCH_FIXTURE))[keyword][0]
+    browser_file = tmp_path / keyword / "all_urls" / rk.csv_name_for_url(url)
+    browser_file.parent.mkdir(parents=True)
+    shutil.copy(BROWSER_EXPORT, browser_file)  # UTF-16 TSV, as the browser flow saves it
+
+    run_replay(tmp_path)
+
+    assert browser_file.read_bytes() == BROWSER_EXPORT.read_bytes()
+    api_file = tmp_path / keyword / "all_urls" / rk.csv_name_for_url(
+        rk.load_competitor_urls(str(RESEARCH_FIXTURE))[keyword][1])
+    with open(api_file, encoding="utf-8-sig", newline="") as f:
+        api_keywords = {row["Keyword"] for row in csv.DictReader(f)}
+    with open(BROWSER_EXPORT, encoding="utf-16", newline="") as f:
+        browser_keywords = {row["Keyword"] for row in csv.DictReader(f, delimiter="\t")}
+    merged = {row["Keyword"] for row in read_merged(tmp_path, keyword)}
+    assert merged == browser_keywords | api_keywords
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from keyword_clustering import JACCARD_THRESHOLD, cluster_keywords, jaccard  # noqa: E402
+
+PAIRS = 200
+
+
+def overlapping_pairs(shared, size=10):
+    """PAIRS disjoint keyword pairs whose top-``size`` URL lists share ``shared`` URLs."""
+    url_sets = {}
+    for p in range(PAIRS):
+        common = {f"site{p}.com/shared-{i}" for i in range(shared)}
+        url_sets[f"kw{p}-a"] = common | {f"site{p}.com/a-{i}" for i in range(size - shared)}
+        url_sets[f"kw{p}-b"] = common | {f"site{p}.com/b-{i}" for i in range(size - shared)}
+    return url_sets
+
+
+def merged_pairs(url_sets):
+    clusters, _ = cluster_keywords(url_sets)
+    return sum(1 for members in clusters if len(members) == 2)
+
+
+def test_recall_at_the_threshold():
+    url_sets = overlapping_pairs(shared=5)  # J = 5/15 = 0.33
+    assert jaccard(url_sets["kw0-a"], url_sets["kw0-b"]) >= JACCARD_THRESHOLD
+    assert merged_pairs(url_sets) >= PAIRS * 0.99
+
+
+def test_pairs_below_threshold_are_not_merged():
+    url_sets = overlapping_pairs(shared=4)  # J = 4/16 = 0.25
+    assert merged_pairs(url_sets) == 0
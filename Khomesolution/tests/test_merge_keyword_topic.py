@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from merge_keyword_ahref_dataforseo import keyword_matches_topic, normalize_for_match  # noqa: E402
+
+
+def matches(keyword, base, autocomplete=()):
+    return keyword_matches_topic(normalize_for_match(keyword), normalize_for_match(base),
+                                 {normalize_for_match(a) for a in autocomplete})
+
+
+def test_compound_keyword_matches_shorter_topic():
+    # "ประตูหน้าบ้าน" is a single dictionary word, so whole-word containment alone misses it
+    assert normalize_for_match("ประตูหน้าบ้าน") == "ประตูหน้าบ้าน"
+    assert matches("ประตูหน้าบ้าน", "หน้าบ้าน")
+
+
+def test_shorter_core_form_matches_longer_topic():
+    assert matches("ประตูหน้าบ้าน", "ประตูหน้าบ้านสวยๆ")
+
+
+def test_longer_variant_matches_topic():
+    assert matches("ประตูหน้าบ้านสวยๆราคา", "ประตูหน้าบ้าน")
+
+
+def test_spaced_autocomplete_form_matches():
+    assert matches("ประตูรั้วหน้าบ้าน", "รั้ว", autocomplete=["ประตู รั้ว หน้า บ้าน"])
+
+
+def test_unrelated_keyword_does_not_match():
+    assert not matches("หน้าต่างกันเสียง", "ประตูหน้าบ้าน")
+    assert not matches("รั้วบ้าน", "หน้าบ้าน")
@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from outline_repair import _context_words, _salience, trim_outline  # noqa: E402
+
+KEYWORD = "หน้าต่างกันเสียง"
+H1 = "หน้าต่างกันเสียง และ ประตูกันเสียง ติดตั้งอย่างไร"
+
+
+def test_function_words_are_not_context_hits():
+    context = _context_words(KEYWORD, H1)
+    assert "และ" not in context
+    assert _salience("แมวและสุนัข", context) == 0.0
+
+
+def test_compound_segmented_differently_still_matches():
+    # กรอบหน้าต่าง segments as กรอบหน้า + ต่าง
+    assert _salience("สีของกรอบหน้าต่าง", _context_words(KEYWORD, H1)) > 0.5
+
+
+def test_off_topic_h4_is_dropped_first():
+    lines = [f"<h1>{H1}</h1>"]
+    for i in range(1, 8):
+        lines.append(f"<h2>หน้าต่างกันเสียง ส่วนที่ {i}</h2>")
+        for j in range(3):
+            lines.append(f"<h3>ติดตั้งหน้าต่างกันเสียง ขั้นที่ {i}.{j}</h3>")
+    lines.append("<h4>สีของกรอบหน้าต่าง</h4>")
+    lines.append("<h4>แมวและสุนัข</h4>")
+    outline = "\n".join(lines)
+
+    fixed, actions = trim_outline(outline, KEYWORD, max_headings=30)
+    assert "แมวและสุนัข" not in fixed
+    assert "สีของกรอบหน้าต่าง" in fixed
+    assert actions == ["drop H4 (salience 0.00): แมวและสุนัข"]
@@ -0,0 +1,35 @@
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from phrase_rewriter import RewriteEngine  # noqa: E402
+
+
+def sequential(rules, text, flags=re.IGNORECASE):
+    for pattern, replacement in rules:
+        text = re.sub(pattern, replacement, text, flags=flags)
+    return text
+
+
+def check(rules, *texts):
+    engine = RewriteEngine(rules)
+    for text in texts:
+        assert engine.apply(text) == sequential(rules, text)
+
+
+def test_overlapping_and_prefix_literals():
+    rules = [(r"\bit is\b", "X"), (r"\bit is important to\b", "Y"), (r"ery good", "fine"), (r"\bvery\b", "")]
+    check(rules, "It is important to note: very good, very GOOD. it is.", "no phrase here")
+
+
+def test_literal_created_by_an_earlier_replacement():
+    # Deleting "really " joins "ver" and "y good" into a later rule's phrase
+    rules = [(r"really ", ""), (r"\bvery good\b", "good"), (r"abc", "very good")]
+    check(rules, "verreally y good, abc", "xyz")
+
+
+def test_rules_with_no_literal_and_thai_phrases():
+    rules = [(r"\s+(?=[,.])", ""), (r"เพื่อที่จะ", "เพื่อ"), (r"\bbasically,?\s*", "")]
+    check(rules, "เพื่อที่จะ ติดตั้ง , Basically, fine .", "")
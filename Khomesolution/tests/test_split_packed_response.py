@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from title_analysis import split_packed_response  # noqa: E402
+
+
+def packed(*docs):
+    return "\n".join(f"=== KEYWORD: {name} ===\nmeta:\n  query: \"{query}\"\n  country: null\n"
+                     for name, query in docs)
+
+
+def test_exact_names_win_over_order():
+    # B first, then A with an inserted space: each keeps its own analysis
+    docs = split_packed_response(packed(("รั้วบ้าน", "รั้วบ้าน"), ("ประตู หน้าบ้าน", "ประตูหน้าบ้าน")),
+                                 ["ประตูหน้าบ้าน", "รั้วบ้าน"])
+    assert 'query: "ประตูหน้าบ้าน"' in docs["ประตูหน้าบ้าน"]
+    assert 'query: "รั้วบ้าน"' in docs["รั้วบ้าน"]
+
+
+def test_unrecognized_names_fall_back_to_order():
+    docs = split_packed_response(packed(("door", "A"), ("fence", "B")), ["A", "B"])
+    assert set(docs) == {"A", "B"} and 'query: "A"' in docs["A"]
+
+
+def test_leftover_never_takes_a_claimed_keyword():
+    docs = split_packed_response(packed(("B", "B"), ("garbled", "A")), ["A", "B"])
+    assert set(docs) == {"B"}
+
+
+def test_meta_query_mismatch_is_retried():
+    docs = split_packed_response(packed(("door", "B"), ("fence", "A")), ["A", "B"])
+    assert docs == {}
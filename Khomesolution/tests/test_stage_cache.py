@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import dep_tracker  # noqa: E402
+import optimize_research_data as optimize  # noqa: E402
+from stage_cache import rules_fingerprint  # noqa: E402
+
+DOC = """# {title}
+
+Sliding gates need a level track. See [the guide](https://example.com/{slug}) for details.
+
+- Measure the opening
+- Pick the material
+
+Steel gates last longer than wooden ones.
+"""
+
+
+def write_research(base_dir, slug, title):
+    path = base_dir / f"{slug}.md"
+    path.write_text(DOC.format(title=title, slug=slug), encoding="utf-8")
+    return path
+
+
+def test_pipeline_fingerprint_is_stable_across_a_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(dep_tracker, "DEPS_DIR", tmp_path / ".deps")
+    before = rules_fingerprint(optimize.process_file, optimize.PIPELINE_CONFIG)
+    optimize.process_file(write_research(tmp_path, "seed-01", "Gate"), tmp_path)
+    assert rules_fingerprint(optimize.process_file, optimize.PIPELINE_CONFIG) == before
+
+
+def test_rerun_skips_files_whose_input_did_not_change(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(dep_tracker, "DEPS_DIR", tmp_path / ".deps")
+    seed = write_research(tmp_path, "seed-01", "Gate")
+    other = write_research(tmp_path, "synth-english", "Fence")
+    optimize.process_file(seed, tmp_path)
+    optimize.process_file(other, tmp_path)
+
+    # A fresh process: nothing memoized yet when the skip check runs
+    monkeypatch.setattr(optimize, "_stage_fingerprints", {})
+    monkeypatch.setattr(optimize, "_pipeline_fingerprints", {})
+    write_research(tmp_path, "seed-01", "Front gate")
+    capsys.readouterr()
+    assert optimize.process_file(seed, tmp_path) is not None
+    assert optimize.process_file(other, tmp_path) is None
+    assert "Skipping synth-english.md" in capsys.readouterr().out